@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote
+
+from fastapi import HTTPException, Request, status
+from starlette.routing import Match
+
+from .cache import response_cache
+from .db import SHARED_SESSION, DbSession, outer_transaction
+from .events import publish_events
+from .fastjson import dumps
+from .replicas import LAST_WRITE_HEADER, SAFE_METHODS
+from .schemas import BatchRequestItem
+
+
+
+
+BATCH_MAX = int(os.getenv("BATCH_MAX", "50"))
+# równoległe odczyty jednego batcha - każdy bierze własne połączenie z puli
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# nagłówki transportu: nie przechodzą z /batch do pod-żądań ani z pod-odpowiedzi do wyniku
+HOP_REQUEST_HEADERS = {
+    b"content-length",
+    b"content-type",
+    b"transfer-encoding",
+    b"if-match",
+    b"if-none-match",
+}
+HOP_RESPONSE_HEADERS = {"content-length", "set-cookie", "server-timing", LAST_WRITE_HEADER}
+
+# zakodowane separatory (/ \ ? # i sam %) po dekodowaniu zmieniłyby podział ścieżki
+ENCODED_SEPARATORS = ("%2f", "%5c", "%3f", "%23", "%25")
+
+# trasy z własnym połączeniem (import: staging/COPY w threadpoolu, purge: partie w tle) -
+# w ?transaction=true zapisałyby poza wspólną transakcją i przetrwały jej rollback
+NON_TRANSACTIONAL_ROUTES = {"import_rows", "purge_project"}
+
+log = logging.getLogger("taskapi.batch")
+
+
+class _Rollback(Exception):
+    pass
+
+
+
+
+@dataclass(frozen=True)
+class BatchCall:
+    item: BatchRequestItem
+    path: str  # zdekodowana raz - ten sam napis sprawdza walidacja i dostaje routing
+    raw_path: str
+    query: str
+
+
+def batch_call(item: BatchRequestItem) -> Optional[BatchCall]:
+    raw, _, query = item.path.partition("?")
+    if any(sep in raw.lower() for sep in ENCODED_SEPARATORS):
+        return None
+    path = unquote(raw)
+    target = path.rstrip("/")
+    # strumień SSE nigdy się nie kończy, a /batch w /batch mnożyłby pod-żądania
+    if (
+        not path.startswith("/")
+        or path.startswith("//")
+        or "\\" in path
+        or target == "/batch"
+        or target.endswith(":stream")
+    ):
+        return None
+    return BatchCall(item, path, raw, query)
+
+
+def route_name(request: Request, call: BatchCall) -> Optional[str]:
+    scope = {"type": "http", "method": call.item.method, "path": call.path, "root_path": ""}
+    for route in request.app.router.routes:
+        if route.matches(scope)[0] == Match.FULL:
+            return getattr(route, "name", None)
+    return None
+
+
+def prepare_calls(
+    request: Request, items: Sequence[BatchRequestItem], transaction: bool
+) -> List[BatchCall]:
+    if not items or len(items) > BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"batch must contain 1 to {BATCH_MAX} requests",
+        )
+    calls = []
+    for i, item in enumerate(items):
+        call = batch_call(item)
+        if call is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"requests[{i}]: path not allowed in batch: {item.path}",
+            )
+        if transaction and route_name(request, call) in NON_TRANSACTIONAL_ROUTES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"requests[{i}]: {item.method} {item.path} cannot run with transaction=true",
+            )
+        calls.append(call)
+    return calls
+
+
+
+
+# Pod-żądanie przechodzi przez całą aplikację ASGI (routing, walidacja, zależności, ETagi,
+# middleware) - bez sieci i bez osobnego połączenia HTTP.
+class SubRequest:
+    def __init__(self, parent: Request, call: BatchCall) -> None:
+        self.parent = parent
+        self.call = call
+        self.item = call.item
+        self.status = 500
+        self.headers: List[Tuple[bytes, bytes]] = []
+        self.chunks: List[bytes] = []
+
+    def scope(self, shared: Optional[DbSession], written: Optional[str]) -> Dict[str, Any]:
+        body = dumps(self.item.body) if self.item.body is not None else b""
+        headers = [(k, v) for k, v in self.parent.headers.raw if k not in HOP_REQUEST_HEADERS]
+        headers += [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        if written is not None:
+            # zapis wcześniej w tym batchu - odczyty za nim idą na primary (app/replicas.py)
+            headers.append((LAST_WRITE_HEADER.encode(), written.encode()))
+        headers += [
+            (k.lower().encode("latin-1"), v.encode("latin-1"))
+            for k, v in self.item.headers.items()
+        ]
+        scope = {
+            "type": "http",
+            "asgi": self.parent.scope.get("asgi", {"version": "3.0"}),
+            "http_version": "1.1",
+            "method": self.item.method,
+            "scheme": self.parent.url.scheme,
+            "server": self.parent.scope.get("server"),
+            "client": self.parent.scope.get("client"),
+            "root_path": self.parent.scope.get("root_path", ""),
+            "path": self.call.path,
+            "raw_path": self.call.raw_path.encode(),
+            "query_string": self.call.query.encode(),
+            "headers": headers,
+            "state": {},
+        }
+        if shared is not None:
+            scope[SHARED_SESSION] = shared
+        self.body = body
+        return scope
+
+    async def run(
+        self, shared: Optional[DbSession] = None, written: Optional[str] = None
+    ) -> "SubRequest":
+        scope = self.scope(shared, written)
+        received = False
+
+        async def receive() -> Dict[str, Any]:
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": self.body, "more_body": False}
+            # "rozłączenie" nigdy nie przychodzi - odpowiedzi strumieniowe idą do końca
+            await asyncio.Event().wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                self.status = message["status"]
+                self.headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                self.chunks.append(message.get("body", b""))
+
+        try:
+            await self.parent.app(scope, receive, send)
+        except Exception:
+            # ServerErrorMiddleware wysłał już 500 i przekazał wyjątek dalej
+            log.exception("batch sub-request %s %s failed", self.item.method, self.item.path)
+        return self
+
+    def header(self, name: str) -> Optional[str]:
+        for k, v in self.headers:
+            if k.decode("latin-1").lower() == name:
+                return v.decode("latin-1")
+        return None
+
+    def result(self) -> Dict[str, Any]:
+        raw = b"".join(self.chunks)
+        content_type = self.header("content-type") or ""
+        if not raw:
+            body = None
+        elif content_type.startswith("application/json"):
+            body = json.loads(raw)
+        else:
+            body = raw.decode("utf-8", "replace")
+        headers = {
+            k.decode("latin-1"): v.decode("latin-1")
+            for k, v in self.headers
+            if k.decode("latin-1").lower() not in HOP_RESPONSE_HEADERS
+        }
+        return {"status": self.status, "headers": headers, "body": body}
+
+    @property
+    def wrote(self) -> bool:
+        return self.item.method not in SAFE_METHODS and self.status < 400
+
+
+
+
+def _not_executed() -> Dict[str, Any]:
+    return {"status": 424, "headers": {}, "body": {"detail": "Not executed: batch rolled back"}}
+
+
+async def _run_independent(request: Request, calls: Sequence[BatchCall]) -> List[SubRequest]:
+    # kolejne GET-y lecą równolegle; zapis jest barierą - następne pod-żądania widzą jego wynik
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    written: Optional[str] = None
+
+    async def run(call: BatchCall) -> SubRequest:
+        async with limit:
+            return await SubRequest(request, call).run(written=written)
+
+    done: List[SubRequest] = []
+    i = 0
+    while i < len(calls):
+        j = i + 1
+        if calls[i].item.method in SAFE_METHODS:
+            while j < len(calls) and calls[j].item.method in SAFE_METHODS:
+                j += 1
+        for sub in await asyncio.gather(*(run(call) for call in calls[i:j])):
+            done.append(sub)
+            written = sub.header(LAST_WRITE_HEADER) or written
+        i = j
+    return done
+
+
+async def _run_atomic(
+    request: Request, calls: Sequence[BatchCall]
+) -> Tuple[List[SubRequest], bool]:
+    # wszystko po kolei w jednej transakcji; pierwsza odpowiedź >= 400 cofa całość
+    done: List[SubRequest] = []
+    held: List[Dict[str, Any]] = []
+    try:
+        async with outer_transaction() as db:
+            db.sync_session.info["held_events"] = held
+            for call in calls:
+                sub = await SubRequest(request, call).run(db)
+                done.append(sub)
+                if sub.status >= 400:
+                    raise _Rollback
+    except _Rollback:
+        return done, False
+
+    publish_events(held)
+    # handlery unieważniły cache przed commitem - w tym oknie inny odczyt mógł odłożyć stary stan
+    for sub in done:
+        if sub.wrote:
+            parts = sub.call.path.strip("/").split("/")
+            await response_cache.invalidate("/" + parts[0])
+            await response_cache.invalidate_tree("/" + "/".join(parts[:2]))
+    return done, True
+
+
+async def run_batch(
+    request: Request, calls: Sequence[BatchCall], transaction: bool
+) -> Tuple[List[Dict[str, Any]], Optional[bool], List[Tuple[str, str]]]:
+    if transaction:
+        done, committed = await _run_atomic(request, calls)
+    else:
+        done, committed = await _run_independent(request, calls), None
+
+    results = [sub.result() for sub in done]
+    results += [_not_executed() for _ in calls[len(done):]]
+
+    # znacznik ostatniego zapisu (cookie + nagłówek) z pod-odpowiedzi - kolejne odczyty
+    # klienta trafią na primary (app/replicas.py)
+    marker: List[Tuple[str, str]] = []
+    if committed is not False:
+        for sub in done:
+            if sub.wrote and sub.header(LAST_WRITE_HEADER) is not None:
+                marker = [
+                    (k.decode("latin-1"), v.decode("latin-1"))
+                    for k, v in sub.headers
+                    if k.decode("latin-1").lower() in ("set-cookie", LAST_WRITE_HEADER)
+                ]
+    return results, committed, marker
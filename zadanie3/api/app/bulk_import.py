@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .db import engine
+from .events import publish_events, record_rows
+from .schemas import ImportSummary, MemberImportIn, ProjectCreate, UserCreate
+
+
+
+
+ImportFormat = Literal["csv", "ndjson"]
+
+STAGE_BATCH = 1000
+
+
+class ImportFileError(ValueError):
+    """Wejście nie daje się odczytać (kodowanie, składnia CSV) - import wycofany w całości."""
+
+
+
+
+@dataclass(frozen=True)
+class ImportEvents:
+    # zdarzenie "created" w outboxie projektu za każdy wstawiony wiersz
+    entity: str
+    project_column: str
+    id_column: str
+    new_projects: bool = False  # projekty z tej transakcji - nikt inny nie pisze ich zdarzeń
+
+
+@dataclass(frozen=True)
+class ImportSpec:
+    table: str
+    schema: Type[BaseModel]
+    columns: Tuple[str, ...]
+    conflict: Optional[str] = None  # kolumny ON CONFLICT
+    where: str = "true"  # filtr przy przenoszeniu ze stagingu
+    events: Optional[ImportEvents] = None
+
+
+IMPORTS: Dict[str, ImportSpec] = {
+    "users": ImportSpec(
+        table="users",
+        schema=UserCreate,
+        columns=("name", "email"),
+        conflict="email",
+    ),
+    "projects": ImportSpec(
+        table="projects",
+        schema=ProjectCreate,
+        columns=("name", "description", "start_date", "planned_end_date"),
+        events=ImportEvents("project", "id", "id", new_projects=True),
+    ),
+    "members": ImportSpec(
+        table="project_members",
+        schema=MemberImportIn,
+        columns=("project_id", "user_id"),
+        conflict="project_id, user_id",
+        where=(
+            "EXISTS (SELECT 1 FROM projects p WHERE p.id = s.project_id)"
+            " AND EXISTS (SELECT 1 FROM users u WHERE u.id = s.user_id)"
+        ),
+        events=ImportEvents("member", "project_id", "user_id"),
+    ),
+}
+
+
+
+
+def iter_records(lines: Iterable[str], fmt: ImportFormat) -> Iterator[Dict[str, Any]]:
+    # błąd dekodowania wychodzi przy czytaniu kolejnego kawałka, nie da się pominąć jednej linii
+    try:
+        yield from _records(lines, fmt)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise ImportFileError(f"Unreadable {fmt} input: {exc}") from exc
+
+
+def _records(lines: Iterable[str], fmt: ImportFormat) -> Iterator[Dict[str, Any]]:
+    if fmt == "csv":
+        for row in csv.DictReader(lines):
+            yield {k: (v if v != "" else None) for k, v in row.items()}
+        return
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            yield {}  # nie przejdzie walidacji -> skipped
+
+
+
+
+class _Counter:
+    def __init__(self) -> None:
+        self.received = 0
+        self.invalid = 0
+
+
+def _valid_rows(
+    spec: ImportSpec, records: Iterable[Dict[str, Any]], counter: _Counter
+) -> Iterator[Tuple[Any, ...]]:
+    for record in records:
+        counter.received += 1
+        try:
+            item = spec.schema.model_validate(record)
+        except ValidationError:
+            counter.invalid += 1
+            continue
+        data = item.model_dump(mode="json")
+        yield tuple(data[c] for c in spec.columns)
+
+
+
+
+class _CsvReader:
+    # plik "do odczytu" dla COPY ... FROM STDIN, generowany leniwie z wierszy
+    def __init__(self, rows: Iterator[Tuple[Any, ...]]) -> None:
+        self._rows = rows
+        self._buf = ""
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buf) < size:
+            chunk = list(islice(self._rows, STAGE_BATCH))
+            if not chunk:
+                break
+            out = io.StringIO()
+            csv.writer(out, lineterminator="\n").writerows(chunk)
+            self._buf += out.getvalue()
+        if size < 0:
+            data, self._buf = self._buf, ""
+        else:
+            data, self._buf = self._buf[:size], self._buf[size:]
+        return data
+
+
+
+
+def _stage_copy(conn: Connection, staging: str, spec: ImportSpec, rows: Iterator) -> None:
+    cols = ", ".join(spec.columns)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {staging} ({cols}) FROM STDIN WITH (FORMAT csv)", _CsvReader(rows)
+        )
+    finally:
+        cursor.close()
+
+
+def _stage_executemany(conn: Connection, staging: str, spec: ImportSpec, rows: Iterator) -> None:
+    cols = ", ".join(spec.columns)
+    params = ", ".join(f":{c}" for c in spec.columns)
+    stmt = text(f"INSERT INTO {staging} ({cols}) VALUES ({params})")
+    while True:
+        chunk: List[Tuple[Any, ...]] = list(islice(rows, STAGE_BATCH))
+        if not chunk:
+            break
+        conn.execute(stmt, [dict(zip(spec.columns, r)) for r in chunk])
+
+
+
+
+def run_import(entity: str, lines: Iterable[str], fmt: ImportFormat) -> ImportSummary:
+    spec = IMPORTS[entity]
+    cols = ", ".join(spec.columns)
+    staging = f"import_{spec.table}"
+    counter = _Counter()
+    rows = _valid_rows(spec, iter_records(lines, fmt), counter)
+    postgres = engine.dialect.name == "postgresql"
+    events: List[Dict[str, Any]] = []
+
+    with engine.begin() as conn:
+        if not postgres:
+            # sqlite: temp table żyje z połączeniem z puli, jeśli poprzedni import przerwał
+            # się przed DROP; na postgresie ON COMMIT DROP (a rollback cofa CREATE), a
+            # niekwalifikowany DROP mógłby trafić w prawdziwą tabelę import_* ze search_path
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS temp.{staging}")
+        conn.exec_driver_sql(
+            f"CREATE TEMP TABLE {staging}"
+            + (" ON COMMIT DROP" if postgres else "")
+            + f" AS SELECT {cols} FROM {spec.table} WHERE false"
+        )
+        if postgres:
+            _stage_copy(conn, staging, spec, rows)
+        else:
+            _stage_executemany(conn, staging, spec, rows)
+
+        staged = conn.execute(text(f"SELECT count(*) FROM {staging}")).scalar_one()
+        eligible = conn.execute(
+            text(f"SELECT count(*) FROM {staging} s WHERE {spec.where}")
+        ).scalar_one()
+        conflict = f" ON CONFLICT ({spec.conflict}) DO NOTHING" if spec.conflict else ""
+        returning = (
+            f" RETURNING {spec.events.project_column}, {spec.events.id_column}"
+            if spec.events
+            else ""
+        )
+        result = conn.execute(
+            text(
+                f"INSERT INTO {spec.table} ({cols})"
+                f" SELECT {cols} FROM {staging} s WHERE {spec.where}{conflict}{returning}"
+            )
+        )
+        if spec.events:
+            # import omija ORM i record() - zdarzenia wprost, w tej samej transakcji
+            created = [tuple(row) for row in result]
+            inserted = len(created)
+            events = record_rows(
+                conn, spec.events.entity, created, "created", lock=not spec.events.new_projects
+            )
+        else:
+            inserted = result.rowcount
+        if not postgres:
+            conn.exec_driver_sql(f"DROP TABLE temp.{staging}")
+
+    publish_events(events)
+
+    return ImportSummary(
+        entity=entity,
+        received=counter.received,
+        inserted=inserted,
+        skipped=counter.invalid + (staged - eligible),
+        conflicting=eligible - inserted,
+    )
@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from .conditional import not_modified
+from .db import replicas, shared_session
+from .replicas import REPLICA_STICKY_SECONDS, reads_own_writes
+
+try:  # opcjonalny współdzielony backend
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+
+
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # memory | redis | none
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+REDIS_URL = os.getenv("REDIS_URL", "local")  # "local" -> LocalRedis (testy)
+
+REDIS_PREFIX = "taskapi:cache:"
+GENERATION_PREFIX = "taskapi:cache-gen:"
+# generacja ścieżki żyje dłużej niż najdłuższy odczyt, który może ją porównać
+GENERATION_TTL = max(CACHE_TTL, 60.0)
+
+
+
+
+# Klucz = ścieżka zasobu (np. /projects/1/tasks), wariant = posortowany query string.
+# Warianty trzymamy pod jednym kluczem, żeby invalidacja zasobu zdejmowała wszystkie strony.
+# Generacja ścieżki rośnie przy każdej invalidacji (patrz ResponseCache.store_body).
+class MemoryBackend:
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, bytes]]]" = OrderedDict()
+        # ścieżka -> (generacja, wygasa); kolejność = kolejność wygasania
+        self._generations: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+
+    async def get(self, key: str, variant: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires, variants = entry
+        if expires < time.monotonic():
+            self._drop(key)
+            return None
+        self._data.move_to_end(key)
+        return variants.get(variant)
+
+    async def set(self, key: str, variant: str, body: bytes) -> None:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._drop(key)
+            entry = (time.monotonic() + self.ttl, {})
+            self._data[key] = entry
+        variants = entry[1]
+        self.size += len(body) - len(variants.get(variant, b""))
+        variants[variant] = body
+        self._data.move_to_end(key)
+
+        while self._data and (len(self._data) > self.max_entries or self.size > self.max_bytes):
+            self._drop(next(iter(self._data)))
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._drop(key)
+
+    async def delete_prefix(self, prefix: str) -> None:
+        for key in [k for k in self._data if k.startswith(prefix)]:
+            self._drop(key)
+
+    def _drop(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size -= sum(len(b) for b in entry[1].values())
+
+    async def bump(self, keys: Iterable[str]) -> None:
+        now = time.monotonic()
+        for key in keys:
+            generation = self._generations.pop(key, (0, 0.0))[0] + 1
+            self._generations[key] = (generation, now + GENERATION_TTL)
+        while self._generations and next(iter(self._generations.values()))[1] < now:
+            self._generations.popitem(last=False)
+
+    async def generations(self, keys: Iterable[str]) -> Tuple[Any, ...]:
+        return tuple(self._generations.get(k, (0,))[0] for k in keys)
+
+
+
+
+class LocalRedis:
+    # minimalny podzbiór redis.asyncio używany przez RedisBackend - stand-in do testów
+    def __init__(self) -> None:
+        self._hashes: Dict[str, Dict[str, bytes]] = {}
+        self._counters: Dict[str, int] = {}
+        self._expires: Dict[str, float] = {}
+
+    def _alive(self, key: str) -> bool:
+        if key in self._expires and self._expires[key] < time.monotonic():
+            self._hashes.pop(key, None)
+            self._counters.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._hashes or key in self._counters
+
+    async def hget(self, key: str, field: str) -> Optional[bytes]:
+        return self._hashes[key].get(field) if self._alive(key) else None
+
+    async def hset(self, key: str, field: str, value: bytes) -> None:
+        self._alive(key)
+        self._hashes.setdefault(key, {})[field] = value
+
+    async def expire(self, key: str, seconds: int, nx: bool = False) -> None:
+        if nx and key in self._expires:
+            return
+        self._expires[key] = time.monotonic() + seconds
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._hashes.pop(key, None)
+            self._counters.pop(key, None)
+            self._expires.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        self._alive(key)
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        return [str(self._counters[k]).encode() if self._alive(k) else None for k in keys]
+
+    async def scan_iter(self, match: str):
+        for key in [k for k in self._hashes if fnmatch.fnmatchcase(k, match)]:
+            yield key
+
+
+
+
+class RedisBackend:
+    def __init__(self, client: Any, ttl: float) -> None:
+        self.client = client
+        self.ttl = max(1, int(ttl))
+
+    async def get(self, key: str, variant: str) -> Optional[bytes]:
+        return await self.client.hget(REDIS_PREFIX + key, variant)
+
+    async def set(self, key: str, variant: str, body: bytes) -> None:
+        await self.client.hset(REDIS_PREFIX + key, variant, body)
+        await self.client.expire(REDIS_PREFIX + key, self.ttl, nx=True)
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        keys = [REDIS_PREFIX + k for k in keys]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def delete_prefix(self, prefix: str) -> None:
+        keys = [k async for k in self.client.scan_iter(match=REDIS_PREFIX + prefix + "*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def bump(self, keys: Iterable[str]) -> None:
+        # wspólne dla wszystkich instancji - invalidacja z jednej psuje store w toku na innej
+        for key in keys:
+            await self.client.incr(GENERATION_PREFIX + key)
+            await self.client.expire(GENERATION_PREFIX + key, int(GENERATION_TTL))
+
+    async def generations(self, keys: Iterable[str]) -> Tuple[Any, ...]:
+        return tuple(await self.client.mget([GENERATION_PREFIX + k for k in keys]))
+
+
+
+
+# Odczyt, który zaczął się przed commitem zapisu, mógłby odłożyć stan sprzed zapisu już po
+# jego invalidacji. lookup zapamiętuje generacje ścieżki i jej przodków (invalidate_tree),
+# store_body po zapisie wpisu porównuje je ponownie i przy zmianie wpis wyrzuca - invalidacja
+# najpierw podbija generację, potem kasuje, więc każda kolejność kończy się bez starego wpisu.
+class ResponseCache:
+    def __init__(self, backend: Any) -> None:
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._pending: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def variant(request: Request) -> str:
+        return urlencode(sorted(request.query_params.multi_items()))
+
+    @staticmethod
+    def scopes(path: str) -> List[str]:
+        parts = path.strip("/").split("/")
+        return ["/" + "/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+    async def lookup(self, request: Request) -> Optional[Response]:
+        if self.backend is None or shared_session(request):
+            return None
+        # przed odczytem z bazy
+        request.state.cache_generations = await self.backend.generations(
+            self.scopes(request.url.path)
+        )
+        # świeży zapis klienta: wpis mógł trafić do cache z opóźnionej repliki - czytamy
+        # z primary, a store nadpisze go aktualną wersją
+        if reads_own_writes(request):
+            return None
+        value = await self.backend.get(request.url.path, self.variant(request))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # wpis = b"<etag>\n<body>"
+        etag, body = value.split(b"\n", 1)
+        etag = etag.decode()
+        return not_modified(request, etag) or Response(
+            content=body, media_type="application/json", headers={"ETag": etag}
+        )
+
+    async def store(self, request: Request, out: BaseModel, etag: str) -> Response:
+        return await self.store_body(request, out.model_dump_json(by_alias=True).encode(), etag)
+
+    async def store_body(self, request: Request, body: bytes, etag: str) -> Response:
+        # wewnątrz transakcji /batch odczyt może widzieć niezacommitowane zmiany - nie cache'ujemy
+        seen = getattr(request.state, "cache_generations", None)
+        if self.backend is not None and shared_session(request) is None and seen is not None:
+            path = request.url.path
+            await self.backend.set(path, self.variant(request), etag.encode() + b"\n" + body)
+            if await self.backend.generations(self.scopes(path)) != seen:
+                await self.backend.delete([path])
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+    async def invalidate(self, *paths: str) -> None:
+        await self._invalidate(paths, tree=False)
+        self._invalidate_later(paths, tree=False)
+
+    async def invalidate_tree(self, path: str) -> None:
+        await self._invalidate([path], tree=True)
+        self._invalidate_later([path], tree=True)
+
+    async def _invalidate(self, paths: Iterable[str], tree: bool) -> None:
+        if self.backend is None:
+            return
+        await self.backend.bump(paths)
+        await self.backend.delete(paths)
+        if tree:
+            for path in paths:
+                await self.backend.delete_prefix(path + "/")
+
+    def _invalidate_later(self, paths: Iterable[str], tree: bool) -> None:
+        # odczyt z repliki, która jeszcze nie ma zapisu, zaczęty już po invalidacji przejdzie
+        # sprawdzenie generacji - druga invalidacja po maks. opóźnieniu replik go zdejmie
+        if self.backend is None or not replicas:
+            return
+        paths = list(paths)
+
+        async def again() -> None:
+            await asyncio.sleep(REPLICA_STICKY_SECONDS)
+            await self._invalidate(paths, tree)
+
+        task = asyncio.create_task(again())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": CACHE_BACKEND,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+
+
+def make_backend() -> Any:
+    if CACHE_BACKEND == "none":
+        return None
+    if CACHE_BACKEND == "redis":
+        if REDIS_URL == "local":
+            return RedisBackend(LocalRedis(), CACHE_TTL)
+        if aioredis is None:
+            raise RuntimeError("CACHE_BACKEND=redis wymaga pakietu redis")
+        return RedisBackend(aioredis.from_url(REDIS_URL), CACHE_TTL)
+    return MemoryBackend(CACHE_TTL, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
+
+
+response_cache = ResponseCache(make_backend())
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import select, update
+from sqlalchemy.orm.exc import StaleDataError
+
+
+
+
+def entity_etag(obj: Any) -> str:
+    return f'"{obj.id}-{obj.version}"'
+
+
+def collection_etag(rows: Iterable[Any], *extra: Any) -> str:
+    # dokładny skrót po parach (id, version) strony + to co zmienia linki (np. next)
+    digest = hashlib.blake2b(digest_size=12)
+    count = 0
+    for r in rows:
+        digest.update(f"{r.id}:{r.version};".encode())
+        count += 1
+    digest.update(repr(extra).encode())
+    return f'"{count}-{digest.hexdigest()}"'
+
+
+
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = False) -> bool:
+    # RFC 9110: If-None-Match porównuje słabo (W/ ignorowane), If-Match silnie - słaby tag
+    # nie gwarantuje identycznej reprezentacji, więc nie może dopuścić zapisu
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [t.strip() for t in header.split(",")]
+    if weak:
+        tags = [t.removeprefix("W/") for t in tags]
+    return etag in tags
+
+
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    if etag_matches(request.headers.get("if-none-match"), etag, weak=True):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
+
+
+
+
+def precondition_failed() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Resource has been modified",
+    )
+
+
+def check_if_match(request: Request, etag: str) -> None:
+    header = request.headers.get("if-match")
+    if header is not None and not etag_matches(header, etag):
+        raise precondition_failed()
+
+
+def if_match_versions(request: Request, entity_id: int) -> Optional[List[int]]:
+    # If-Match jako warunek w SQL: wersje tego wiersza uznane przez klienta; None = bez warunku
+    header = request.headers.get("if-match")
+    if header is None or header.strip() == "*":
+        return None
+    versions = []
+    for tag in header.split(","):
+        tag = tag.strip()  # W/"..." nie przechodzi - porównanie silne
+        if tag.startswith('"') and tag.endswith('"'):
+            tag_id, _, version = tag[1:-1].partition("-")
+            if tag_id == str(entity_id) and version.isdigit():
+                versions.append(int(version))
+    return versions
+
+
+
+
+async def update_returning(
+    db: Any,
+    request: Request,
+    model: Any,
+    entity_id: int,
+    values: Dict[str, Any],
+    *where: Any,
+) -> Optional[Any]:
+    # jeden UPDATE ... WHERE <klucz> [AND version IN (If-Match)] RETURNING - bez SELECT przed
+    # i refresh po. None: brak wiersza albo inna wersja (rozróżnia wołający, tylko przy błędzie).
+    # Commit po stronie wołającego - razem z zapisem zdarzenia zmiany
+    versions = if_match_versions(request, entity_id)
+    if versions is not None:
+        where = (*where, model.version.in_(versions))
+    if not values:
+        return await db.scalar(select(model).where(*where))
+
+    return await db.scalar(
+        update(model)
+        .where(*where)
+        .values(**values, version=model.version + 1)
+        .returning(model)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+
+
+
+
+async def commit_versioned(db: Any) -> None:
+    # version_id_col: UPDATE/DELETE ... WHERE version = <wczytana>, inaczej StaleDataError
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Resource has been modified concurrently",
+        )
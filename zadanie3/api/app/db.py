@@ -1,6 +1,21 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional, Sequence, Union
+
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+from starlette.concurrency import run_in_threadpool
+
+from .metrics import TimedAsyncQueuePool, TimedQueuePool
+from .replicas import Replica, ReplicaSet, wants_primary
 
 
 
@@ -9,25 +24,248 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("Brak zmiennej środowiskowej DATABASE_URL")
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-)
+# DB_CREATE_ALL=0 -> schemat tylko z migracji alembica (alembic upgrade head)
+DB_CREATE_ALL = os.getenv("DB_CREATE_ALL", "1").lower() in ("1", "true", "yes")
+
+# DB_ASYNC=1 -> create_async_engine (asyncpg / aiosqlite), inaczej sync engine w threadpoolu
+DB_ASYNC = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+# repliki tylko do odczytu (GET), po przecinku; zapisy zawsze na DATABASE_URL
+DATABASE_REPLICA_URLS = [
+    u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()
+]
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    u = make_url(url)
+    if u.drivername in ("postgresql+asyncpg", "sqlite+aiosqlite"):
+        return url
+    return u.set(drivername=ASYNC_DRIVERS[u.get_backend_name()]).render_as_string(
+        hide_password=False
+    )
+
+
+def pool_options(url: str, is_async: bool) -> dict:
+    # pula z pomiarem czasu oczekiwania; sqlite :memory: zostaje przy domyślnej puli
+    u = make_url(url)
+    if u.get_backend_name() == "sqlite" and u.database in (None, "", ":memory:"):
+        return {}
+    return {"poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool}
+
+
+def _icontains(text: Optional[str], needle: str) -> bool:
+    return text is not None and needle.casefold() in text.casefold()
+
+
+def sqlite_on_connect(dbapi_connection: Any, connection_record: Any) -> None:
+    # stand-in dla ILIKE + pg_trgm na sqlite: podciąg bez wielkości liter (także poza ASCII)
+    dbapi_connection.create_function("icontains", 2, _icontains, deterministic=True)
+    # sqlite domyślnie ignoruje klucze obce, a usuwanie opiera się na ON DELETE CASCADE
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
 
 
+def make_engine(url: str) -> Engine:
+    new_engine = create_engine(url, pool_pre_ping=True, **pool_options(url, False))
+    if new_engine.dialect.name == "sqlite":
+        event.listen(new_engine, "connect", sqlite_on_connect)
+    return new_engine
+
+
+def make_async_engine(url: str) -> AsyncEngine:
+    new_engine = create_async_engine(
+        to_async_url(url), pool_pre_ping=True, **pool_options(url, True)
+    )
+    if new_engine.dialect.name == "sqlite":
+        event.listen(new_engine.sync_engine, "connect", sqlite_on_connect)
+    return new_engine
+
+
+engine = make_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 
+async_engine = make_async_engine(DATABASE_URL) if DB_ASYNC else None
+
+AsyncSessionLocal = (
+    async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    if DB_ASYNC
+    else None
+)
+
+
+replicas = ReplicaSet(
+    Replica(
+        name=f"replica{i}",
+        engine=make_engine(url),
+        async_engine=make_async_engine(url) if DB_ASYNC else None,
+    )
+    for i, url in enumerate(DATABASE_REPLICA_URLS)
+)
+
+
 
 class Base(DeclarativeBase):
     pass
 
 
 
-def get_db():
-    db = SessionLocal()
+# sync Session z interfejsem AsyncSession - każde wywołanie DB idzie do threadpoola
+class ThreadedSession:
+    def __init__(self, session: Session) -> None:
+        self.sync_session = session
+
+    def add(self, obj: Any) -> None:
+        self.sync_session.add(obj)
+
+    def add_all(self, objs: Any) -> None:
+        self.sync_session.add_all(objs)
+
+    async def get(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def execute(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+
+    async def scalars(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.scalars, *args, **kwargs)
+
+    async def scalar(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.scalar, *args, **kwargs)
+
+    async def stream_scalars(self, *args: Any, **kwargs: Any) -> "ThreadedScalarResult":
+        result = await run_in_threadpool(self.sync_session.scalars, *args, **kwargs)
+        return ThreadedScalarResult(result)
+
+    async def delete(self, obj: Any) -> None:
+        await run_in_threadpool(self.sync_session.delete, obj)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def refresh(self, obj: Any) -> None:
+        await run_in_threadpool(self.sync_session.refresh, obj)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+
+class ThreadedScalarResult:
+    def __init__(self, result: Any) -> None:
+        self._result = result
+
+    async def partitions(self, size: Optional[int] = None) -> AsyncIterator[Sequence[Any]]:
+        while True:
+            part = await run_in_threadpool(self._result.fetchmany, size)
+            if not part:
+                break
+            yield part
+
+
+DbSession = Union[AsyncSession, ThreadedSession]
+
+
+
+@asynccontextmanager
+async def session_scope(replica: Optional[Replica] = None) -> AsyncIterator[DbSession]:
+    # replica=None -> primary
+    if DB_ASYNC:
+        bind = replica.async_engine if replica is not None else async_engine
+        async with AsyncSessionLocal(bind=bind) as db:
+            yield db
+        return
+
+    bind = replica.engine if replica is not None else engine
+    db = ThreadedSession(SessionLocal(bind=bind, expire_on_commit=False))
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
+
+
+
+def read_replica(request: Request) -> Optional[Replica]:
+    # GET bez świeżego zapisu klienta -> kolejna zdrowa replika, reszta -> primary
+    if not replicas or wants_primary(request):
+        return None
+    return replicas.pick()
+
+
+# /batch z transaction=true podaje pod-żądaniom wspólną sesję w scope (zamyka ją sam /batch)
+SHARED_SESSION = "taskapi.shared_session"
+
+
+def shared_session(request: Request) -> Optional[DbSession]:
+    return request.scope.get(SHARED_SESSION)
+
+
+async def get_db(
+    request: Request, replica: Optional[Replica] = Depends(read_replica)
+) -> AsyncIterator[DbSession]:
+    shared = shared_session(request)
+    if shared is not None:
+        yield shared
+        return
+    async with session_scope(replica) as db:
+        yield db
+
+
+@asynccontextmanager
+async def outer_transaction() -> AsyncIterator[DbSession]:
+    # Jedna transakcja na wiele handlerów: ich commit()/rollback() dotyczy tylko SAVEPOINT-u,
+    # całość commituje wyjście bez wyjątku, wyjątek cofa wszystko. Zawsze primary.
+    # sqlite: jawny BEGIN - pysqlite nie otwiera transakcji przed SAVEPOINT (RELEASE by commitował)
+    if DB_ASYNC:
+        async with async_engine.begin() as conn:
+            if conn.dialect.name == "sqlite":
+                await conn.exec_driver_sql("BEGIN")
+            async with AsyncSessionLocal(
+                bind=conn, join_transaction_mode="create_savepoint"
+            ) as db:
+                yield db
+        return
+
+    conn = await run_in_threadpool(engine.connect)
+    try:
+        trans = await run_in_threadpool(conn.begin)
+        if conn.dialect.name == "sqlite":
+            await run_in_threadpool(conn.exec_driver_sql, "BEGIN")
+        db = ThreadedSession(
+            SessionLocal(
+                bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False
+            )
+        )
+        try:
+            yield db
+        except BaseException:
+            await db.close()
+            await run_in_threadpool(trans.rollback)
+            raise
+        await db.close()
+        await run_in_threadpool(trans.commit)
+    finally:
+        await run_in_threadpool(conn.close)
+
+
+
+async def create_all() -> None:
+    if DB_ASYNC:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    else:
+        await run_in_threadpool(Base.metadata.create_all, bind=engine)
@@ -1,16 +1,18 @@
 from __future__ import annotations
 
+from typing import Tuple
+
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 
-from .db import get_db
+from .db import DbSession, get_db
 from .models import Comment, Project, Task, User
 
 
 
 
-def get_project(project_id: int, db: Session = Depends(get_db)) -> Project:
-    project = db.get(Project, project_id)
+async def get_project(project_id: int, db: DbSession = Depends(get_db)) -> Project:
+    project = await db.get(Project, project_id)
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -21,11 +23,13 @@ def get_project(project_id: int, db: Session = Depends(get_db)) -> Project:
 
 
 
-def get_task(
-    project_id: int, task_id: int, db: Session = Depends(get_db)
+async def get_task(
+    project_id: int, task_id: int, db: DbSession = Depends(get_db)
 ) -> Task:
-    task = db.get(Task, task_id)
-    if not task or task.project_id != project_id:
+    task = await db.scalar(
+        select(Task).where(Task.id == task_id, Task.project_id == project_id)
+    )
+    if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found in this project",
@@ -35,8 +39,8 @@ def get_task(
 
 
 
-def get_user(user_id: int, db: Session = Depends(get_db)) -> User:
-    user = db.get(User, user_id)
+async def get_user(user_id: int, db: DbSession = Depends(get_db)) -> User:
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -47,23 +51,47 @@ def get_user(user_id: int, db: Session = Depends(get_db)) -> User:
 
 
 
-def get_comment(
-    project_id: int, task_id: int, comment_id: int, db: Session = Depends(get_db)
+async def get_comment(
+    project_id: int, task_id: int, comment_id: int, db: DbSession = Depends(get_db)
 ) -> Comment:
-    comment = db.get(Comment, comment_id)
+    # cały łańcuch projekt/task/komentarz w jednym SELECT
+    comment = await db.scalar(
+        select(Comment)
+        .join(Task, Task.id == Comment.task_id)
+        .where(
+            Comment.id == comment_id,
+            Comment.task_id == task_id,
+            Task.project_id == project_id,
+        )
+    )
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Comment not found",
+            detail="Comment not found for this task/project",
         )
+    return comment
 
 
 
 
-    task = db.get(Task, comment.task_id)
-    if not task or task.id != task_id or task.project_id != project_id:
+async def get_project_and_user(
+    project_id: int, user_id: int, db: DbSession
+) -> Tuple[Project, User]:
+    row = (
+        await db.execute(
+            select(Project, User)
+            .outerjoin(User, User.id == user_id)
+            .where(Project.id == project_id)
+        )
+    ).first()
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Comment not found for this task/project",
+            detail="Project not found",
         )
-    return comment
+    if not row.User:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+    return row.Project, row.User
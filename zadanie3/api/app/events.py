@@ -0,0 +1,394 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import selectors
+import threading
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, delete, event, func, insert, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .db import DbSession, async_engine, engine, session_scope
+from .fastjson import row_items
+from .models import EVENTS_CHANNEL, Project, ProjectEvent
+
+
+
+
+EVENTS_BUFFER = int(os.getenv("EVENTS_BUFFER", "256"))  # ostatnie zdarzenia per projekt w pamięci
+# projekty z buforem; nadmiarowe wypadają od najdawniej aktywnych (bez czekających)
+EVENTS_BUFFER_PROJECTS = int(os.getenv("EVENTS_BUFFER_PROJECTS", "1000"))
+# outbox: zdarzenia starsze niż retencja (s) usuwa zadanie w tle; 0 = bez czyszczenia
+EVENTS_RETENTION = float(os.getenv("EVENTS_RETENTION", str(7 * 24 * 3600)))
+EVENTS_PRUNE_INTERVAL = float(os.getenv("EVENTS_PRUNE_INTERVAL", "3600"))
+EVENTS_PRUNE_CHUNK = int(os.getenv("EVENTS_PRUNE_CHUNK", "5000"))
+EVENTS_INSERT_CHUNK = 1000
+EVENTS_LOCK = 6576  # przestrzeń kluczy pg_advisory_xact_lock(EVENTS_LOCK, project_id)
+
+EVENT_COLUMNS = (
+    ProjectEvent.id,
+    ProjectEvent.project_id,
+    ProjectEvent.entity,
+    ProjectEvent.entity_id,
+    ProjectEvent.op,
+    ProjectEvent.created_at,
+)
+
+log = logging.getLogger("taskapi.events")
+
+
+
+
+def record(db: DbSession, project_id: int, entity: str, entity_id: int, op: str) -> None:
+    # INSERT do outboxa leci w tej samej transakcji co zmiana (flush przy commit)
+    db.add(ProjectEvent(project_id=project_id, entity=entity, entity_id=entity_id, op=op))
+
+
+def record_rows(
+    conn: Connection,
+    entity: str,
+    rows: Sequence[Tuple[int, int]],
+    op: str,
+    lock: bool = True,
+) -> List[Dict[str, Any]]:
+    # record() dla zapisów przez Core (import): (project_id, entity_id) w transakcji conn;
+    # publish_events(wynik) po commicie. lock=False tylko dla projektów z tej transakcji
+    if lock:
+        lock_event_projects(conn, (project_id for project_id, _ in rows))
+    events: List[Dict[str, Any]] = []
+    for i in range(0, len(rows), EVENTS_INSERT_CHUNK):
+        result = conn.execute(
+            insert(ProjectEvent).returning(*EVENT_COLUMNS),
+            [
+                {"project_id": project_id, "entity": entity, "entity_id": entity_id, "op": op}
+                for project_id, entity_id in rows[i:i + EVENTS_INSERT_CHUNK]
+            ],
+        )
+        events += row_items(result.all(), EVENT_COLUMNS)
+    return events
+
+
+def event_dict(e: Any) -> Dict[str, Any]:
+    return {c.key: getattr(e, c.key) for c in EVENT_COLUMNS}
+
+
+
+
+@dataclass
+class RecentEvents:
+    events: Deque[Dict[str, Any]]
+    floor: int  # bufor ma komplet zdarzeń projektu o id > floor (starsze wypadły)
+
+
+# Szyna w procesie: subskrybent bez zdarzeń to jeden future w zbiorze projektu - nic nie
+# odpytuje bazy. Zdarzenie budzi tylko czekających na jego projekt.
+class ChangeBus:
+    def __init__(self, buffer: int = EVENTS_BUFFER, projects: int = EVENTS_BUFFER_PROJECTS) -> None:
+        self.buffer = buffer
+        self.projects = projects
+        self.remote = False  # True: zdarzenia przychodzą z LISTEN (postgres), nie z after_commit
+        self.evicted = 0  # najwyższe id z wyrzuconych buforów
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._recent: "OrderedDict[int, RecentEvents]" = OrderedDict()
+        self._waiters: Dict[int, Set[asyncio.Future]] = defaultdict(set)
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        # wołane z wątku threadpoola (after_commit) albo wątku LISTEN
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._deliver, event)
+
+    def wake_all(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake_all)
+
+    def _deliver(self, event: Dict[str, Any]) -> None:
+        project_id = event["project_id"]
+        recent = self._recent.get(project_id)
+        if recent is None:
+            # wcześniejsze zdarzenia projektu (sprzed startu, z wyrzuconego bufora) są w bazie
+            recent = self._recent[project_id] = RecentEvents(
+                deque(maxlen=self.buffer), event["id"] - 1
+            )
+            self._evict()
+        elif len(recent.events) == self.buffer:
+            recent.floor = recent.events[0]["id"]
+        recent.events.append(event)
+        self._recent.move_to_end(project_id)
+        if event["entity"] == "project" and event["op"] == "deleted":
+            # usunięty projekt nie dostanie już zdarzeń - pierwszy do wyrzucenia
+            self._recent.move_to_end(project_id, last=False)
+        for waiter in self._waiters.pop(project_id, ()):
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _evict(self) -> None:
+        # LRU z pominięciem projektów, na które ktoś czeka (ich bufor zaraz będzie czytany)
+        excess = len(self._recent) - self.projects
+        for project_id in list(self._recent):
+            if excess <= 0:
+                break
+            if project_id in self._waiters:
+                continue
+            recent = self._recent.pop(project_id)
+            self.evicted = max(self.evicted, recent.events[-1]["id"] if recent.events else 0)
+            excess -= 1
+
+    def _wake_all(self) -> None:
+        # po zerwaniu LISTEN mogły przepaść powiadomienia - czekający doczytają z bazy
+        waiters, self._waiters = self._waiters, defaultdict(set)
+        for project_waiters in waiters.values():
+            for waiter in project_waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    def waiter(self, project_id: int) -> asyncio.Future:
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[project_id].add(waiter)
+        return waiter
+
+    def discard(self, project_id: int, waiter: asyncio.Future) -> None:
+        waiters = self._waiters.get(project_id)
+        if waiters is not None:
+            waiters.discard(waiter)
+            if not waiters:
+                del self._waiters[project_id]
+
+    def recent(self, project_id: int, since: int) -> Optional[List[Dict[str, Any]]]:
+        # None = bufor nie ma kompletu po since (wypadł albo wyrzucony) - czytać z bazy.
+        # Bez LISTEN zdarzenia publikują wątki after_commit w dowolnej kolejności: czytelnik
+        # obudzony przez N+1 przeskoczyłby N, który jest już w bazie, ale nie w buforze
+        if not self.remote:
+            return None
+        recent = self._recent.get(project_id)
+        if recent is None:
+            return [] if since >= self.evicted else None
+        if since < recent.floor:
+            return None
+        events = [e for e in recent.events if e["id"] > since]
+        return sorted(events, key=lambda e: e["id"])
+
+    def buffered_projects(self) -> int:
+        return len(self._recent)
+
+    def subscribers(self) -> int:
+        return sum(len(w) for w in self._waiters.values())
+
+
+change_bus = ChangeBus()
+
+
+
+
+@event.listens_for(Session, "before_flush")
+def _order_events(session: Session, flush_context: Any, instances: Any) -> None:
+    # Kursor to id > since, a id z sekwencji nadaje INSERT - transakcje commitowane w innej
+    # kolejności (N po N+1) zgubiłyby N klientowi, który widział już N+1. Na postgresie
+    # INSERT zdarzenia czeka na blokadę projektu trzymaną do końca transakcji: w obrębie
+    # projektu kolejność id = kolejność commitów (sqlite ma jednego piszącego naraz).
+    projects = [o.project_id for o in session.new if isinstance(o, ProjectEvent)]
+    if projects and session.get_bind().dialect.name == "postgresql":
+        lock_event_projects(session.connection(), projects)
+
+
+def lock_event_projects(conn: Connection, project_ids: Iterable[int]) -> None:
+    # po kolei wg project_id - dwie transakcje nie zakleszczą się na jednym zestawie
+    if conn.dialect.name == "postgresql":
+        for project_id in sorted(set(project_ids)):
+            conn.execute(select(func.pg_advisory_xact_lock(EVENTS_LOCK, project_id)))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_events(session: Session, flush_context: Any) -> None:
+    # w after_flush session.new to jeszcze stan sprzed flush, ale id są już nadane
+    new = [o for o in session.new if isinstance(o, ProjectEvent)]
+    if new:
+        session.info.setdefault("project_events", []).extend(new)
+
+
+def publish_events(events: Iterable[Dict[str, Any]]) -> None:
+    # na postgresie publikuje LISTEN (także zdarzenia tej instancji)
+    if not change_bus.remote:
+        for e in events:
+            change_bus.publish(e)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_events(session: Session) -> None:
+    events = [event_dict(e) for e in session.info.pop("project_events", ())]
+    held = session.info.get("held_events")
+    if held is not None:
+        # commit sesji w transakcji /batch to tylko SAVEPOINT - publikuje /batch po commicie
+        held.extend(events)
+        return
+    publish_events(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_events(session: Session) -> None:
+    session.info.pop("project_events", None)
+
+
+
+
+class PostgresListener:
+    # LISTEN w osobnym wątku na własnym połączeniu; NOTIFY z triggera na project_events
+    def __init__(self, engine: Engine, bus: ChangeBus) -> None:
+        self.engine = engine
+        self.bus = bus
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.bus.remote = True
+        self._thread = threading.Thread(target=self._run, name="pg-listen", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                log.warning("LISTEN %s failed, reconnecting", EVENTS_CHANNEL, exc_info=True)
+                self._stop.wait(1.0)
+            self.bus.wake_all()
+
+    def _listen(self) -> None:
+        conn = self.engine.raw_connection()
+        try:
+            dbapi = conn.driver_connection
+            dbapi.autocommit = True
+            with dbapi.cursor() as cursor:
+                cursor.execute(f"LISTEN {EVENTS_CHANNEL}")
+            with selectors.DefaultSelector() as selector:
+                selector.register(dbapi, selectors.EVENT_READ)
+                while not self._stop.is_set():
+                    if not selector.select(timeout=1.0):
+                        continue
+                    dbapi.poll()
+                    while dbapi.notifies:
+                        self.bus.publish(json.loads(dbapi.notifies.pop(0).payload))
+        finally:
+            conn.invalidate()  # połączenie w trybie LISTEN/autocommit nie wraca do puli
+
+
+
+
+def _read_sync(stmt: Select) -> List[Any]:
+    with engine.connect() as conn:
+        return conn.execute(stmt).all()
+
+
+async def _read(stmt: Select) -> List[Any]:
+    # Zawsze primary (replika mogłaby nie mieć zdarzeń, które szyna już ogłosiła) i bez sesji:
+    # w trybie sync zapytanie i zwrot połączenia do puli to jedno wejście do threadpoola -
+    # setki równoległych long-polli nie trzymają połączeń czekając na wątek do close()
+    if async_engine is not None:
+        async with async_engine.connect() as conn:
+            return (await conn.execute(stmt)).all()
+    return await run_in_threadpool(_read_sync, stmt)
+
+
+async def fetch_events(project_id: int, since: int, limit: int) -> List[Dict[str, Any]]:
+    rows = await _read(
+        select(*EVENT_COLUMNS)
+        .where(ProjectEvent.project_id == project_id, ProjectEvent.id > since)
+        .order_by(ProjectEvent.id)
+        .limit(limit)
+    )
+    return row_items(rows, EVENT_COLUMNS)
+
+
+async def start_cursor(project_id: int, since: Optional[int]) -> int:
+    # bez since: od bieżącego końca (tylko nowe zdarzenia). Projekt bez zdarzeń musi istnieć;
+    # usunięty projekt nadal ma swoje zdarzenia (łącznie z "deleted")
+    if since is not None:
+        return since
+    last, exists = (
+        await _read(
+            select(
+                select(func.max(ProjectEvent.id))
+                .where(ProjectEvent.project_id == project_id)
+                .scalar_subquery(),
+                select(Project.id).where(Project.id == project_id).exists(),
+            )
+        )
+    )[0]
+    if last is None and not exists:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    return last or 0
+
+
+async def next_events(
+    project_id: int, since: int, limit: int, timeout: float, catch_up: bool = True
+) -> List[Dict[str, Any]]:
+    # waiter rejestrowany przed odczytem - zdarzenie zacommitowane w międzyczasie i tak go
+    # obudzi; połączenie z bazą nie jest trzymane podczas czekania.
+    # catch_up=False (kolejne obroty SSE): bufor w pamięci, baza tylko gdy bufor nie ma kompletu
+    waiter = change_bus.waiter(project_id)
+    try:
+        events = None if catch_up else change_bus.recent(project_id, since)
+        if events is None:
+            events = await fetch_events(project_id, since, limit)
+        events = events[:limit]
+        if events or timeout <= 0:
+            return events
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            return []
+        return (change_bus.recent(project_id, since) or [])[:limit] or await fetch_events(
+            project_id, since, limit
+        )
+    finally:
+        change_bus.discard(project_id, waiter)
+
+
+
+
+async def prune_events(before: datetime, chunk: int = EVENTS_PRUNE_CHUNK) -> int:
+    # Partiami po id (PK, od najstarszych) - każda partia w osobnej transakcji, bez długich
+    # blokad. Kursor starszy niż retencja wznawia od najstarszego zachowanego zdarzenia.
+    old = (
+        select(ProjectEvent.id)
+        .where(ProjectEvent.created_at < before)
+        .order_by(ProjectEvent.id)
+        .limit(chunk)
+    )
+    deleted = 0
+    async with session_scope() as db:
+        while True:
+            result = await db.execute(delete(ProjectEvent).where(ProjectEvent.id.in_(old)))
+            await db.commit()
+            deleted += result.rowcount
+            if result.rowcount < chunk:
+                return deleted
+
+
+async def watch_events(
+    interval: float = EVENTS_PRUNE_INTERVAL, retention: float = EVENTS_RETENTION
+) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            deleted = await prune_events(
+                datetime.now(timezone.utc) - timedelta(seconds=retention)
+            )
+            if deleted:
+                log.info("pruned %d project events older than %.0fs", deleted, retention)
+        except Exception:
+            log.exception("project events prune failed")
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import csv
+import io
+from typing import Any, AsyncIterator, Callable, Literal, Optional
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select
+
+from .db import session_scope
+from .replicas import Replica
+
+
+
+
+ExportFormat = Literal["ndjson", "csv"]
+
+EXPORT_BATCH = 1000
+
+# eksport bez _links (to_out wołane z links=False)
+NO_LINKS = {"links"}
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+
+
+def csv_chunk(rows: list[list[Any]]) -> str:
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerows(rows)
+    return buf.getvalue()
+
+
+
+
+def export_response(
+    stmt: Select,
+    to_out: Callable[[Any], BaseModel],
+    model: type[BaseModel],
+    fmt: ExportFormat,
+    filename: str,
+    replica: Optional[Replica] = None,
+) -> StreamingResponse:
+    fields = [f for f in model.model_fields if f not in NO_LINKS]
+
+    async def body() -> AsyncIterator[str]:
+        if fmt == "csv":
+            yield csv_chunk([fields])
+
+        # własna sesja - zależność get_db jest zamykana zanim ruszy stream
+        async with session_scope(replica) as db:
+            result = await db.stream_scalars(stmt.execution_options(yield_per=EXPORT_BATCH))
+            async for part in result.partitions():
+                if fmt == "csv":
+                    outs = [to_out(obj).model_dump(mode="json", exclude=NO_LINKS) for obj in part]
+                    yield csv_chunk(
+                        [["" if o[f] is None else o[f] for f in fields] for o in outs]
+                    )
+                else:
+                    yield "".join(
+                        to_out(obj).model_dump_json(exclude=NO_LINKS) + "\n" for obj in part
+                    )
+
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
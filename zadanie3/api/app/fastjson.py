@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import json
+from datetime import date
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+from fastapi import Response
+
+try:  # orjson opcjonalnie - bez niego zostaje json ze stdlib (ten sam wynik, wolniej)
+    import orjson
+except ImportError:
+    orjson = None
+
+
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, date):
+        # datetime z UTC -> "Z", tak jak pydantic
+        text = obj.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    # bajt w bajt to samo co response_model + JSONResponse (kompaktowo, bez ensure_ascii)
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_UTC_Z)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+
+
+def row_items(
+    rows: Iterable[Sequence[Any]],
+    columns: Sequence[Any],
+    links: Optional[Callable[[Any], dict]] = None,
+) -> List[dict]:
+    # wiersze z select(*columns, ...) prosto do dictów - bez modelu *Out i ponownej walidacji;
+    # kolumny spoza `columns` (np. version pod ETag) są na końcu i zip je pomija
+    keys = [c.key for c in columns]
+    if links is None:
+        return [dict(zip(keys, r)) for r in rows]
+    return [{**dict(zip(keys, r)), "_links": links(r)} for r in rows]
+
+
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
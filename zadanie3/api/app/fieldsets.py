@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import joinedload, load_only
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .conditional import collection_etag
+from .db import DbSession
+from .hateoas import (
+    comment_links,
+    comments_list_links,
+    member_links,
+    members_list_links,
+    project_links,
+    task_links,
+    tasks_list_links,
+)
+from .models import Comment, Project, ProjectMember, Task, User
+
+
+
+
+# Kolumny wyjściowe w kolejności pól schematów *Out - z nich serializujemy listy
+# (row_items) i nimi zawężamy ?fields=.
+PROJECT_COLUMNS = (
+    Project.id,
+    Project.name,
+    Project.description,
+    Project.start_date,
+    Project.planned_end_date,
+)
+TASK_COLUMNS = (
+    Task.id,
+    Task.project_id,
+    Task.name,
+    Task.description,
+    Task.priority,
+    Task.due_date,
+)
+COMMENT_COLUMNS = (Comment.id, Comment.task_id, Comment.content, Comment.created_at)
+USER_COLUMNS = (User.id, User.name, User.email)
+MEMBER_COLUMNS = (User.id.label("user_id"), User.name, User.email)
+
+FIELDS = {
+    "projects": tuple(c.key for c in PROJECT_COLUMNS),
+    "tasks": tuple(c.key for c in TASK_COLUMNS),
+    "comments": tuple(c.key for c in COMMENT_COLUMNS),
+    "members": tuple(c.key for c in MEMBER_COLUMNS),
+}
+
+# klucz zawsze obecny (linki, ETag, powiązania)
+ALWAYS = {"projects": "id", "tasks": "id", "comments": "id", "members": "user_id"}
+
+# ?include= osadza najwyżej tyle elementów na rodzica; dalej prowadzi link <zasób>_next
+# do paginowanej listy (task z 400k komentarzy nie trafia w całości do jednej odpowiedzi)
+EMBED_LIMIT = 20
+
+
+
+
+@dataclass(frozen=True)
+class View:
+    # fields: zasób -> wybrane pola (w kolejności schematu); brak wpisu = wszystkie
+    include: FrozenSet[str] = frozenset()
+    fields: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.include or self.fields)
+
+    def keys(self, resource: str) -> Tuple[str, ...]:
+        return self.fields.get(resource, FIELDS[resource])
+
+    def key(self) -> str:
+        # stabilna postać do ETagu
+        return repr((sorted(self.include), sorted(self.fields.items())))
+
+
+def _split(raw: Optional[str]) -> List[str]:
+    return [p.strip() for p in (raw or "").split(",") if p.strip()]
+
+
+def make_view(
+    allowed_include: Iterable[str],
+    include: Optional[str],
+    fields: Dict[str, Optional[str]],
+) -> View:
+    included = set(_split(include))
+    unknown = included - set(allowed_include)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown include: {', '.join(sorted(unknown))}",
+        )
+    if "comments" in included and "tasks" in allowed_include:
+        included.add("tasks")  # komentarze projektu są zagnieżdżone w taskach
+
+    chosen: Dict[str, Tuple[str, ...]] = {}
+    for resource, raw in fields.items():
+        names = set(_split(raw))
+        if not names:
+            continue
+        unknown = names - set(FIELDS[resource])
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown field(s) for {resource}: {', '.join(sorted(unknown))}",
+            )
+        names.add(ALWAYS[resource])
+        chosen[resource] = tuple(k for k in FIELDS[resource] if k in names)
+    return View(frozenset(included), chosen)
+
+
+def project_view(
+    fields: Optional[str] = Query(None, description="np. id,name"),
+    include: Optional[str] = Query(None, description="tasks,members,comments"),
+    task_fields: Optional[str] = Query(None, alias="fields[tasks]"),
+    member_fields: Optional[str] = Query(None, alias="fields[members]"),
+    comment_fields: Optional[str] = Query(None, alias="fields[comments]"),
+) -> View:
+    return make_view(
+        ("tasks", "members", "comments"),
+        include,
+        {
+            "projects": fields,
+            "tasks": task_fields,
+            "members": member_fields,
+            "comments": comment_fields,
+        },
+    )
+
+
+def task_view(
+    fields: Optional[str] = Query(None, description="np. id,name,priority"),
+    include: Optional[str] = Query(None, description="comments"),
+    comment_fields: Optional[str] = Query(None, alias="fields[comments]"),
+) -> View:
+    return make_view(("comments",), include, {"tasks": fields, "comments": comment_fields})
+
+
+
+
+# Ładowanie: load_only na wybranych kolumnach (+ version pod ETag); osadzone kolekcje
+# po zapytaniu głównym (load_*_includes) - jedno zapytanie na poziom niezależnie od liczby
+# wierszy, z każdego rodzica najwyżej EMBED_LIMIT + 1 dzieci (+1 = jest następna strona).
+def _attrs(model: Any, view: View, resource: str, *extra: Any) -> List[Any]:
+    return [getattr(model, k) for k in view.keys(resource)] + [model.version, *extra]
+
+
+def project_options(view: View) -> List[Any]:
+    return [load_only(*_attrs(Project, view, "projects"))]
+
+
+def task_options(view: View, *extra: Any) -> List[Any]:
+    return [load_only(*_attrs(Task, view, "tasks", Task.project_id, *extra))]
+
+
+def _first_per_parent(
+    model: Any, parent: Any, keys: Sequence[Any], parent_ids: Sequence[int]
+) -> Any:
+    # row_number() w partycji rodzica po ostatniej kolumnie klucza (kolejność jak w liście
+    # i ?after= paginowanej trasy), zwracamy tylko EMBED_LIMIT + 1 pierwszych
+    rank = func.row_number().over(partition_by=parent, order_by=keys[-1]).label("rank")
+    ranked = select(*keys, rank).where(parent.in_(parent_ids)).subquery()
+    return (
+        select(model)
+        .join(ranked, and_(*(ranked.c[k.key] == k for k in keys)))
+        .where(ranked.c.rank <= EMBED_LIMIT + 1)
+        .order_by(parent, keys[-1])
+    )
+
+
+async def _fill(db: DbSession, parents: Sequence[Any], attr: str, parent_key: str, stmt: Any) -> None:
+    children: Dict[int, List[Any]] = defaultdict(list)
+    for child in (await db.scalars(stmt)).all():
+        children[getattr(child, parent_key)].append(child)
+    for p in parents:
+        set_committed_value(p, attr, children.get(p.id, []))
+
+
+async def load_task_includes(db: DbSession, tasks: Sequence[Task], view: View) -> None:
+    if "comments" not in view.include or not tasks:
+        return
+    stmt = _first_per_parent(Comment, Comment.task_id, [Comment.id], [t.id for t in tasks])
+    stmt = stmt.options(load_only(*_attrs(Comment, view, "comments", Comment.task_id)))
+    await _fill(db, tasks, "comments", "task_id", stmt)
+
+
+async def load_project_includes(db: DbSession, projects: Sequence[Project], view: View) -> None:
+    if not projects:
+        return
+    ids = [p.id for p in projects]
+    if "tasks" in view.include:
+        stmt = _first_per_parent(Task, Task.project_id, [Task.id], ids)
+        stmt = stmt.options(*task_options(view))
+        await _fill(db, projects, "tasks", "project_id", stmt)
+        await load_task_includes(db, [t for p in projects for t in p.tasks], view)
+    if "members" in view.include:
+        user_cols = [getattr(User, k) for k in view.keys("members") if k != "user_id"]
+        stmt = _first_per_parent(
+            ProjectMember,
+            ProjectMember.project_id,
+            [ProjectMember.project_id, ProjectMember.user_id],
+            ids,
+        )
+        stmt = stmt.options(joinedload(ProjectMember.user).load_only(*user_cols, User.version))
+        await _fill(db, projects, "members", "project_id", stmt)
+
+
+
+
+def _pick(obj: Any, keys: Iterable[str]) -> Dict[str, Any]:
+    return {k: getattr(obj, k) for k in keys}
+
+
+def comment_dict(project_id: int, c: Comment, view: View, links: bool) -> Dict[str, Any]:
+    out = _pick(c, view.keys("comments"))
+    if links:
+        out["_links"] = comment_links(project_id, c.task_id, c.id)
+    return out
+
+
+def member_dict(project_id: int, m: ProjectMember, view: View, links: bool) -> Dict[str, Any]:
+    out = {k: m.user_id if k == "user_id" else getattr(m.user, k) for k in view.keys("members")}
+    if links:
+        out["_links"] = member_links(project_id, m.user_id)
+    return out
+
+
+def _with_links(out: Dict[str, Any], links: Optional[Dict[str, Any]], more: Dict[str, Any]) -> None:
+    # link do dalszej części osadzonej kolekcji jest zawsze - bez niego obcięcie byłoby ciche
+    if links is not None or more:
+        out["_links"] = {**(links or {}), **more}
+
+
+def task_dict(t: Task, view: View, links: bool) -> Dict[str, Any]:
+    out = _pick(t, view.keys("tasks"))
+    more = {}
+    if "comments" in view.include:
+        comments = t.comments[:EMBED_LIMIT]
+        out["comments"] = [comment_dict(t.project_id, c, view, links) for c in comments]
+        if len(t.comments) > EMBED_LIMIT:
+            nxt = comments_list_links(t.project_id, t.id, EMBED_LIMIT, comments[-1].id)
+            more["comments_next"] = nxt["next"]
+    _with_links(out, task_links(t.project_id, t.id) if links else None, more)
+    return out
+
+
+def project_dict(p: Project, view: View, links: bool) -> Dict[str, Any]:
+    out = _pick(p, view.keys("projects"))
+    more = {}
+    if "tasks" in view.include:
+        tasks = p.tasks[:EMBED_LIMIT]
+        out["tasks"] = [task_dict(t, view, links) for t in tasks]
+        if len(p.tasks) > EMBED_LIMIT:
+            more["tasks_next"] = tasks_list_links(p.id, EMBED_LIMIT, tasks[-1].id)["next"]
+    if "members" in view.include:
+        members = p.members[:EMBED_LIMIT]
+        out["members"] = [member_dict(p.id, m, view, links) for m in members]
+        if len(p.members) > EMBED_LIMIT:
+            nxt = members_list_links(p.id, EMBED_LIMIT, members[-1].user_id)
+            more["members_next"] = nxt["next"]
+    _with_links(out, project_links(p.id) if links else None, more)
+    return out
+
+
+
+
+# osadzone zasoby mają własne wersje - ich skróty wchodzą do ETagu obok wierszy głównych
+def _embedded_etags(view: View, tasks: List[Task], users: List[User]) -> List[str]:
+    parts = []
+    if "tasks" in view.include:
+        parts.append(collection_etag(tasks))
+    if "comments" in view.include:
+        parts.append(collection_etag(c for t in tasks for c in t.comments))
+    if "members" in view.include:
+        parts.append(collection_etag(users))
+    return parts
+
+
+def projects_etag(projects: List[Project], view: View, *extra: Any) -> str:
+    tasks = [t for p in projects for t in p.tasks] if "tasks" in view.include else []
+    users = [m.user for p in projects for m in p.members] if "members" in view.include else []
+    return collection_etag(projects, view.key(), *extra, *_embedded_etags(view, tasks, users))
+
+
+def tasks_etag(tasks: List[Task], view: View, *extra: Any) -> str:
+    return collection_etag(tasks, view.key(), *extra, *_embedded_etags(view, tasks, []))
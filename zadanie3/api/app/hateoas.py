@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Literal, Optional, Sequence, Tuple, Union
+from urllib.parse import urlencode
+
+from fastapi import Query
 
 Links = Dict[str, Dict[str, Any]]
 
@@ -8,122 +11,303 @@ Links = Dict[str, Dict[str, Any]]
 
 
 
+# Szablony linków: rel -> (nazwa trasy, metoda). Ścieżki bierzemy raz, przy starcie,
+# z tras zarejestrowanych w aplikacji (prefiksy routerów) - per element tylko podstawiamy id.
+class LinkTemplate:
+    registry: List["LinkTemplate"] = []
+
+    def __init__(self, /, **rels: Tuple[str, str]) -> None:
+        self.rels = rels
+        self._compiled: Optional[List[Tuple[str, str, str]]] = None
+        LinkTemplate.registry.append(self)
+
+    def compile(self, paths: Dict[str, str]) -> None:
+        self._compiled = [(rel, paths[name], method) for rel, (name, method) in self.rels.items()]
+
+    def __call__(self, **ids: int) -> Links:
+        if self._compiled is None:
+            raise RuntimeError("Szablony linków nie są skompilowane (compile_links)")
+        return {
+            rel: {"href": path.format_map(ids), "method": method}
+            for rel, path, method in self._compiled
+        }
+
+
+def compile_links(routes: Iterable[Any]) -> None:
+    paths = {r.name: r.path for r in routes if hasattr(r, "path")}
+    for template in LinkTemplate.registry:
+        template.compile(paths)
+
+
+def links_param(links: Literal["all", "none"] = Query("all")) -> bool:
+    # ?links=none -> listy bez _links per element (linki kolekcji zostają)
+    return links == "all"
+
+
+
+
 def link(href: str, method: str = "GET") -> Dict[str, Any]:
     return {"href": href, "method": method}
 
 
+def with_next(
+    links: Links,
+    limit: int,
+    next_after: Union[int, str, None],
+    params: Sequence[Tuple[str, str]] = (),
+) -> Links:
+    # int -> ?after=<id>, str -> ?cursor=<kursor keyset>; params = filtry/sort listy
+    if next_after is not None:
+        cursor = "after" if isinstance(next_after, int) else "cursor"
+        query = urlencode([*params, ("limit", limit), (cursor, next_after)])
+        links["next"] = link(f"{links['self']['href']}?{query}")
+    return links
+
+
+ROOT = LinkTemplate(
+    self=("root", "GET"),
+    health=("health", "GET"),
+    projects=("list_projects", "GET"),
+    users=("list_users", "GET"),
+    batch=("run_requests", "POST"),
+)
+
+
 def root_links() -> Links:
-    return {
-        "self": link("/"),
-        "health": link("/health"),
-        "projects": link("/projects"),
-        "users": link("/users"),
-    }
+    return ROOT()
 
 
 
 
 
 # -------- Projects --------
+PROJECT = LinkTemplate(
+    self=("get_project_details", "GET"),
+    collection=("list_projects", "GET"),
+    tasks=("list_tasks", "GET"),
+    members=("list_members", "GET"),
+    stats=("get_project_stats", "GET"),
+    update=("replace_project", "PUT"),
+    delete=("delete_project", "DELETE"),
+)
+
+PROJECTS = LinkTemplate(
+    self=("list_projects", "GET"),
+    create=("create_project", "POST"),
+)
+
+
 def project_links(project_id: int) -> Links:
-    return {
-        "self": link(f"/projects/{project_id}"),
-        "collection": link("/projects"),
-        "tasks": link(f"/projects/{project_id}/tasks"),
-        "members": link(f"/projects/{project_id}/members"),
-        "update": link(f"/projects/{project_id}", "PUT"),
-        "delete": link(f"/projects/{project_id}", "DELETE"),
-    }
+    return PROJECT(project_id=project_id)
+
+
+def projects_list_links(limit: int = 0, next_after: Optional[int] = None) -> Links:
+    return with_next(PROJECTS(), limit, next_after)
+
+
+PURGE = LinkTemplate(
+    self=("get_project_purge", "GET"),
+    project=("get_project_details", "GET"),
+)
+
+
+def purge_links(project_id: int) -> Links:
+    return PURGE(project_id=project_id)
 
 
-def projects_list_links() -> Links:
-    return {
-        "self": link("/projects"),
-        "create": link("/projects", "POST"),
-    }
+PROJECT_STATS = LinkTemplate(
+    self=("get_project_stats", "GET"),
+    project=("get_project_details", "GET"),
+)
+
+PROJECTS_STATS = LinkTemplate(
+    self=("list_project_stats", "GET"),
+    projects=("list_projects", "GET"),
+)
+
+
+def project_stats_links(project_id: int) -> Links:
+    return PROJECT_STATS(project_id=project_id)
+
+
+def projects_stats_links(ids: Sequence[int]) -> Links:
+    links = PROJECTS_STATS()
+    query = urlencode([("ids", ",".join(map(str, ids)))])
+    links["self"] = link(f"{links['self']['href']}?{query}")
+    return links
 
 
 
 
 
 # -------- Tasks --------
+TASK = LinkTemplate(
+    self=("get_task_details", "GET"),
+    project=("get_project_details", "GET"),
+    collection=("list_tasks", "GET"),
+    comments=("list_comments", "GET"),
+    update=("replace_task", "PUT"),
+    delete=("delete_task", "DELETE"),
+)
+
+TASKS = LinkTemplate(
+    self=("list_tasks", "GET"),
+    create=("create_task", "POST"),
+    batch=("batch_tasks", "POST"),
+    project=("get_project_details", "GET"),
+)
+
+
 def task_links(project_id: int, task_id: int) -> Links:
-    return {
-        "self": link(f"/projects/{project_id}/tasks/{task_id}"),
-        "project": link(f"/projects/{project_id}"),
-        "collection": link(f"/projects/{project_id}/tasks"),
-        "comments": link(f"/projects/{project_id}/tasks/{task_id}/comments"),
-        "update": link(f"/projects/{project_id}/tasks/{task_id}", "PUT"),
-        "delete": link(f"/projects/{project_id}/tasks/{task_id}", "DELETE"),
-    }
+    return TASK(project_id=project_id, task_id=task_id)
 
 
-def tasks_list_links(project_id: int) -> Links:
-    return {
-        "self": link(f"/projects/{project_id}/tasks"),
-        "create": link(f"/projects/{project_id}/tasks", "POST"),
-        "project": link(f"/projects/{project_id}"),
-    }
+def tasks_list_links(
+    project_id: int,
+    limit: int = 0,
+    next_after: Union[int, str, None] = None,
+    params: Sequence[Tuple[str, str]] = (),
+) -> Links:
+    return with_next(TASKS(project_id=project_id), limit, next_after, params)
 
 
 
 
 
 # -------- Users --------
+USER = LinkTemplate(
+    self=("get_user_details", "GET"),
+    collection=("list_users", "GET"),
+    projects=("list_user_projects", "GET"),
+    tasks=("list_user_tasks", "GET"),
+    delete=("delete_user", "DELETE"),
+)
+
+USERS = LinkTemplate(
+    self=("list_users", "GET"),
+    create=("create_user", "POST"),
+)
+
+
 def user_links(user_id: int) -> Links:
-    return {
-        "self": link(f"/users/{user_id}"),
-        "collection": link("/users"),
-        "delete": link(f"/users/{user_id}", "DELETE"),  
-    }
+    return USER(user_id=user_id)
+
+
+def users_list_links(limit: int = 0, next_after: Optional[int] = None) -> Links:
+    return with_next(USERS(), limit, next_after)
+
+
+USER_PROJECTS = LinkTemplate(
+    self=("list_user_projects", "GET"),
+    user=("get_user_details", "GET"),
+)
+
+USER_TASKS = LinkTemplate(
+    self=("list_user_tasks", "GET"),
+    user=("get_user_details", "GET"),
+    projects=("list_user_projects", "GET"),
+)
 
 
-def users_list_links() -> Links:
-    return {
-        "self": link("/users"),
-        "create": link("/users", "POST"),
-    }
+def user_projects_links(
+    user_id: int, limit: int = 0, next_after: Optional[int] = None
+) -> Links:
+    return with_next(USER_PROJECTS(user_id=user_id), limit, next_after)
+
+
+def user_tasks_links(
+    user_id: int,
+    limit: int = 0,
+    next_after: Union[int, str, None] = None,
+    params: Sequence[Tuple[str, str]] = (),
+) -> Links:
+    return with_next(USER_TASKS(user_id=user_id), limit, next_after, params)
 
 
 
 
 
 # -------- Members --------
-def members_list_links(project_id: int) -> Links:
-    return {
-        "self": link(f"/projects/{project_id}/members"),
-        "add": link(f"/projects/{project_id}/members", "POST"),
-        "project": link(f"/projects/{project_id}"),
-    }
+MEMBERS = LinkTemplate(
+    self=("list_members", "GET"),
+    add=("add_member", "POST"),
+    project=("get_project_details", "GET"),
+)
+
+MEMBER = LinkTemplate(
+    self=("remove_member", "GET"),
+    project=("get_project_details", "GET"),
+    collection=("list_members", "GET"),
+    remove=("remove_member", "DELETE"),
+)
+
+
+def members_list_links(
+    project_id: int, limit: int = 0, next_after: Optional[int] = None
+) -> Links:
+    return with_next(MEMBERS(project_id=project_id), limit, next_after)
 
 
 def member_links(project_id: int, user_id: int) -> Links:
-    return {
-        "self": link(f"/projects/{project_id}/members/{user_id}"),
-        "project": link(f"/projects/{project_id}"),
-        "collection": link(f"/projects/{project_id}/members"),
-        "remove": link(f"/projects/{project_id}/members/{user_id}", "DELETE"),
-    }
+    return MEMBER(project_id=project_id, user_id=user_id)
 
 
 
 
 
 # -------- Comments --------
-def comments_list_links(project_id: int, task_id: int) -> Links:
-    return {
-        "self": link(f"/projects/{project_id}/tasks/{task_id}/comments"),
-        "add": link(f"/projects/{project_id}/tasks/{task_id}/comments", "POST"),
-        "task": link(f"/projects/{project_id}/tasks/{task_id}"),
-    }
+COMMENTS = LinkTemplate(
+    self=("list_comments", "GET"),
+    add=("create_comment", "POST"),
+    task=("get_task_details", "GET"),
+)
+
+COMMENT = LinkTemplate(
+    self=("delete_comment", "GET"),
+    collection=("list_comments", "GET"),
+    task=("get_task_details", "GET"),
+    delete=("delete_comment", "DELETE"),
+)
+
+
+def comments_list_links(
+    project_id: int, task_id: int, limit: int = 0, next_after: Optional[int] = None
+) -> Links:
+    return with_next(COMMENTS(project_id=project_id, task_id=task_id), limit, next_after)
 
 
 def comment_links(project_id: int, task_id: int, comment_id: int) -> Links:
-    return {
-        "self": link(f"/projects/{project_id}/tasks/{task_id}/comments/{comment_id}"),
-        "collection": link(f"/projects/{project_id}/tasks/{task_id}/comments"),
-        "task": link(f"/projects/{project_id}/tasks/{task_id}"),
-        "delete": link(
-            f"/projects/{project_id}/tasks/{task_id}/comments/{comment_id}", "DELETE"
-        ),
-    }
+    return COMMENT(project_id=project_id, task_id=task_id, comment_id=comment_id)
+
+
+
+
+
+# -------- Search --------
+SEARCH = LinkTemplate(
+    self=("search_comments", "GET"),
+)
+
+
+def comment_search_links(
+    params: Sequence[Tuple[str, str]], limit: int = 0, next_cursor: Optional[str] = None
+) -> Links:
+    return with_next(SEARCH(), limit, next_cursor, params)
+
+
+
+
+
+# -------- Events --------
+EVENTS = LinkTemplate(
+    self=("poll_project_events", "GET"),
+    stream=("stream_project_events", "GET"),
+    project=("get_project_details", "GET"),
+)
+
+
+def events_links(project_id: int, since: int) -> Links:
+    # next zawsze obecny: long-poll wznawia od ostatniego zdarzenia (albo od tego samego)
+    links = EVENTS(project_id=project_id)
+    links["next"] = link(f"{links['self']['href']}?{urlencode([('since', since)])}")
+    return links
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import exists, insert, literal, select, text
+from sqlalchemy.exc import IntegrityError
+
+from .db import DbSession, engine, session_scope
+from .events import record
+from .models import Comment, Task
+
+
+
+
+# COMMENT_INGEST=1 -> POST komentarza idzie przez kolejkę i wspólny commit (group commit)
+COMMENT_INGEST = os.getenv("COMMENT_INGEST", "0").lower() in ("1", "true", "yes")
+INGEST_FLUSH_MS = float(os.getenv("INGEST_FLUSH_MS", "10"))
+INGEST_BATCH = int(os.getenv("INGEST_BATCH", "500"))
+INGEST_QUEUE = int(os.getenv("INGEST_QUEUE", "10000"))
+
+# on  -> odpowiedź dopiero po trwałym commicie (jak zwykły POST)
+# off -> postgres: synchronous_commit=off dla partii - commit bez czekania na fsync WAL;
+#        po awarii serwera bazy można stracić ostatnie potwierdzone partie (bez niespójności)
+INGEST_DURABILITY = os.getenv("INGEST_DURABILITY", "on")
+if INGEST_DURABILITY not in ("on", "off"):
+    raise RuntimeError("INGEST_DURABILITY musi być 'on' albo 'off'")
+
+log = logging.getLogger("taskapi.ingest")
+
+
+
+
+async def insert_comment(
+    db: DbSession, project_id: int, task_id: int, content: str
+) -> Optional[Comment]:
+    # INSERT ... SELECT ... WHERE EXISTS(task w projekcie) RETURNING - jedno zapytanie
+    # zamiast SELECT taska, INSERT i refresh; None = brak taska w projekcie
+    task_in_project = exists().where(Task.id == task_id, Task.project_id == project_id)
+    return await db.scalar(
+        insert(Comment)
+        .from_select(
+            ["task_id", "content"],
+            select(literal(task_id), literal(content)).where(task_in_project),
+        )
+        .returning(Comment)
+    )
+
+
+def task_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Task not found in this project",
+    )
+
+
+
+
+@dataclass
+class PendingComment:
+    project_id: int
+    task_id: int
+    content: str
+    future: "asyncio.Future[Comment]" = field(repr=False)
+
+    def resolve(self, comment: Optional[Comment]) -> None:
+        # klient mógł się rozłączyć (future anulowany) - komentarz i tak zostaje zapisany
+        if self.future.done():
+            return
+        if comment is None:
+            self.future.set_exception(task_not_found())
+        else:
+            self.future.set_result(comment)
+
+    def fail(self, exc: BaseException) -> None:
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+# Write-behind: wywołania POST trafiają do ograniczonej kolejki, jeden worker zbiera je
+# przez INGEST_FLUSH_MS albo do INGEST_BATCH wierszy i zapisuje jedną transakcją
+# (sprawdzenie tasków + wielowierszowy INSERT ... RETURNING + zdarzenia, jeden commit/fsync).
+# Każdy wołający dostaje swój wiersz (id, created_at) dopiero po commicie partii.
+class CommentIngest:
+    def __init__(self, batch: int, flush_ms: float, queue_size: int, durability: str) -> None:
+        self.batch = batch
+        self.flush = flush_ms / 1000
+        self.durability = durability
+        self.queue: "asyncio.Queue[PendingComment]" = asyncio.Queue(maxsize=queue_size)
+        self._full = asyncio.Event()
+        self._worker: Optional["asyncio.Task[None]"] = None
+        self._closing = False
+
+    def start(self) -> None:
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # nowe zapisy odrzucamy, to co już w kolejce zapisujemy przed wyjściem
+        self._closing = True
+        if self._worker is None:
+            return
+        await self.queue.join()
+        self._worker.cancel()
+
+    async def submit(self, project_id: int, task_id: int, content: str) -> Comment:
+        if self._worker is None or self._closing:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Comment ingest is not running",
+            )
+        pending = PendingComment(
+            project_id, task_id, content, asyncio.get_running_loop().create_future()
+        )
+        try:
+            self.queue.put_nowait(pending)
+        except asyncio.QueueFull:
+            # backpressure: klient ponawia zamiast rosnącej kolejki i czasu odpowiedzi
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Comment ingest queue is full",
+                headers={"Retry-After": "1"},
+            )
+        if self.queue.qsize() >= self.batch - 1:
+            self._full.set()
+        return await pending.future
+
+    async def _run(self) -> None:
+        while True:
+            first = await self.queue.get()
+            if self.queue.qsize() < self.batch - 1:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush)
+                except asyncio.TimeoutError:
+                    pass
+            batch = [first]
+            while len(batch) < self.batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await self._write(batch)
+            except Exception as exc:
+                log.exception("comment ingest batch of %d failed", len(batch))
+                for pending in batch:
+                    pending.fail(exc)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _write(self, batch: List[PendingComment]) -> None:
+        try:
+            comments = await self._write_batch(batch)
+        except IntegrityError:
+            # task usunięty między sprawdzeniem a INSERT - partia po jednym wierszu
+            comments = [await self._write_one(p) for p in batch]
+        for pending, comment in zip(batch, comments):
+            pending.resolve(comment)
+
+    async def _write_batch(self, batch: List[PendingComment]) -> List[Optional[Comment]]:
+        async with session_scope() as db:
+            if self.durability == "off" and engine.dialect.name == "postgresql":
+                await db.execute(text("SET LOCAL synchronous_commit = off"))
+            task_ids = {p.task_id for p in batch}
+            found = {
+                (project_id, task_id)
+                for project_id, task_id in (
+                    await db.execute(
+                        select(Task.project_id, Task.id).where(Task.id.in_(task_ids))
+                    )
+                ).all()
+            }
+            valid = [p for p in batch if (p.project_id, p.task_id) in found]
+            rows = []
+            if valid:
+                rows = (
+                    await db.scalars(
+                        insert(Comment).returning(Comment, sort_by_parameter_order=True),
+                        [{"task_id": p.task_id, "content": p.content} for p in valid],
+                    )
+                ).all()
+            inserted = dict(zip(map(id, valid), rows))
+            for pending, comment in zip(valid, rows):
+                record(db, pending.project_id, "comment", comment.id, "created")
+            await db.commit()
+        return [inserted.get(id(p)) for p in batch]
+
+    async def _write_one(self, pending: PendingComment) -> Optional[Comment]:
+        async with session_scope() as db:
+            comment = await insert_comment(
+                db, pending.project_id, pending.task_id, pending.content
+            )
+            if comment is not None:
+                record(db, pending.project_id, "comment", comment.id, "created")
+                await db.commit()
+        return comment
+
+
+comment_ingest = CommentIngest(INGEST_BATCH, INGEST_FLUSH_MS, INGEST_QUEUE, INGEST_DURABILITY)
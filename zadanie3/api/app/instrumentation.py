@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+request_log = logging.getLogger("taskapi.requests")
+slow_log = logging.getLogger("taskapi.slow_queries")
+
+
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_ms: float = 0.0
+    rows: int = 0
+    statements: Counter = field(default_factory=Counter)
+
+
+_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_sql_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _stats.get()
+
+
+
+
+def param_shape(params: Any, executemany: bool) -> Any:
+    # tylko typy, bez wartości - do logu
+    if executemany:
+        rows = list(params or ())
+        return {"rows": len(rows), "shape": param_shape(rows[0], False) if rows else None}
+    if isinstance(params, dict):
+        return {k: type(v).__name__ for k, v in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [type(v).__name__ for v in params]
+    return type(params).__name__
+
+
+
+
+class _CountingCursor:
+    # kursor DBAPI liczący pobrane wiersze - rowcount dla SELECT bywa -1 (sqlite) albo 0
+    def __init__(self, cursor: Any, stats: RequestStats) -> None:
+        self._cursor = cursor
+        self._stats = stats
+
+    def fetchone(self) -> Any:
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._stats.rows += 1
+        return row
+
+    def fetchmany(self, *args: Any) -> Any:
+        rows = self._cursor.fetchmany(*args)
+        self._stats.rows += len(rows)
+        return rows
+
+    def fetchall(self) -> Any:
+        rows = self._cursor.fetchall()
+        self._stats.rows += len(rows)
+        return rows
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # start na kontekście wykonania, nie na połączeniu - wyjątek w execute nic nie zostawia
+    context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - context._query_start) * 1000
+
+    stats = _stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_ms += elapsed_ms
+        stats.statements[statement] += 1
+        if cursor.description is None or executemany:
+            stats.rows += max(cursor.rowcount, 0)
+        else:
+            # wynik czyta CursorResult z context.cursor dopiero po tym evencie
+            context.cursor = _CountingCursor(cursor, stats)
+
+    if elapsed_ms >= SLOW_QUERY_MS:
+        slow_log.warning(
+            json.dumps(
+                {
+                    "event": "slow_query",
+                    "ms": round(elapsed_ms, 2),
+                    "statement": statement,
+                    "params": param_shape(parameters, executemany),
+                }
+            )
+        )
+
+
+def instrument_engine(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+
+
+def server_timing(stats: RequestStats, wall_ms: float) -> str:
+    return (
+        f'db;dur={stats.db_ms:.2f};desc="{stats.queries} queries, {stats.rows} rows", '
+        f"total;dur={wall_ms:.2f}"
+    )
+
+
+class SQLStatsMiddleware:
+    # czysty ASGI (nie BaseHTTPMiddleware), żeby contextvar był widoczny w handlerach i streamach
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                wall_ms = (time.perf_counter() - start) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(stats, wall_ms).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _stats.reset(token)
+            wall_ms = (time.perf_counter() - start) * 1000
+            request_log.info(
+                json.dumps(
+                    {
+                        "event": "request",
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status_code,
+                        "queries": stats.queries,
+                        "db_ms": round(stats.db_ms, 2),
+                        "rows": stats.rows,
+                        "wall_ms": round(wall_ms, 2),
+                    }
+                )
+            )
+            repeated = [(s, n) for s, n in stats.statements.items() if n >= N_PLUS_ONE_THRESHOLD]
+            for statement, count in repeated:
+                slow_log.warning(
+                    json.dumps(
+                        {
+                            "event": "n_plus_one",
+                            "method": scope["method"],
+                            "path": scope["path"],
+                            "count": count,
+                            "statement": statement,
+                        }
+                    )
+                )
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+
+
+# Każdy wątek pisze do własnego sharda (bez locków na ścieżce zapisu),
+# shardy są sumowane dopiero przy scrape'ie /metrics.
+class _Sharded(ABC):
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[LabelValues, Any]] = []
+        self._register = threading.Lock()
+
+    def _shard(self) -> Dict[LabelValues, Any]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = defaultdict(self._zero)
+            with self._register:
+                self._shards.append(shard)
+        return shard
+
+    @abstractmethod
+    def _zero(self) -> Any:
+        # pusty wpis sharda dla nowego zestawu etykiet
+        ...
+
+    def _labels(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [f'{k}="{v}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(_Sharded):
+    kind = "counter"
+
+    def _zero(self) -> float:
+        return 0.0
+
+    def inc(self, *labels: str, value: float = 1.0) -> None:
+        self._shard()[labels] += value
+
+    def collect(self) -> Dict[LabelValues, float]:
+        total: Dict[LabelValues, float] = defaultdict(float)
+        for shard in list(self._shards):
+            for labels, v in list(shard.items()):
+                total[labels] += v
+        return total
+
+    def render(self) -> Iterable[str]:
+        for labels, v in sorted(self.collect().items()):
+            yield f"{self.name}{self._labels(labels)} {v}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, value: float = 1.0) -> None:
+        self._shard()[labels] -= value
+
+
+class Histogram(_Sharded):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _zero(self) -> List[float]:
+        # [liczniki kubełków..., sum, count]
+        return [0.0] * (len(self.buckets) + 2)
+
+    def observe(self, value: float, *labels: str) -> None:
+        row = self._shard()[labels]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                row[i] += 1
+                break
+        row[-2] += value
+        row[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        total: Dict[LabelValues, List[float]] = {}
+        for shard in list(self._shards):
+            for labels, row in list(shard.items()):
+                acc = total.setdefault(labels, self._zero())
+                for i, v in enumerate(row):
+                    acc[i] += v
+
+        for labels, row in sorted(total.items()):
+            cumulative = 0.0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{self._labels(labels, le)} {cumulative}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{self._labels(labels, le)} {row[-1]}"
+            yield f"{self.name}_sum{self._labels(labels)} {row[-2]}"
+            yield f"{self.name}_count{self._labels(labels)} {row[-1]}"
+
+
+
+
+REQUEST_LATENCY = Histogram(
+    "taskapi_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route"),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "taskapi_http_requests_in_flight",
+    "HTTP requests currently being served",
+)
+RESPONSES = Counter(
+    "taskapi_http_responses_total",
+    "HTTP responses by status code",
+    ("status",),
+)
+POOL_WAIT = Histogram(
+    "taskapi_db_pool_wait_seconds",
+    "Time spent waiting for a pooled DB connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+
+COLLECTORS = [REQUEST_LATENCY, REQUESTS_IN_FLIGHT, RESPONSES, POOL_WAIT]
+
+
+
+
+class _TimedGet:
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedGet, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedGet, AsyncAdaptedQueuePool):
+    pass
+
+
+
+
+class MetricsMiddleware:
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # szablon trasy (np. /projects/{project_id}), nie surowa ścieżka - ograniczona kardynalność
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                route.path if route is not None else "unmatched",
+            )
+            RESPONSES.inc(str(status_code))
+
+
+
+
+def _family(name: str, kind: str, help: str, samples: Iterable[str]) -> List[str]:
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}", *samples]
+
+
+def render(pools: Dict[str, Any], cache_stats: Callable[[], Dict[str, Any]]) -> str:
+    lines: List[str] = []
+    for c in COLLECTORS:
+        lines += _family(c.name, c.kind, c.help, c.render())
+
+    gauges = {
+        "taskapi_db_pool_size": ("Configured pool size", lambda p: p.size()),
+        "taskapi_db_pool_checked_out": ("Connections checked out", lambda p: p.checkedout()),
+        "taskapi_db_pool_overflow": ("Connections above pool size", lambda p: p.overflow()),
+    }
+    for name, (help, read) in gauges.items():
+        samples = [
+            f'{name}{{engine="{engine}"}} {read(pool)}'
+            for engine, pool in pools.items()
+            if isinstance(pool, QueuePool)
+        ]
+        lines += _family(name, "gauge", help, samples)
+
+    stats = cache_stats()
+    for key, help in (("hits", "Response cache hits"), ("misses", "Response cache misses")):
+        name = f"taskapi_cache_{key}_total"
+        lines += _family(name, "counter", help, [f"{name} {stats[key]}"])
+    return "\n".join(lines) + "\n"
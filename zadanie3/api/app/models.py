@@ -1,14 +1,18 @@
 from __future__ import annotations
 from datetime import date, datetime
 from sqlalchemy import (
+    DDL,
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     UniqueConstraint,
+    event,
     func,
+    literal_column,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .db import Base
@@ -25,12 +29,23 @@ class Project(Base):
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
     start_date: Mapped[date | None] = mapped_column(Date, nullable=True)
     planned_end_date: Mapped[date | None] = mapped_column(Date, nullable=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
 
+    __mapper_args__ = {"version_id_col": version}
+
+    # passive_deletes: dzieci usuwa baza (ON DELETE CASCADE) jednym DELETE rodzica,
+    # bez ładowania ich do sesji i DELETE per wiersz
     tasks: Mapped[list["Task"]] = relationship(
-        back_populates="project", cascade="all, delete-orphan"
+        back_populates="project",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="Task.id",
     )
     members: Mapped[list["ProjectMember"]] = relationship(
-        back_populates="project", cascade="all, delete-orphan"
+        back_populates="project",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="ProjectMember.user_id",
     )
 
 
@@ -39,6 +54,7 @@ class Project(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (Index("ix_tasks_project_id_id", "project_id", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     project_id: Mapped[int] = mapped_column(
@@ -49,13 +65,68 @@ class Task(Base):
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
     priority: Mapped[str] = mapped_column(String(20), nullable=False, default="MEDIUM")
     due_date: Mapped[date | None] = mapped_column(Date, nullable=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     project: Mapped["Project"] = relationship(back_populates="tasks")
     comments: Mapped[list["Comment"]] = relationship(
-        back_populates="task", cascade="all, delete-orphan"
+        back_populates="task",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="Comment.id",
     )
 
 
+# sortowanie / zakresy po due_date: NULL jako "nigdy" (na końcu) - to samo wyrażenie
+# jest w indeksie, więc keyset po (due, id) nie musi obsługiwać NULLi
+DUE_NEVER = date(9999, 12, 31)
+TASK_DUE_KEY = func.coalesce(Task.due_date, literal_column(f"'{DUE_NEVER.isoformat()}'"))
+
+Index("ix_tasks_project_id_priority_id", Task.project_id, Task.priority, Task.id)
+Index("ix_tasks_project_id_due_id", Task.project_id, TASK_DUE_KEY, Task.id)
+Index("ix_tasks_project_id_name_id", Task.project_id, Task.name, Task.id)
+
+
+def postgres_only(index: Index) -> Index:
+    # info["dialect"] czyta migrations/env.py, żeby autogenerate nie zgłaszał ich na sqlite
+    index.info["dialect"] = "postgresql"
+    return index.ddl_if(dialect="postgresql")
+
+
+# tylko postgres: LIKE 'prefix%' (niezależnie od collation) i trigramy pod ILIKE '%q%'
+postgres_only(
+    Index(
+        "ix_tasks_project_id_name_pattern",
+        Task.project_id,
+        Task.name,
+        postgresql_ops={"name": "varchar_pattern_ops"},
+    )
+)
+postgres_only(
+    Index(
+        "ix_tasks_name_trgm",
+        Task.name,
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+)
+postgres_only(
+    Index(
+        "ix_tasks_description_trgm",
+        Task.description,
+        postgresql_using="gin",
+        postgresql_ops={"description": "gin_trgm_ops"},
+    )
+)
+
+event.listen(
+    Task.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
 
 
 
@@ -65,9 +136,12 @@ class User(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(200), nullable=False)
     email: Mapped[str] = mapped_column(String(320), nullable=False, unique=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     projects: Mapped[list["ProjectMember"]] = relationship(
-        back_populates="user", cascade="all, delete-orphan"
+        back_populates="user", cascade="all, delete-orphan", passive_deletes=True
     )
 
 
@@ -78,6 +152,7 @@ class ProjectMember(Base):
     __tablename__ = "project_members"
     __table_args__ = (
         UniqueConstraint("project_id", "user_id", name="uq_project_user"),
+        Index("ix_project_members_user_id_project_id", "user_id", "project_id"),
     )
 
     project_id: Mapped[int] = mapped_column(
@@ -96,6 +171,7 @@ class ProjectMember(Base):
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (Index("ix_comments_task_id_id", "task_id", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     task_id: Mapped[int] = mapped_column(
@@ -106,5 +182,231 @@ class Comment(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     task: Mapped["Task"] = relationship(back_populates="comments")
+
+
+# Wyszukiwanie pełnotekstowe komentarzy - utrzymywane przez bazę, poza ORM:
+# postgres: generowana kolumna tsvector + GIN, sqlite: FTS5 (external content) + triggery.
+FTS_CONFIG = "simple"  # bez stemmingu - komentarze są w różnych językach
+
+COMMENT_SEARCH_DDL = {
+    "postgresql": [
+        "ALTER TABLE comments ADD COLUMN IF NOT EXISTS content_tsv tsvector"
+        f" GENERATED ALWAYS AS (to_tsvector('{FTS_CONFIG}', content)) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_comments_content_tsv ON comments USING gin (content_tsv)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts"
+        " USING fts5(content, content='comments', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS comments_fts_ai AFTER INSERT ON comments BEGIN"
+        " INSERT INTO comments_fts(rowid, content) VALUES (new.id, new.content); END",
+        "CREATE TRIGGER IF NOT EXISTS comments_fts_ad AFTER DELETE ON comments BEGIN"
+        " INSERT INTO comments_fts(comments_fts, rowid, content)"
+        " VALUES ('delete', old.id, old.content); END",
+        "CREATE TRIGGER IF NOT EXISTS comments_fts_au AFTER UPDATE OF content ON comments BEGIN"
+        " INSERT INTO comments_fts(comments_fts, rowid, content)"
+        " VALUES ('delete', old.id, old.content);"
+        " INSERT INTO comments_fts(rowid, content) VALUES (new.id, new.content); END",
+    ],
+}
+
+# obiekty bazy spoza metadanych - migrations/env.py pomija je w autogenerate
+SEARCH_OBJECTS = ("content_tsv", "ix_comments_content_tsv", "comments_fts")
+
+for _dialect, _statements in COMMENT_SEARCH_DDL.items():
+    for _sql in _statements:
+        event.listen(Comment.__table__, "after_create", DDL(_sql).execute_if(dialect=_dialect))
+event.listen(
+    Comment.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS comments_fts").execute_if(dialect="sqlite"),
+)
+
+
+
+
+
+# Outbox zmian per projekt: zapisywany w tej samej transakcji co zmiana, id = kursor ?since=.
+# Bez FK do projects - zdarzenie "project deleted" ma przeżyć usunięcie projektu.
+class ProjectEvent(Base):
+    __tablename__ = "project_events"
+    __table_args__ = (Index("ix_project_events_project_id_id", "project_id", "id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    project_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    entity: Mapped[str] = mapped_column(String(20), nullable=False)  # project | task | ...
+    entity_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    op: Mapped[str] = mapped_column(String(10), nullable=False)  # created | updated | deleted
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    # created_at z RETURNING przy INSERT - publikacja po commit nie robi już SELECT
+    __mapper_args__ = {"eager_defaults": True}
+
+
+# postgres: NOTIFY z triggera (wysyłany przy commit) budzi subskrybentów na każdej instancji
+EVENTS_CHANNEL = "project_events"
+
+PROJECT_EVENTS_NOTIFY_DDL = [
+    "CREATE OR REPLACE FUNCTION notify_project_event() RETURNS trigger AS $$"
+    f" BEGIN PERFORM pg_notify('{EVENTS_CHANNEL}', CAST(row_to_json(NEW) AS text));"
+    " RETURN NEW; END $$ LANGUAGE plpgsql",
+    "CREATE TRIGGER project_events_notify AFTER INSERT ON project_events"
+    " FOR EACH ROW EXECUTE FUNCTION notify_project_event()",
+]
+
+for _sql in PROJECT_EVENTS_NOTIFY_DDL:
+    event.listen(
+        ProjectEvent.__table__, "after_create", DDL(_sql).execute_if(dialect="postgresql")
+    )
+
+
+
+
+
+# Liczniki per projekt pod /projects/{id}/stats - utrzymywane przez triggery bazy w tej samej
+# transakcji co zapis, więc obejmują też kaskady ON DELETE, purge i import; rozjazdy naprawia
+# app/stats.py (reconcile). "Zaległe" zależą od daty - liczone z indeksu (project_id, due, id).
+class ProjectStats(Base):
+    __tablename__ = "project_stats"
+
+    project_id: Mapped[int] = mapped_column(
+        ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True
+    )
+    tasks: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    members: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    comments: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+
+
+# priority to dowolny tekst, nie enum - osobny wiersz na (projekt, priorytet)
+class ProjectPriorityCount(Base):
+    __tablename__ = "project_priority_counts"
+
+    project_id: Mapped[int] = mapped_column(
+        ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True
+    )
+    priority: Mapped[str] = mapped_column(String(20), primary_key=True)
+    tasks: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+
+
+_PRIORITY_INC = (
+    "INSERT INTO project_priority_counts (project_id, priority, tasks)"
+    " VALUES ({row}.project_id, {row}.priority, 1) ON CONFLICT (project_id, priority)"
+    " DO UPDATE SET tasks = project_priority_counts.tasks + 1"
+)
+_PRIORITY_DEC = (
+    "UPDATE project_priority_counts SET tasks = tasks - 1"
+    " WHERE project_id = {row}.project_id AND priority = {row}.priority"
+)
+_TASK_INC = "UPDATE project_stats SET tasks = tasks + 1 WHERE project_id = new.project_id"
+# przed usunięciem taska - kaskada usuwa jego komentarze, gdy taska już nie widać, więc
+# trigger komentarzy ich nie odejmie (tak samo w postgresie i sqlite)
+_TASK_DEC = (
+    "UPDATE project_stats SET tasks = tasks - 1,"
+    " comments = comments - (SELECT count(*) FROM comments WHERE task_id = old.id)"
+    " WHERE project_id = old.project_id"
+)
+_COMMENT_ADD = (
+    "UPDATE project_stats SET comments = comments {sign} 1"
+    " WHERE project_id = (SELECT project_id FROM tasks WHERE id = {row}.task_id)"
+)
+_MEMBER_ADD = (
+    "UPDATE project_stats SET members = members {sign} 1 WHERE project_id = {row}.project_id"
+)
+
+
+def _plpgsql(name: str, body: str) -> str:
+    return (
+        f"CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$"
+        f" BEGIN {body} END $$ LANGUAGE plpgsql"
+    )
+
+
+# Kolejność w triggerach tasków: najpierw wiersz project_stats (blokada), potem priorytety -
+# reconcile blokuje ten sam wiersz, więc nie nadpisze niezacommitowanej zmiany.
+PROJECT_STATS_DDL = {
+    "postgresql": [
+        _plpgsql(
+            "project_stats_on_project",
+            "INSERT INTO project_stats (project_id) VALUES (new.id); RETURN NULL;",
+        ),
+        _plpgsql(
+            "project_stats_on_task",
+            "IF TG_OP = 'INSERT' THEN"
+            f" {_TASK_INC}; {_PRIORITY_INC.format(row='new')}; RETURN NULL;"
+            " ELSIF TG_OP = 'UPDATE' THEN"
+            " PERFORM 1 FROM project_stats WHERE project_id = new.project_id FOR UPDATE;"
+            f" {_PRIORITY_DEC.format(row='old')}; {_PRIORITY_INC.format(row='new')};"
+            " RETURN NULL; END IF;"
+            f" {_TASK_DEC}; {_PRIORITY_DEC.format(row='old')}; RETURN old;",
+        ),
+        _plpgsql(
+            "project_stats_on_comment",
+            f"IF TG_OP = 'INSERT' THEN {_COMMENT_ADD.format(sign='+', row='new')};"
+            f" ELSE {_COMMENT_ADD.format(sign='-', row='old')}; END IF; RETURN NULL;",
+        ),
+        _plpgsql(
+            "project_stats_on_member",
+            f"IF TG_OP = 'INSERT' THEN {_MEMBER_ADD.format(sign='+', row='new')};"
+            f" ELSE {_MEMBER_ADD.format(sign='-', row='old')}; END IF; RETURN NULL;",
+        ),
+        "CREATE OR REPLACE TRIGGER project_stats_projects AFTER INSERT ON projects"
+        " FOR EACH ROW EXECUTE FUNCTION project_stats_on_project()",
+        "CREATE OR REPLACE TRIGGER project_stats_tasks AFTER INSERT OR UPDATE OF priority"
+        " ON tasks FOR EACH ROW EXECUTE FUNCTION project_stats_on_task()",
+        "CREATE OR REPLACE TRIGGER project_stats_tasks_bd BEFORE DELETE ON tasks"
+        " FOR EACH ROW EXECUTE FUNCTION project_stats_on_task()",
+        "CREATE OR REPLACE TRIGGER project_stats_comments AFTER INSERT OR DELETE ON comments"
+        " FOR EACH ROW EXECUTE FUNCTION project_stats_on_comment()",
+        "CREATE OR REPLACE TRIGGER project_stats_members AFTER INSERT OR DELETE"
+        " ON project_members FOR EACH ROW EXECUTE FUNCTION project_stats_on_member()",
+    ],
+    "sqlite": [
+        "CREATE TRIGGER IF NOT EXISTS project_stats_projects_ai AFTER INSERT ON projects BEGIN"
+        " INSERT INTO project_stats (project_id) VALUES (new.id); END",
+        "CREATE TRIGGER IF NOT EXISTS project_stats_tasks_ai AFTER INSERT ON tasks BEGIN"
+        f" {_TASK_INC}; {_PRIORITY_INC.format(row='new')}; END",
+        "CREATE TRIGGER IF NOT EXISTS project_stats_tasks_au AFTER UPDATE OF priority ON tasks"
+        " WHEN old.priority IS NOT new.priority BEGIN"
+        f" {_PRIORITY_DEC.format(row='old')}; {_PRIORITY_INC.format(row='new')}; END",
+        "CREATE TRIGGER IF NOT EXISTS project_stats_tasks_bd BEFORE DELETE ON tasks BEGIN"
+        f" {_TASK_DEC}; {_PRIORITY_DEC.format(row='old')}; END",
+        "CREATE TRIGGER IF NOT EXISTS project_stats_comments_ai AFTER INSERT ON comments BEGIN"
+        f" {_COMMENT_ADD.format(sign='+', row='new')}; END",
+        "CREATE TRIGGER IF NOT EXISTS project_stats_comments_ad AFTER DELETE ON comments BEGIN"
+        f" {_COMMENT_ADD.format(sign='-', row='old')}; END",
+        "CREATE TRIGGER IF NOT EXISTS project_stats_members_ai AFTER INSERT ON project_members"
+        f" BEGIN {_MEMBER_ADD.format(sign='+', row='new')}; END",
+        "CREATE TRIGGER IF NOT EXISTS project_stats_members_ad AFTER DELETE ON project_members"
+        f" BEGIN {_MEMBER_ADD.format(sign='-', row='old')}; END",
+    ],
+}
+
+# triggery dotykają kilku tabel - po utworzeniu całego schematu (DDL jest idempotentny)
+for _dialect, _statements in PROJECT_STATS_DDL.items():
+    for _sql in _statements:
+        event.listen(Base.metadata, "after_create", DDL(_sql).execute_if(dialect=_dialect))
+
+
+
+
+# Stan purge (app/purge.py) w bazie: GET .../:purge odpowiada z każdego workera, postęp
+# zapisywany w transakcji każdej partii. Bez FK - wiersz przeżywa usunięcie projektu.
+class ProjectPurge(Base):
+    __tablename__ = "project_purges"
+
+    project_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    state: Mapped[str] = mapped_column(String(10), nullable=False)  # running | done | failed
+    comments: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    tasks: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    members: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    projects: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
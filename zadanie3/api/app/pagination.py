@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import Select
+
+
+
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+
+
+@dataclass(frozen=True)
+class Page:
+    limit: int
+    after: Optional[int]
+
+
+
+
+def page_params(
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    after: Optional[int] = Query(None, ge=0),
+) -> Page:
+    return Page(limit=limit, after=after)
+
+
+
+
+def paginate(stmt: Select, key: Any, page: Page) -> Select:
+    # seek na kluczu zamiast OFFSET - koszt strony nie rośnie z głębokością
+    if page.after is not None:
+        stmt = stmt.where(key > page.after)
+    return stmt.order_by(key).limit(page.limit + 1)
+
+
+
+
+def split_page(rows: Sequence[Any], page: Page, key: str = "id") -> Tuple[Sequence[Any], Optional[int]]:
+    if len(rows) <= page.limit:
+        return rows, None
+    rows = rows[: page.limit]
+    return rows, getattr(rows[-1], key)
+
+
+
+
+# kursor keyset dla sortowań innych niż id: (wartości klucza..., id) jako base64(json)
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(values, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, *types: type) -> Tuple[Any, ...]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        out = []
+        for value, type_ in zip(values, types):
+            if type_ is date:
+                value = date.fromisoformat(value)
+            elif type_ is float and isinstance(value, int):
+                value = float(value)
+            if not isinstance(value, type_) or isinstance(value, bool):
+                raise ValueError(cursor)
+            out.append(value)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return tuple(out)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .cache import response_cache
+from .db import DbSession, session_scope
+from .events import record
+from .models import Comment, Project, ProjectMember, ProjectPurge, Task
+
+
+
+
+PURGE_CHUNK = int(os.getenv("PURGE_CHUNK", "5000"))
+# zakończone zadania (done/failed) znikają z project_purges po tylu sekundach
+PURGE_JOB_TTL = float(os.getenv("PURGE_JOB_TTL", "86400"))
+# "running" bez postępu przez tyle sekund = worker padł w trakcie, kolejny POST wznawia
+PURGE_STALE_SECONDS = float(os.getenv("PURGE_STALE_SECONDS", "300"))
+
+PURGE_KINDS = ("comments", "tasks", "members", "projects")
+
+log = logging.getLogger("taskapi.purge")
+
+
+
+
+# Usuwanie dużego projektu partiami: każda partia to osobna krótka transakcja
+# (krótkie locki, ograniczony WAL/undo). Stan i postęp w project_purges, zapisywane razem
+# z partią - GET .../:purge widzi je z każdego workera. Zadania działające w tym procesie:
+_running: Dict[int, "asyncio.Task[None]"] = {}
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _progress(project_id: int, **values: Any):
+    return (
+        update(ProjectPurge)
+        .where(ProjectPurge.project_id == project_id)
+        .values(updated_at=_now(), **values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def get_purge(db: DbSession, project_id: int) -> Optional[ProjectPurge]:
+    return await db.scalar(
+        select(ProjectPurge)
+        .where(ProjectPurge.project_id == project_id)
+        .execution_options(populate_existing=True)
+    )
+
+
+
+
+def _chunks(project_id: int, chunk: int) -> Dict[str, Any]:
+    # kolejność: najpierw liście, żeby żaden DELETE nie kaskadował na nieograniczoną liczbę wierszy
+    task_ids = select(Task.id).where(Task.project_id == project_id)
+    return {
+        "comments": delete(Comment).where(
+            Comment.id.in_(
+                select(Comment.id).where(Comment.task_id.in_(task_ids)).limit(chunk)
+            )
+        ),
+        "tasks": delete(Task).where(Task.id.in_(task_ids.limit(chunk))),
+        "members": delete(ProjectMember).where(
+            ProjectMember.user_id.in_(
+                select(ProjectMember.user_id)
+                .where(ProjectMember.project_id == project_id)
+                .limit(chunk)
+            ),
+            ProjectMember.project_id == project_id,
+        ),
+        # to co dopisano w trakcie purge usunie kaskada
+        "projects": delete(Project).where(Project.id == project_id),
+    }
+
+
+async def run_purge(project_id: int, chunk: int = PURGE_CHUNK) -> None:
+    try:
+        async with session_scope() as db:
+            for kind, stmt in _chunks(project_id, chunk).items():
+                while True:
+                    result = await db.execute(stmt)
+                    if kind == "projects" and result.rowcount:
+                        record(db, project_id, "project", project_id, "deleted")
+                    column = getattr(ProjectPurge, kind)
+                    await db.execute(_progress(project_id, **{kind: column + result.rowcount}))
+                    await db.commit()
+                    # listy w cache nie pokazują już usuniętych wierszy - po każdej partii
+                    await response_cache.invalidate_tree(f"/projects/{project_id}")
+                    if result.rowcount < chunk or kind == "projects":
+                        break
+            await db.execute(_progress(project_id, state="done"))
+            await db.commit()
+    except Exception as exc:
+        log.exception("purge of project %s failed", project_id)
+        try:
+            async with session_scope() as db:
+                await db.execute(_progress(project_id, state="failed", error=str(exc)))
+                await db.commit()
+        except Exception:
+            log.exception("could not store the failed state of purge %s", project_id)
+    finally:
+        _running.pop(project_id, None)
+        await response_cache.invalidate_tree(f"/projects/{project_id}")
+
+
+async def start_purge(db: DbSession, project_id: int) -> ProjectPurge:
+    now = _now()
+    await db.execute(
+        delete(ProjectPurge).where(
+            ProjectPurge.state != "running",
+            ProjectPurge.updated_at < now - timedelta(seconds=PURGE_JOB_TTL),
+        )
+    )
+    # nowe zadanie zamiast zakończonego albo porzuconego; działające (tu lub w innym
+    # workerze, z niedawnym postępem) zostaje
+    claimed = False
+    if project_id not in _running:
+        reset = {kind: 0 for kind in PURGE_KINDS}
+        result = await db.execute(
+            _progress(project_id, state="running", error=None, **reset).where(
+                or_(
+                    ProjectPurge.state != "running",
+                    ProjectPurge.updated_at < now - timedelta(seconds=PURGE_STALE_SECONDS),
+                )
+            )
+        )
+        claimed = bool(result.rowcount)
+        if not claimed and await get_purge(db, project_id) is None:
+            try:
+                await db.execute(
+                    insert(ProjectPurge).values(
+                        project_id=project_id, state="running", updated_at=now
+                    )
+                )
+                claimed = True
+            except IntegrityError:
+                # inny worker założył zadanie w tym samym momencie
+                await db.rollback()
+    await db.commit()
+    if claimed:
+        _running[project_id] = asyncio.create_task(run_purge(project_id, PURGE_CHUNK))
+    return await get_purge(db, project_id)
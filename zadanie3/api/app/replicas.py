@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.concurrency import run_in_threadpool
+
+
+
+
+# po zapisie klient czyta z primary przez tyle sekund (powinno przekraczać typowy lag replik)
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "x-last-write"  # dla klientów bez cookies - odsyłają wartość z odpowiedzi
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# /batch nie jest zapisem sam w sobie - znacznik przenosi z udanych zapisów w środku
+UNMARKED_PATHS = ("/batch",)
+
+log = logging.getLogger("taskapi.replicas")
+
+
+
+
+@dataclass(eq=False)
+class Replica:
+    name: str
+    engine: Engine
+    async_engine: Optional[AsyncEngine] = None
+    healthy: bool = True
+
+    def _ping_sync(self) -> None:
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    async def ping(self) -> bool:
+        try:
+            if self.async_engine is not None:
+                async with self.async_engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            else:
+                await run_in_threadpool(self._ping_sync)
+        except Exception:
+            log.warning("replica %s is unavailable", self.name, exc_info=True)
+            return False
+        return True
+
+
+# Round-robin po zdrowych replikach; bez zdrowych (albo bez replik) - primary.
+class ReplicaSet:
+    def __init__(self, replicas: Iterable[Replica]) -> None:
+        self.replicas: List[Replica] = list(replicas)
+        self._next = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def pick(self) -> Optional[Replica]:
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    async def check(self) -> None:
+        for replica in self.replicas:
+            healthy = await replica.ping()
+            if healthy != replica.healthy:
+                log.warning("replica %s is %s", replica.name, "up" if healthy else "down")
+            replica.healthy = healthy
+
+    async def watch(self, interval: float = REPLICA_CHECK_INTERVAL) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(interval)
+
+
+
+
+def last_write(request: Request) -> Optional[float]:
+    # cookie i nagłówek mogą się różnić (np. pod-żądania /batch) - liczy się nowszy
+    stamps = []
+    for raw in (request.cookies.get(LAST_WRITE_COOKIE), request.headers.get(LAST_WRITE_HEADER)):
+        try:
+            stamps.append(float(raw))
+        except (TypeError, ValueError):
+            pass
+    return max(stamps, default=None)
+
+
+def reads_own_writes(request: Request) -> bool:
+    # klient niedawno coś zmienił - replika mogła jeszcze tego nie dostać
+    written = last_write(request)
+    return written is not None and time.time() - written < REPLICA_STICKY_SECONDS
+
+
+def wants_primary(request: Request) -> bool:
+    return request.method not in SAFE_METHODS or reads_own_writes(request)
+
+
+
+
+class LastWriteMiddleware:
+    # udany zapis -> znacznik czasu w cookie i nagłówku; kolejne odczyty klienta idą na primary
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] in SAFE_METHODS
+            or scope["path"] in UNMARKED_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_marker(message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                stamp = f"{time.time():.3f}"
+                cookie = (
+                    f"{LAST_WRITE_COOKIE}={stamp}; Max-Age={int(REPLICA_STICKY_SECONDS) + 1}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", cookie.encode()))
+                headers.append((LAST_WRITE_HEADER.encode(), stamp.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_marker)
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from typing import List
+
+from fastapi import APIRouter, Body, Query, Request
+
+from ..batch import prepare_calls, run_batch
+from ..fastjson import FastJSONResponse
+from ..schemas import BatchOut, BatchRequestItem
+
+
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+
+
+
+# Wiele wywołań w jednym round-tripie: pod-żądania przechodzą przez aplikację w procesie,
+# w kolejności z listy (kolejne GET-y równolegle). transaction=true -> wszystko w jednej
+# transakcji; pierwszy błąd (>= 400) cofa całość, reszta dostaje 424.
+@router.post("", response_model=BatchOut)
+async def run_requests(
+    request: Request,
+    items: List[BatchRequestItem] = Body(...),
+    transaction: bool = Query(False, description="wszystko albo nic"),
+):
+    calls = prepare_calls(request, items, transaction)
+    responses, committed, marker = await run_batch(request, calls, transaction)
+    out = FastJSONResponse(
+        {"responses": responses, "committed": committed},
+        headers={"Cache-Control": "no-store"},
+    )
+    for name, value in marker:
+        out.headers.append(name, value)
+    return out
@@ -1,11 +1,25 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends, Response, status
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from sqlalchemy import select
-from sqlalchemy.orm import Session
-from ..db import get_db
+from ..conditional import (
+    check_if_match,
+    collection_etag,
+    commit_versioned,
+    entity_etag,
+    not_modified,
+)
+from ..db import DbSession, get_db, read_replica, shared_session
 from ..deps import get_comment, get_task
-from ..hateoas import comment_links, comments_list_links
+from ..events import record
+from ..export import ExportFormat, export_response
+from ..ingest import COMMENT_INGEST, comment_ingest, insert_comment, task_not_found
+from ..replicas import Replica
+from ..fastjson import FastJSONResponse, row_items
+from ..fieldsets import COMMENT_COLUMNS
+from ..hateoas import comment_links, comments_list_links, links_param
 from ..models import Comment, Task
+from ..pagination import Page, page_params, paginate, split_page
 from ..schemas import CommentCreate, CommentListOut, CommentOut
 
 
@@ -17,67 +31,119 @@ router = APIRouter(
 
 
 
-def to_comment_out(project_id: int, task_id: int, c: Comment) -> CommentOut:
+def to_comment_out(project_id: int, task_id: int, c: Comment, links: bool = True) -> CommentOut:
     return CommentOut(
         id=c.id,
         task_id=c.task_id,
         content=c.content,
         created_at=c.created_at,
-        _links=comment_links(project_id, task_id, c.id),
+        _links=comment_links(project_id, task_id, c.id) if links else None,
     )
 
 
 
 
 @router.post("", response_model=CommentOut, status_code=status.HTTP_201_CREATED)
-def create_comment(
+async def create_comment(
     project_id: int,
     task_id: int,
     payload: CommentCreate,
+    request: Request,
     response: Response,
-    db: Session = Depends(get_db),
-    task: Task = Depends(get_task),  
+    db: DbSession = Depends(get_db),
 ):
-    comment = Comment(task_id=task_id, content=payload.content)
-    db.add(comment)
-    db.commit()
-    db.refresh(comment)
+    # w transakcji /batch komentarz musi trafić do jej sesji, nie do osobnej partii
+    if COMMENT_INGEST and shared_session(request) is None:
+        # wspólna partia i commit z innymi POST-ami (app/ingest.py), 503 przy pełnej kolejce
+        comment = await comment_ingest.submit(project_id, task_id, payload.content)
+    else:
+        comment = await insert_comment(db, project_id, task_id, payload.content)
+        if comment is None:
+            await get_task(project_id, task_id, db)  # 404
+            # task jest - zacommitowany po migawce INSERT-a; drugi raz już go zobaczy
+            comment = await insert_comment(db, project_id, task_id, payload.content)
+            if comment is None:
+                raise task_not_found()
+        record(db, project_id, "comment", comment.id, "created")
+        await db.commit()
 
     response.headers[
         "Location"
     ] = f"/projects/{project_id}/tasks/{task_id}/comments/{comment.id}"
+    response.headers["ETag"] = entity_etag(comment)
     return to_comment_out(project_id, task_id, comment)
 
 
 
 
 @router.get("", response_model=CommentListOut)
-def list_comments(
+async def list_comments(
     project_id: int,
     task_id: int,
-    db: Session = Depends(get_db),
-    task: Task = Depends(get_task),
+    request: Request,
+    db: DbSession = Depends(get_db),
+    page: Page = Depends(page_params),
+    links: bool = Depends(links_param),
 ):
-    comments = db.scalars(
-        select(Comment).where(Comment.task_id == task_id).order_by(Comment.id)
+    comments = (
+        await db.execute(
+            paginate(
+                select(*COMMENT_COLUMNS, Comment.version)
+                .join(Task, Task.id == Comment.task_id)
+                .where(Comment.task_id == task_id, Task.project_id == project_id),
+                Comment.id,
+                page,
+            )
+        )
     ).all()
+    comments, next_after = split_page(comments, page)
+    if not comments:
+        await get_task(project_id, task_id, db)
+
+    etag = collection_etag(comments, page.limit, next_after, links)
+    if (unchanged := not_modified(request, etag)) is not None:
+        return unchanged
+    item_links = (lambda c: comment_links(project_id, task_id, c.id)) if links else None
+    body = {
+        "items": row_items(comments, COMMENT_COLUMNS, item_links),
+        "_links": comments_list_links(project_id, task_id, page.limit, next_after),
+    }
+    return FastJSONResponse(body, headers={"ETag": etag})
+
+
 
-    return CommentListOut(
-        items=[to_comment_out(project_id, task_id, c) for c in comments],
-        _links=comments_list_links(project_id, task_id),
+
+@router.get(":export")
+async def export_comments(
+    project_id: int,
+    task_id: int,
+    fmt: ExportFormat = Query("ndjson", alias="format"),
+    task: Task = Depends(get_task),
+    replica: Optional[Replica] = Depends(read_replica),
+):
+    return export_response(
+        select(Comment).where(Comment.task_id == task_id).order_by(Comment.id),
+        lambda c: to_comment_out(project_id, task_id, c, links=False),
+        CommentOut,
+        fmt,
+        f"task-{task_id}-comments",
+        replica,
     )
 
 
 
 
 @router.delete("/{comment_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_comment(
+async def delete_comment(
     project_id: int,
     task_id: int,
     comment_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: DbSession = Depends(get_db),
     comment: Comment = Depends(get_comment),
 ):
-    db.delete(comment)
-    db.commit()
+    check_if_match(request, entity_etag(comment))
+    await db.delete(comment)
+    record(db, project_id, "comment", comment_id, "deleted")
+    await commit_versioned(db)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
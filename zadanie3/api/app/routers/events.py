@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Header, Query
+from fastapi.responses import StreamingResponse
+
+from ..events import next_events, start_cursor
+from ..fastjson import FastJSONResponse, dumps
+from ..hateoas import events_links
+from ..schemas import EventListOut
+
+
+
+router = APIRouter(prefix="/projects/{project_id}/events", tags=["events"])
+
+
+EVENTS_LIMIT = 100
+LONG_POLL_MAX = 60.0
+SSE_HEARTBEAT = 15.0
+
+
+
+
+@router.get("", response_model=EventListOut)
+async def poll_project_events(
+    project_id: int,
+    since: Optional[int] = Query(None, ge=0, description="id ostatniego otrzymanego zdarzenia"),
+    wait: float = Query(25.0, ge=0, le=LONG_POLL_MAX, description="long-poll: maks. sekund"),
+    limit: int = Query(EVENTS_LIMIT, ge=1, le=500),
+):
+    # long-poll: odpowiedź od razu gdy są zdarzenia po since, inaczej czekamy do `wait` s
+    cursor = await start_cursor(project_id, since)
+    events = await next_events(project_id, cursor, limit, wait)
+    if events:
+        cursor = events[-1]["id"]
+    return FastJSONResponse(
+        {"items": events, "_links": events_links(project_id, cursor)},
+        headers={"Cache-Control": "no-store"},
+    )
+
+
+
+
+def sse_message(event: dict) -> str:
+    return (
+        f"id: {event['id']}\n"
+        f"event: {event['entity']}.{event['op']}\n"
+        f"data: {dumps(event).decode()}\n\n"
+    )
+
+
+@router.get(":stream")
+async def stream_project_events(
+    project_id: int,
+    since: Optional[int] = Query(None, ge=0),
+    last_event_id: Optional[int] = Header(None, ge=0),
+):
+    # SSE; po zerwaniu EventSource wznawia z nagłówkiem Last-Event-ID
+    cursor = await start_cursor(project_id, last_event_id if last_event_id is not None else since)
+
+    async def body(cursor: int) -> AsyncIterator[str]:
+        catch_up = True
+        while True:
+            events = await next_events(project_id, cursor, EVENTS_LIMIT, SSE_HEARTBEAT, catch_up)
+            # dalej tylko bufor w pamięci; pełna strona -> mogą być kolejne w bazie
+            catch_up = len(events) == EVENTS_LIMIT
+            if not events:
+                yield ": ping\n\n"
+                continue
+            yield "".join(sse_message(e) for e in events)
+            cursor = events[-1]["id"]
+
+    return StreamingResponse(
+        body(cursor),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import io
+import tempfile
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from starlette.concurrency import run_in_threadpool
+
+from ..bulk_import import ImportFileError, ImportFormat, run_import
+from ..schemas import ImportSummary
+
+
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+
+SPOOL_MAX = 8 * 1024 * 1024
+
+
+
+
+@router.post("/{entity}", response_model=ImportSummary)
+async def import_rows(
+    entity: Literal["users", "projects", "members"],
+    request: Request,
+    fmt: ImportFormat = Query("csv", alias="format"),
+):
+    # body (surowy CSV/NDJSON) buforujemy na dysku powyżej SPOOL_MAX, import idzie w threadpoolu
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+
+    lines = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+    try:
+        return await run_in_threadpool(run_import, entity, lines, fmt)
+    except ImportFileError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    finally:
+        lines.close()
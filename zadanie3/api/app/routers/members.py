@@ -3,11 +3,14 @@ from __future__ import annotations
 from fastapi import APIRouter, Depends, Response, status
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
-from ..db import get_db
-from ..deps import get_project, get_user
-from ..hateoas import member_links, members_list_links
-from ..models import Project, ProjectMember, User
+from ..db import DbSession, get_db
+from ..deps import get_project, get_project_and_user
+from ..events import record
+from ..fastjson import FastJSONResponse, row_items
+from ..fieldsets import MEMBER_COLUMNS
+from ..hateoas import links_param, member_links, members_list_links
+from ..models import ProjectMember, User
+from ..pagination import Page, page_params, paginate, split_page
 from ..schemas import AddMemberIn, MemberListOut, MemberOut
 
 
@@ -29,21 +32,21 @@ def to_member_out(project_id: int, user: User) -> MemberOut:
 
 
 @router.post("", response_model=MemberOut, status_code=status.HTTP_201_CREATED)
-def add_member(
+async def add_member(
     project_id: int,
     payload: AddMemberIn,
     response: Response,
-    db: Session = Depends(get_db),
-    project: Project = Depends(get_project),  
+    db: DbSession = Depends(get_db),
 ):
-    user = get_user(payload.user_id, db)  
+    project, user = await get_project_and_user(project_id, payload.user_id, db)
 
     membership = ProjectMember(project_id=project_id, user_id=user.id)
     db.add(membership)
+    record(db, project_id, "member", user.id, "created")
     try:
-        db.commit()
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         return Response(
             content='{"detail":"User is already a member of this project"}',
             media_type="application/json",
@@ -57,41 +60,54 @@ def add_member(
 
 
 @router.get("", response_model=MemberListOut)
-def list_members(
+async def list_members(
     project_id: int,
-    db: Session = Depends(get_db),
-    project: Project = Depends(get_project),  
+    db: DbSession = Depends(get_db),
+    page: Page = Depends(page_params),
+    links: bool = Depends(links_param),
 ):
-    rows = db.execute(
-        select(User)
-        .join(ProjectMember, ProjectMember.user_id == User.id)
-        .where(ProjectMember.project_id == project_id)
-        .order_by(User.id)
-    ).scalars().all()
-
-    return MemberListOut(
-        items=[to_member_out(project_id, u) for u in rows],
-        _links=members_list_links(project_id),
+    rows = (
+        await db.execute(
+            paginate(
+                select(*MEMBER_COLUMNS)
+                .join(ProjectMember, ProjectMember.user_id == User.id)
+                .where(ProjectMember.project_id == project_id),
+                User.id,
+                page,
+            )
+        )
+    ).all()
+    rows, next_after = split_page(rows, page, key="user_id")
+    if not rows:
+        await get_project(project_id, db)
+
+    item_links = (lambda m: member_links(project_id, m.user_id)) if links else None
+    return FastJSONResponse(
+        {
+            "items": row_items(rows, MEMBER_COLUMNS, item_links),
+            "_links": members_list_links(project_id, page.limit, next_after),
+        }
     )
 
 
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def remove_member(
+async def remove_member(
     project_id: int,
     user_id: int,
-    db: Session = Depends(get_db),
-    project: Project = Depends(get_project),  
+    db: DbSession = Depends(get_db),
 ):
-    membership = db.get(ProjectMember, {"project_id": project_id, "user_id": user_id})
+    membership = await db.get(ProjectMember, {"project_id": project_id, "user_id": user_id})
     if not membership:
+        await get_project(project_id, db)
         return Response(
             content='{"detail":"Member not found in this project"}',
             media_type="application/json",
             status_code=status.HTTP_404_NOT_FOUND,
         )
 
-    db.delete(membership)
-    db.commit()
+    await db.delete(membership)
+    record(db, project_id, "member", user_id, "deleted")
+    await db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,18 +1,61 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Response, status
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from typing import List
 
-from ..db import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import insert, select
+
+from ..cache import response_cache
+from ..conditional import (
+    check_if_match,
+    collection_etag,
+    commit_versioned,
+    entity_etag,
+    not_modified,
+    precondition_failed,
+    update_returning,
+)
+from ..db import DbSession, get_db, shared_session
 from ..deps import get_project
-from ..hateoas import project_links, projects_list_links
-from ..models import Project
-from ..schemas import ProjectCreate, ProjectListOut, ProjectOut, ProjectUpdate
+from ..events import record
+from ..fastjson import FastJSONResponse, row_items
+from ..fieldsets import (
+    PROJECT_COLUMNS,
+    View,
+    load_project_includes,
+    project_dict,
+    project_options,
+    project_view,
+    projects_etag,
+)
+from ..hateoas import (
+    links_param,
+    project_links,
+    project_stats_links,
+    projects_list_links,
+    projects_stats_links,
+    purge_links,
+)
+from ..models import Project, ProjectPurge
+from ..pagination import Page, page_params, paginate, split_page
+from ..purge import PURGE_KINDS, get_purge, start_purge
+from ..schemas import (
+    ProjectCreate,
+    ProjectListOut,
+    ProjectOut,
+    ProjectStatsListOut,
+    ProjectStatsOut,
+    ProjectUpdate,
+    PurgeOut,
+)
+from ..stats import load_stats
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
 
+STATS_MAX_IDS = 100
+
+
 
 
 
@@ -30,82 +73,242 @@ def to_project_out(p: Project) -> ProjectOut:
 
 
 @router.post("", response_model=ProjectOut, status_code=status.HTTP_201_CREATED)
-def create_project(
+async def create_project(
     payload: ProjectCreate,
     response: Response,
-    db: Session = Depends(get_db),
+    db: DbSession = Depends(get_db),
 ):
-    project = Project(
-        name=payload.name,
-        description=payload.description,
-        start_date=payload.start_date,
-        planned_end_date=payload.planned_end_date,
-    )
-    db.add(project)
-    db.commit()
-    db.refresh(project)
+    # INSERT ... RETURNING: id i version z tego samego zapytania, bez refresh
+    project = await db.scalar(insert(Project).values(**payload.model_dump()).returning(Project))
+    record(db, project.id, "project", project.id, "created")
+    await db.commit()
 
     response.headers["Location"] = f"/projects/{project.id}"
+    response.headers["ETag"] = entity_etag(project)
     return to_project_out(project)
 
 
 @router.get("", response_model=ProjectListOut)
-def list_projects(db: Session = Depends(get_db)):
-    projects = db.scalars(select(Project).order_by(Project.id)).all()
-    return ProjectListOut(
-        items=[to_project_out(p) for p in projects],
-        _links=projects_list_links(),
+async def list_projects(
+    request: Request,
+    db: DbSession = Depends(get_db),
+    page: Page = Depends(page_params),
+    links: bool = Depends(links_param),
+    view: View = Depends(project_view),
+):
+    if view:
+        return await list_projects_view(request, db, page, links, view)
+
+    projects = (
+        await db.execute(paginate(select(*PROJECT_COLUMNS, Project.version), Project.id, page))
+    ).all()
+    projects, next_after = split_page(projects, page)
+
+    etag = collection_etag(projects, page.limit, next_after, links)
+    if (unchanged := not_modified(request, etag)) is not None:
+        return unchanged
+    item_links = (lambda p: project_links(p.id)) if links else None
+    body = {
+        "items": row_items(projects, PROJECT_COLUMNS, item_links),
+        "_links": projects_list_links(page.limit, next_after),
+    }
+    return FastJSONResponse(body, headers={"ETag": etag})
+
+
+async def list_projects_view(
+    request: Request, db: DbSession, page: Page, links: bool, view: View
+) -> Response:
+    # ?fields= / ?include= - ORM z load_only, osadzone kolekcje 1 zapytanie na poziom
+    projects = (
+        await db.scalars(
+            paginate(select(Project).options(*project_options(view)), Project.id, page)
+        )
+    ).all()
+    projects, next_after = split_page(projects, page)
+    await load_project_includes(db, projects, view)
+
+    etag = projects_etag(projects, view, page.limit, next_after, links)
+    if (unchanged := not_modified(request, etag)) is not None:
+        return unchanged
+    body = {
+        "items": [project_dict(p, view, links) for p in projects],
+        "_links": projects_list_links(page.limit, next_after),
+    }
+    return FastJSONResponse(body, headers={"ETag": etag})
+
+
+
+
+def to_purge_out(job: ProjectPurge) -> PurgeOut:
+    return PurgeOut(
+        project_id=job.project_id,
+        state=job.state,
+        deleted={kind: getattr(job, kind) for kind in PURGE_KINDS},
+        error=job.error,
+        _links=purge_links(job.project_id),
     )
 
 
+# trasy ":purge" przed GET /{project_id}, który inaczej złapałby "/1:purge"
+@router.post(
+    "/{project_id}:purge", response_model=PurgeOut, status_code=status.HTTP_202_ACCEPTED
+)
+async def purge_project(
+    request: Request,
+    response: Response,
+    db: DbSession = Depends(get_db),
+    project: Project = Depends(get_project),
+):
+    # dla bardzo dużych projektów zamiast DELETE: usuwanie partiami w tle
+    check_if_match(request, entity_etag(project))
+    job = await start_purge(db, project.id)
+    response.headers["Location"] = f"/projects/{project.id}:purge"
+    return to_purge_out(job)
+
+
+@router.get("/{project_id}:purge", response_model=PurgeOut)
+async def get_project_purge(project_id: int, db: DbSession = Depends(get_db)):
+    job = await get_purge(db, project_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="No purge job for this project"
+        )
+    return to_purge_out(job)
+
+
+
+
+def stats_ids(ids: str = Query(..., description="np. 1,2,3")) -> List[int]:
+    try:
+        parsed = [int(p) for p in ids.split(",") if p.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be comma-separated integers"
+        )
+    parsed = list(dict.fromkeys(parsed))
+    if not parsed or len(parsed) > STATS_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"ids must list 1 to {STATS_MAX_IDS} projects",
+        )
+    return parsed
+
+
+# liczniki utrzymywane przez triggery (app/stats.py) - odczyt bez skanowania tasków/komentarzy
+@router.get("/stats", response_model=ProjectStatsListOut)
+async def list_project_stats(
+    request: Request,
+    ids: List[int] = Depends(stats_ids),
+    db: DbSession = Depends(get_db),
+):
+    stats = await load_stats(db, ids, shared_session(request))
+    items = [
+        {**stats[i], "_links": project_stats_links(i)} for i in ids if i in stats
+    ]
+    return FastJSONResponse({"items": items, "_links": projects_stats_links(ids)})
+
+
+@router.get("/{project_id}/stats", response_model=ProjectStatsOut)
+async def get_project_stats(
+    project_id: int, request: Request, db: DbSession = Depends(get_db)
+):
+    stats = (await load_stats(db, [project_id], shared_session(request))).get(project_id)
+    if stats is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    return FastJSONResponse({**stats, "_links": project_stats_links(project_id)})
+
+
+
+
 @router.get("/{project_id}", response_model=ProjectOut)
-def get_project_details(project: Project = Depends(get_project)):
-    return to_project_out(project)
+async def get_project_details(
+    project_id: int,
+    request: Request,
+    db: DbSession = Depends(get_db),
+    view: View = Depends(project_view),
+):
+    if view:
+        # osadzone zasoby nie są invalidowane razem z projektem - bez cache
+        project = await db.scalar(
+            select(Project).where(Project.id == project_id).options(*project_options(view))
+        )
+        if project is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+        await load_project_includes(db, [project], view)
+        etag = projects_etag([project], view)
+        return not_modified(request, etag) or FastJSONResponse(
+            project_dict(project, view, True), headers={"ETag": etag}
+        )
+
+    cached = await response_cache.lookup(request)
+    if cached is not None:
+        return cached
+
+    project = await get_project(project_id, db)
+    etag = entity_etag(project)
+    return not_modified(request, etag) or await response_cache.store(
+        request, to_project_out(project), etag
+    )
 
 
 
 
+async def write_project(
+    project_id: int, values: dict, request: Request, response: Response, db: DbSession
+) -> ProjectOut:
+    project = await update_returning(
+        db, request, Project, project_id, values, Project.id == project_id
+    )
+    if project is None:
+        await get_project(project_id, db)  # 404, a jeśli istnieje - If-Match nie pasował
+        raise precondition_failed()
+    if values:
+        record(db, project_id, "project", project_id, "updated")
+        await db.commit()
+
+    await response_cache.invalidate(f"/projects/{project_id}")
+    response.headers["ETag"] = entity_etag(project)
+    return to_project_out(project)
+
+
 @router.put("/{project_id}", response_model=ProjectOut)
-def replace_project(
+async def replace_project(
+    project_id: int,
     payload: ProjectCreate,
-    project: Project = Depends(get_project),
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: DbSession = Depends(get_db),
 ):
-    
-    project.name = payload.name
-    project.description = payload.description
-    project.start_date = payload.start_date
-    project.planned_end_date = payload.planned_end_date
-
-    db.commit()
-    db.refresh(project)
-    return to_project_out(project)
+    return await write_project(project_id, payload.model_dump(), request, response, db)
 
 
 
 
 @router.patch("/{project_id}", response_model=ProjectOut)
-def update_project(
+async def update_project(
+    project_id: int,
     payload: ProjectUpdate,
-    project: Project = Depends(get_project),
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: DbSession = Depends(get_db),
 ):
-    
-    for field in payload.model_fields_set:
-        setattr(project, field, getattr(payload, field))
-
-    db.commit()
-    db.refresh(project)
-    return to_project_out(project)
+    values = payload.model_dump(include=payload.model_fields_set)
+    return await write_project(project_id, values, request, response, db)
 
 
 
 
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_project(
+async def delete_project(
+    request: Request,
     project: Project = Depends(get_project),
-    db: Session = Depends(get_db),
+    db: DbSession = Depends(get_db),
 ):
-    db.delete(project)
-    db.commit()
+    check_if_match(request, entity_etag(project))
+    project_id = project.id
+    await db.delete(project)
+    record(db, project_id, "project", project_id, "deleted")
+    await commit_versioned(db)
+    # projekt razem z taskami i komentarzami pod nim
+    await response_cache.invalidate_tree(f"/projects/{project_id}")
     return Response(status_code=status.HTTP_204_NO_CONTENT)
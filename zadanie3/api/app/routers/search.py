@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+
+from ..conditional import collection_etag, not_modified
+from ..db import DbSession, get_db
+from ..deps import get_project, get_user
+from ..fastjson import FastJSONResponse
+from ..hateoas import comment_links, comment_search_links, links_param
+from ..pagination import DEFAULT_LIMIT, MAX_LIMIT
+from ..schemas import CommentSearchOut
+from ..search import CommentSearch
+
+
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+
+
+@router.get("/comments", response_model=CommentSearchOut)
+async def search_comments(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    project_id: Optional[int] = Query(None, description="szukaj w projekcie"),
+    user_id: Optional[int] = Query(None, description="szukaj w projektach użytkownika"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="z linku next"),
+    db: DbSession = Depends(get_db),
+    links: bool = Depends(links_param),
+):
+    if (project_id is None) == (user_id is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Exactly one of project_id, user_id is required",
+        )
+    scope, scope_id = ("project", project_id) if project_id is not None else ("user", user_id)
+
+    search = CommentSearch(q, scope, scope_id, limit, cursor)
+    items, rows, next_cursor = await search.run(db)
+    if not rows:
+        # brak trafień vs brak zakresu - 404 tylko dla nieistniejącego projektu/użytkownika
+        if scope == "project":
+            await get_project(scope_id, db)
+        else:
+            await get_user(scope_id, db)
+
+    params = [("q", q), (f"{scope}_id", str(scope_id))]
+    etag = collection_etag(rows, params, limit, next_cursor, links)
+    if (unchanged := not_modified(request, etag)) is not None:
+        return unchanged
+    if links:
+        for item in items:
+            item["_links"] = comment_links(item["project_id"], item["task_id"], item["id"])
+    body = {"items": items, "_links": comment_search_links(params, limit, next_cursor)}
+    return FastJSONResponse(body, headers={"ETag": etag})
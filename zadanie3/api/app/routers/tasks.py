@@ -1,12 +1,47 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends, Response, status
-from sqlalchemy import select
-from sqlalchemy.orm import Session
-from ..db import get_db
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import case, delete, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from ..cache import response_cache
+from ..conditional import (
+    check_if_match,
+    collection_etag,
+    commit_versioned,
+    entity_etag,
+    not_modified,
+    precondition_failed,
+    update_returning,
+)
+from ..db import DbSession, get_db, read_replica
 from ..deps import get_project, get_task
-from ..hateoas import task_links, tasks_list_links
+from ..events import record
+from ..export import ExportFormat, export_response
+from ..replicas import Replica
+from ..fastjson import FastJSONResponse, dumps, row_items
+from ..fieldsets import (
+    TASK_COLUMNS,
+    View,
+    load_task_includes,
+    task_dict,
+    task_options,
+    task_view,
+    tasks_etag,
+)
+from ..hateoas import links_param, task_links, tasks_list_links
 from ..models import Project, Task
-from ..schemas import TaskCreate, TaskListOut, TaskOut, TaskUpdate
+from ..pagination import Page, page_params
+from ..schemas import (
+    TaskBatchIn,
+    TaskBatchOut,
+    TaskBatchResult,
+    TaskBatchUpdate,
+    TaskCreate,
+    TaskListOut,
+    TaskOut,
+    TaskUpdate,
+)
+from ..task_query import TaskQuery, task_query
 
 
 router = APIRouter(prefix="/projects/{project_id}/tasks", tags=["tasks"])
@@ -14,7 +49,7 @@ router = APIRouter(prefix="/projects/{project_id}/tasks", tags=["tasks"])
 
 
 
-def to_task_out(t: Task) -> TaskOut:
+def to_task_out(t: Task, links: bool = True) -> TaskOut:
     return TaskOut(
         id=t.id,
         project_id=t.project_id,
@@ -22,99 +57,338 @@ def to_task_out(t: Task) -> TaskOut:
         description=t.description,
         priority=t.priority,
         due_date=t.due_date,
-        _links=task_links(t.project_id, t.id),
+        _links=task_links(t.project_id, t.id) if links else None,
+    )
+
+
+
+
+async def invalidate_task(project_id: int, task_id: int) -> None:
+    await response_cache.invalidate(
+        f"/projects/{project_id}/tasks/{task_id}", f"/projects/{project_id}/tasks"
     )
 
 
 
 
 @router.post("", response_model=TaskOut, status_code=status.HTTP_201_CREATED)
-def create_task(
+async def create_task(
     project_id: int,
     payload: TaskCreate,
     response: Response,
-    db: Session = Depends(get_db),
-    project: Project = Depends(get_project),  
+    db: DbSession = Depends(get_db),
 ):
-    task = Task(
-        project_id=project_id,
-        name=payload.name,
-        description=payload.description,
-        priority=payload.priority,
-        due_date=payload.due_date,
-    )
-    db.add(task)
-    db.commit()
-    db.refresh(task)
+    # INSERT ... RETURNING; istnienie projektu sprawdza klucz obcy zamiast SELECT przed
+    try:
+        task = await db.scalar(
+            insert(Task).values(project_id=project_id, **payload.model_dump()).returning(Task)
+        )
+        record(db, project_id, "task", task.id, "created")
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        await get_project(project_id, db)
+        raise
+    await response_cache.invalidate(f"/projects/{project_id}/tasks")
 
     response.headers["Location"] = f"/projects/{project_id}/tasks/{task.id}"
+    response.headers["ETag"] = entity_etag(task)
     return to_task_out(task)
 
 
 
 
+def batch_update_stmt(project_id: int, items: list[TaskBatchUpdate]):
+    # jeden UPDATE dla całej paczki: kolumna = CASE id WHEN ... THEN ... ELSE kolumna END
+    values = {}
+    for field in TaskUpdate.model_fields:
+        changed = {i.id: getattr(i, field) for i in items if field in i.model_fields_set}
+        if changed:
+            column = Task.__table__.c[field]
+            values[field] = case(
+                {k: literal(v, column.type) for k, v in changed.items()},
+                value=Task.id,
+                else_=column,
+            )
+
+    scope = (Task.project_id == project_id, Task.id.in_([i.id for i in items]))
+    if not values:
+        return select(Task).where(*scope)
+    values["version"] = Task.version + 1
+    return (
+        update(Task)
+        .where(*scope)
+        .values(values)
+        .returning(Task)
+        .execution_options(synchronize_session=False)
+    )
+
+
+
+
+@router.post(":batch", response_model=TaskBatchOut)
+async def batch_tasks(
+    project_id: int,
+    payload: TaskBatchIn,
+    db: DbSession = Depends(get_db),
+    project: Project = Depends(get_project),
+):
+    results: list[TaskBatchResult] = []
+    try:
+        if payload.create:
+            created = (
+                await db.scalars(
+                    insert(Task).returning(Task, sort_by_parameter_order=True),
+                    [{"project_id": project_id, **t.model_dump()} for t in payload.create],
+                )
+            ).all()
+            results += [
+                TaskBatchResult(op="create", id=t.id, status=201, item=to_task_out(t))
+                for t in created
+            ]
+
+        if payload.update:
+            updated = {
+                t.id: t
+                for t in (await db.scalars(batch_update_stmt(project_id, payload.update))).all()
+            }
+            results += [
+                TaskBatchResult(op="update", id=i.id, status=200, item=to_task_out(updated[i.id]))
+                if i.id in updated
+                else TaskBatchResult(op="update", id=i.id, status=404)
+                for i in payload.update
+            ]
+
+        if payload.delete:
+            deleted = set(
+                (
+                    await db.scalars(
+                        delete(Task)
+                        .where(Task.project_id == project_id, Task.id.in_(payload.delete))
+                        .returning(Task.id)
+                        .execution_options(synchronize_session=False)
+                    )
+                ).all()
+            )
+            results += [
+                TaskBatchResult(op="delete", id=i, status=204 if i in deleted else 404)
+                for i in payload.delete
+            ]
+
+        applied = {"create": "created", "update": "updated", "delete": "deleted"}
+        for r in results:
+            if r.status < 400:
+                record(db, project_id, "task", r.id, applied[r.op])
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return Response(
+            content='{"detail":"Batch violates a constraint, nothing was applied"}',
+            media_type="application/json",
+            status_code=status.HTTP_409_CONFLICT,
+        )
+
+    await response_cache.invalidate(
+        f"/projects/{project_id}/tasks",
+        *(f"/projects/{project_id}/tasks/{r.id}" for r in results if r.op != "create"),
+    )
+    return TaskBatchOut(results=results)
+
+
+
+
 @router.get("", response_model=TaskListOut)
-def list_tasks(
+async def list_tasks(
     project_id: int,
-    db: Session = Depends(get_db),
-    project: Project = Depends(get_project),  
+    request: Request,
+    db: DbSession = Depends(get_db),
+    page: Page = Depends(page_params),
+    links: bool = Depends(links_param),
+    view: View = Depends(task_view),
+    query: TaskQuery = Depends(task_query),
 ):
-    tasks = db.scalars(
-        select(Task).where(Task.project_id == project_id).order_by(Task.id)
-    ).all()
+    if view.include:
+        # komentarze nie invalidują listy tasków w cache - ta wersja idzie z bazy
+        return await list_tasks_view(project_id, request, db, page, links, view, query)
+
+    cached = await response_cache.lookup(request)
+    if cached is not None:
+        return cached
+    if view:
+        return await list_tasks_view(project_id, request, db, page, links, view, query)
+
+    stmt = query.where(select(*TASK_COLUMNS, Task.version).where(Task.project_id == project_id))
+    tasks = (await db.execute(query.paginate(stmt, page))).all()
+    tasks, next_after = query.split(tasks, page)
+    if not tasks:
+        # istnienie projektu sprawdzamy tylko przy pustej stronie
+        await get_project(project_id, db)
+
+    params = query.params()
+    etag = collection_etag(tasks, page.limit, next_after, links, *params)
+    if (unchanged := not_modified(request, etag)) is not None:
+        return unchanged
+    item_links = (lambda t: task_links(project_id, t.id)) if links else None
+    body = {
+        "items": row_items(tasks, TASK_COLUMNS, item_links),
+        "_links": tasks_list_links(project_id, page.limit, next_after, params),
+    }
+    return await response_cache.store_body(request, dumps(body), etag)
+
+
+async def list_tasks_view(
+    project_id: int,
+    request: Request,
+    db: DbSession,
+    page: Page,
+    links: bool,
+    view: View,
+    query: TaskQuery,
+) -> Response:
+    sort_columns = [query.key.column] if query.key is not None else []
+    stmt = query.where(
+        select(Task)
+        .where(Task.project_id == project_id)
+        .options(*task_options(view, *sort_columns))
+    )
+    tasks = (await db.scalars(query.paginate(stmt, page))).all()
+    tasks, next_after = query.split(tasks, page)
+    if not tasks:
+        await get_project(project_id, db)
+    await load_task_includes(db, tasks, view)
+
+    params = query.params()
+    etag = tasks_etag(tasks, view, page.limit, next_after, links, *params)
+    if (unchanged := not_modified(request, etag)) is not None:
+        return unchanged
+    body = {
+        "items": [task_dict(t, view, links) for t in tasks],
+        "_links": tasks_list_links(project_id, page.limit, next_after, params),
+    }
+    if view.include:
+        return FastJSONResponse(body, headers={"ETag": etag})
+    return await response_cache.store_body(request, dumps(body), etag)
+
+
 
-    return TaskListOut(
-        items=[to_task_out(t) for t in tasks],
-        _links=tasks_list_links(project_id),
+
+@router.get(":export")
+async def export_tasks(
+    project_id: int,
+    fmt: ExportFormat = Query("ndjson", alias="format"),
+    project: Project = Depends(get_project),
+    replica: Optional[Replica] = Depends(read_replica),
+):
+    return export_response(
+        select(Task).where(Task.project_id == project_id).order_by(Task.id),
+        lambda t: to_task_out(t, links=False),
+        TaskOut,
+        fmt,
+        f"project-{project_id}-tasks",
+        replica,
     )
 
 
 
 
 @router.get("/{task_id}", response_model=TaskOut)
-def get_task_details(task: Task = Depends(get_task)):
-    return to_task_out(task)
+async def get_task_details(
+    project_id: int,
+    task_id: int,
+    request: Request,
+    db: DbSession = Depends(get_db),
+    view: View = Depends(task_view),
+):
+    if view:
+        task = await db.scalar(
+            select(Task)
+            .where(Task.id == task_id, Task.project_id == project_id)
+            .options(*task_options(view))
+        )
+        if task is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Task not found in this project"
+            )
+        await load_task_includes(db, [task], view)
+        etag = tasks_etag([task], view)
+        return not_modified(request, etag) or FastJSONResponse(
+            task_dict(task, view, True), headers={"ETag": etag}
+        )
+
+    cached = await response_cache.lookup(request)
+    if cached is not None:
+        return cached
+
+    task = await get_task(project_id, task_id, db)
+    etag = entity_etag(task)
+    return not_modified(request, etag) or await response_cache.store(
+        request, to_task_out(task), etag
+    )
+
 
 
 
+async def write_task(
+    project_id: int,
+    task_id: int,
+    values: dict,
+    request: Request,
+    response: Response,
+    db: DbSession,
+) -> TaskOut:
+    # UPDATE ... WHERE id AND project_id [AND version] RETURNING - jedno zapytanie
+    task = await update_returning(
+        db, request, Task, task_id, values, Task.id == task_id, Task.project_id == project_id
+    )
+    if task is None:
+        await get_task(project_id, task_id, db)  # 404, a jeśli istnieje - If-Match nie pasował
+        raise precondition_failed()
+    if values:
+        record(db, project_id, "task", task_id, "updated")
+        await db.commit()
+
+    await invalidate_task(project_id, task_id)
+    response.headers["ETag"] = entity_etag(task)
+    return to_task_out(task)
+
 
 @router.put("/{task_id}", response_model=TaskOut)
-def replace_task(
+async def replace_task(
+    project_id: int,
+    task_id: int,
     payload: TaskCreate,
-    task: Task = Depends(get_task),
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: DbSession = Depends(get_db),
 ):
-    task.name = payload.name
-    task.description = payload.description
-    task.priority = payload.priority
-    task.due_date = payload.due_date
-
-    db.commit()
-    db.refresh(task)
-    return to_task_out(task)
+    return await write_task(project_id, task_id, payload.model_dump(), request, response, db)
 
 
 
 @router.patch("/{task_id}", response_model=TaskOut)
-def update_task(
+async def update_task(
+    project_id: int,
+    task_id: int,
     payload: TaskUpdate,
-    task: Task = Depends(get_task),
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: DbSession = Depends(get_db),
 ):
-    for field in payload.model_fields_set:
-        setattr(task, field, getattr(payload, field))
-
-    db.commit()
-    db.refresh(task)
-    return to_task_out(task)
+    values = payload.model_dump(include=payload.model_fields_set)
+    return await write_task(project_id, task_id, values, request, response, db)
 
 
 
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(
+async def delete_task(
+    request: Request,
     task: Task = Depends(get_task),
-    db: Session = Depends(get_db),
+    db: DbSession = Depends(get_db),
 ):
-    db.delete(task)
-    db.commit()
+    check_if_match(request, entity_etag(task))
+    project_id, task_id = task.project_id, task.id
+    await db.delete(task)
+    record(db, project_id, "task", task_id, "deleted")
+    await commit_versioned(db)
+    await invalidate_task(project_id, task_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,14 +1,34 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Response, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, Request, Response, status
+from sqlalchemy import insert, select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
-from ..db import get_db
+from ..cache import response_cache
+from ..conditional import (
+    check_if_match,
+    collection_etag,
+    commit_versioned,
+    entity_etag,
+    not_modified,
+)
+from ..db import DbSession, get_db
 from ..deps import get_user
-from ..hateoas import user_links, users_list_links
-from ..models import User
-from ..schemas import UserCreate, UserListOut, UserOut
+from ..events import record
+from ..fastjson import FastJSONResponse, row_items
+from ..fieldsets import PROJECT_COLUMNS, TASK_COLUMNS, USER_COLUMNS
+from ..hateoas import (
+    links_param,
+    project_links,
+    task_links,
+    user_links,
+    user_projects_links,
+    user_tasks_links,
+    users_list_links,
+)
+from ..models import Project, ProjectMember, Task, User
+from ..pagination import Page, page_params, paginate, split_page
+from ..schemas import ProjectListOut, TaskListOut, UserCreate, UserListOut, UserOut
+from ..task_query import TaskQuery, task_query
 
 
 
@@ -27,17 +47,18 @@ def to_user_out(u: User) -> UserOut:
 
 
 @router.post("", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def create_user(
+async def create_user(
     payload: UserCreate,
     response: Response,
-    db: Session = Depends(get_db),
+    db: DbSession = Depends(get_db),
 ):
-    user = User(name=payload.name, email=str(payload.email))
-    db.add(user)
     try:
-        db.commit()
+        user = await db.scalar(
+            insert(User).values(name=payload.name, email=str(payload.email)).returning(User)
+        )
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
 
         return Response(
             content='{"detail":"User with this email already exists"}',
@@ -45,30 +66,136 @@ def create_user(
             status_code=status.HTTP_409_CONFLICT,
         )
 
-    db.refresh(user)
     response.headers["Location"] = f"/users/{user.id}"
+    response.headers["ETag"] = entity_etag(user)
     return to_user_out(user)
 
 
 
 @router.get("", response_model=UserListOut)
-def list_users(db: Session = Depends(get_db)):
-    users = db.scalars(select(User).order_by(User.id)).all()
-    return UserListOut(
-        items=[to_user_out(u) for u in users],
-        _links=users_list_links(),
-    )
+async def list_users(
+    request: Request,
+    db: DbSession = Depends(get_db),
+    page: Page = Depends(page_params),
+    links: bool = Depends(links_param),
+):
+    users = (await db.execute(paginate(select(*USER_COLUMNS, User.version), User.id, page))).all()
+    users, next_after = split_page(users, page)
+
+    etag = collection_etag(users, page.limit, next_after, links)
+    if (unchanged := not_modified(request, etag)) is not None:
+        return unchanged
+    item_links = (lambda u: user_links(u.id)) if links else None
+    body = {
+        "items": row_items(users, USER_COLUMNS, item_links),
+        "_links": users_list_links(page.limit, next_after),
+    }
+    return FastJSONResponse(body, headers={"ETag": etag})
 
 
 
 @router.get("/{user_id}", response_model=UserOut)
-def get_user_details(user: User = Depends(get_user)):
-    return to_user_out(user)
+async def get_user_details(
+    user_id: int,
+    request: Request,
+    db: DbSession = Depends(get_db),
+):
+    cached = await response_cache.lookup(request)
+    if cached is not None:
+        return cached
+
+    user = await get_user(user_id, db)
+    etag = entity_etag(user)
+    return not_modified(request, etag) or await response_cache.store(
+        request, to_user_out(user), etag
+    )
+
+
+
+# Widok "moje projekty/taski": jedno zapytanie z joinem po indeksie odwrotnym
+# project_members (user_id, project_id) - bez pętli po projektach po stronie klienta.
+# Bez cache odpowiedzi: zmiana dowolnego projektu/taska musiałaby zdejmować wpisy
+# wszystkich członków; zostaje ETag / 304.
+@router.get("/{user_id}/projects", response_model=ProjectListOut)
+async def list_user_projects(
+    user_id: int,
+    request: Request,
+    db: DbSession = Depends(get_db),
+    page: Page = Depends(page_params),
+    links: bool = Depends(links_param),
+):
+    # seek po project_id z indeksu członkostw, projekty po PK
+    stmt = (
+        select(*PROJECT_COLUMNS, Project.version)
+        .join(ProjectMember, ProjectMember.project_id == Project.id)
+        .where(ProjectMember.user_id == user_id)
+    )
+    projects = (await db.execute(paginate(stmt, ProjectMember.project_id, page))).all()
+    projects, next_after = split_page(projects, page)
+    if not projects:
+        # istnienie użytkownika sprawdzamy tylko przy pustej stronie
+        await get_user(user_id, db)
+
+    etag = collection_etag(projects, page.limit, next_after, links)
+    if (unchanged := not_modified(request, etag)) is not None:
+        return unchanged
+    item_links = (lambda p: project_links(p.id)) if links else None
+    body = {
+        "items": row_items(projects, PROJECT_COLUMNS, item_links),
+        "_links": user_projects_links(user_id, page.limit, next_after),
+    }
+    return FastJSONResponse(body, headers={"ETag": etag})
+
+
+
+@router.get("/{user_id}/tasks", response_model=TaskListOut)
+async def list_user_tasks(
+    user_id: int,
+    request: Request,
+    db: DbSession = Depends(get_db),
+    page: Page = Depends(page_params),
+    links: bool = Depends(links_param),
+    query: TaskQuery = Depends(task_query),
+):
+    # taski ze wszystkich projektów użytkownika; filtry i sort jak w /projects/{id}/tasks
+    # (np. ?due_before=&sort=due_date), zakresy po indeksie (project_id, due, id)
+    stmt = query.where(
+        select(*TASK_COLUMNS, Task.version)
+        .join(ProjectMember, ProjectMember.project_id == Task.project_id)
+        .where(ProjectMember.user_id == user_id)
+    )
+    tasks = (await db.execute(query.paginate(stmt, page))).all()
+    tasks, next_after = query.split(tasks, page)
+    if not tasks:
+        await get_user(user_id, db)
+
+    params = query.params()
+    etag = collection_etag(tasks, page.limit, next_after, links, *params)
+    if (unchanged := not_modified(request, etag)) is not None:
+        return unchanged
+    item_links = (lambda t: task_links(t.project_id, t.id)) if links else None
+    body = {
+        "items": row_items(tasks, TASK_COLUMNS, item_links),
+        "_links": user_tasks_links(user_id, page.limit, next_after, params),
+    }
+    return FastJSONResponse(body, headers={"ETag": etag})
 
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(user: User = Depends(get_user), db: Session = Depends(get_db)):
-    db.delete(user)
-    db.commit()
+async def delete_user(
+    request: Request,
+    user: User = Depends(get_user),
+    db: DbSession = Depends(get_db),
+):
+    check_if_match(request, entity_etag(user))
+    user_id = user.id
+    # członkostwa usuwa kaskada w bazie (passive_deletes) - zdarzenia projektów wprost
+    for project_id in await db.scalars(
+        select(ProjectMember.project_id).where(ProjectMember.user_id == user_id)
+    ):
+        record(db, project_id, "member", user_id, "deleted")
+    await db.delete(user)
+    await commit_versioned(db)
+    await response_cache.invalidate(f"/users/{user_id}")
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,7 +1,8 @@
 from __future__ import annotations
 from datetime import date, datetime
-from typing import Any, Dict, List, Optional
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from collections import Counter
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
 
 
 
@@ -33,12 +34,35 @@ class ProjectOut(BaseModel):
     description: Optional[str]
     start_date: Optional[date]
     planned_end_date: Optional[date]
-    _links: Links
+    links: Optional[Links] = Field(default=None, alias="_links")
 
 
 class ProjectListOut(BaseModel):
     items: List[ProjectOut]
-    _links: Links
+    links: Links = Field(alias="_links")
+
+
+class PurgeOut(BaseModel):
+    project_id: int
+    state: str  # running | done | failed
+    deleted: Dict[str, int]
+    error: Optional[str] = None
+    links: Links = Field(alias="_links")
+
+
+class ProjectStatsOut(BaseModel):
+    project_id: int
+    tasks: int
+    tasks_by_priority: Dict[str, int]
+    overdue_tasks: int  # due_date < dziś
+    members: int
+    comments: int
+    links: Links = Field(alias="_links")
+
+
+class ProjectStatsListOut(BaseModel):
+    items: List[ProjectStatsOut]  # tylko istniejące projekty, w kolejności ?ids=
+    links: Links = Field(alias="_links")
 
 
 
@@ -69,12 +93,46 @@ class TaskOut(BaseModel):
     description: Optional[str]
     priority: str
     due_date: Optional[date]
-    _links: Links
+    links: Optional[Links] = Field(default=None, alias="_links")
 
 
 class TaskListOut(BaseModel):
     items: List[TaskOut]
-    _links: Links
+    links: Links = Field(alias="_links")
+
+
+MAX_BATCH = 1000
+
+
+class TaskBatchUpdate(TaskUpdate):
+    id: int
+
+
+class TaskBatchIn(BaseModel):
+    create: List[TaskCreate] = Field(default_factory=list, max_length=MAX_BATCH)
+    update: List[TaskBatchUpdate] = Field(default_factory=list, max_length=MAX_BATCH)
+    delete: List[int] = Field(default_factory=list, max_length=MAX_BATCH)
+
+    @field_validator("update", "delete")
+    @classmethod
+    def unique_ids(cls, items: list) -> list:
+        # powtórzony id zlałby się w jedną gałąź CASE - każdy task najwyżej raz na listę
+        ids = Counter(i if isinstance(i, int) else i.id for i in items)
+        duplicates = sorted(i for i, n in ids.items() if n > 1)
+        if duplicates:
+            raise ValueError(f"duplicate task ids: {duplicates}")
+        return items
+
+
+class TaskBatchResult(BaseModel):
+    op: str  # "create" | "update" | "delete"
+    id: Optional[int]
+    status: int
+    item: Optional[TaskOut] = None
+
+
+class TaskBatchOut(BaseModel):
+    results: List[TaskBatchResult]
 
 
 
@@ -92,12 +150,12 @@ class UserOut(BaseModel):
     id: int
     name: str
     email: EmailStr
-    _links: Links
+    links: Optional[Links] = Field(default=None, alias="_links")
 
 
 class UserListOut(BaseModel):
     items: List[UserOut]
-    _links: Links
+    links: Links = Field(alias="_links")
 
 
 
@@ -112,12 +170,17 @@ class MemberOut(BaseModel):
     user_id: int
     name: str
     email: EmailStr
-    _links: Links
+    links: Optional[Links] = Field(default=None, alias="_links")
 
 
 class MemberListOut(BaseModel):
     items: List[MemberOut]
-    _links: Links
+    links: Links = Field(alias="_links")
+
+
+class MemberImportIn(BaseModel):
+    project_id: int
+    user_id: int
 
 
 
@@ -137,10 +200,85 @@ class CommentOut(BaseModel):
     task_id: int
     content: str
     created_at: datetime
-    _links: Links
+    links: Optional[Links] = Field(default=None, alias="_links")
 
 
 
 class CommentListOut(BaseModel):
     items: List[CommentOut]
-    _links: Links
+    links: Links = Field(alias="_links")
+
+
+
+
+
+# ---------- Search ----------
+class CommentSearchHit(BaseModel):
+    id: int
+    task_id: int
+    project_id: int
+    created_at: datetime
+    rank: float
+    snippet: str  # escapowany HTML, trafienia w <mark>...</mark>
+    links: Optional[Links] = Field(default=None, alias="_links")
+
+
+
+class CommentSearchOut(BaseModel):
+    items: List[CommentSearchHit]
+    links: Links = Field(alias="_links")
+
+
+
+
+
+# ---------- Events ----------
+class EventOut(BaseModel):
+    id: int  # kursor ?since= / Last-Event-ID
+    project_id: int
+    entity: str  # project | task | comment | member
+    entity_id: int
+    op: str  # created | updated | deleted
+    created_at: datetime
+
+
+
+class EventListOut(BaseModel):
+    items: List[EventOut]
+    links: Links = Field(alias="_links")
+
+
+
+
+
+# ---------- Batch ----------
+class BatchRequestItem(BaseModel):
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"]
+    path: str  # względem korzenia API, z query stringiem, np. /projects/1/tasks?limit=5
+    body: Optional[Any] = None
+    headers: Dict[str, str] = Field(default_factory=dict)
+
+
+
+class BatchResponseItem(BaseModel):
+    status: int
+    headers: Dict[str, str]
+    body: Optional[Any] = None
+
+
+
+class BatchOut(BaseModel):
+    responses: List[BatchResponseItem]
+    committed: Optional[bool] = None  # tylko dla ?transaction=true
+
+
+
+
+
+# ---------- Import ----------
+class ImportSummary(BaseModel):
+    entity: str
+    received: int
+    inserted: int
+    skipped: int
+    conflicting: int
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import html
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, Float, Integer, String, bindparam, text
+
+from .db import DbSession, engine
+from .models import FTS_CONFIG
+from .pagination import decode_cursor, encode_cursor
+
+
+
+
+# Ranking + keyset po (rank, id) malejąco: kolejna strona to "rank/id mniejsze niż ostatni
+# wiersz". Snippety liczone osobnym zapytaniem tylko dla wierszy strony.
+# Baza zaznacza trafienia znakami z Private Use Area; po escape HTML treści zamieniamy je
+# na <mark> - komentarz z "<script>" nie przejdzie do snippetu jako znacznik.
+MARK = ("\ue000", "\ue001")
+
+
+def highlight(snippet: str) -> str:
+    return html.escape(snippet, quote=False).replace(MARK[0], "<mark>").replace(MARK[1], "</mark>")
+
+
+HIT_COLUMNS = {
+    "id": Integer,
+    "task_id": Integer,
+    "project_id": Integer,
+    "created_at": DateTime(timezone=True),
+    "rank": Float,
+    "version": Integer,
+}
+
+SCOPES = {
+    "project": "t.project_id = :scope_id",
+    "user": "t.project_id IN (SELECT project_id FROM project_members WHERE user_id = :scope_id)",
+}
+
+POSTGRES_HITS = f"""
+SELECT c.id, c.task_id, t.project_id, c.created_at,
+       ts_rank(c.content_tsv, websearch_to_tsquery('{FTS_CONFIG}', :q)) AS rank, c.version
+FROM comments c JOIN tasks t ON t.id = c.task_id
+WHERE c.content_tsv @@ websearch_to_tsquery('{FTS_CONFIG}', :q) AND {{scope}}
+  AND (ts_rank(c.content_tsv, websearch_to_tsquery('{FTS_CONFIG}', :q)), c.id)
+      < (CAST(:rank AS real), :last_id)
+ORDER BY rank DESC, c.id DESC
+LIMIT :limit
+"""
+
+POSTGRES_SNIPPETS = f"""
+SELECT id, ts_headline('{FTS_CONFIG}', content, websearch_to_tsquery('{FTS_CONFIG}', :q),
+                       'StartSel={MARK[0]}, StopSel={MARK[1]}, MaxFragments=2')
+FROM comments WHERE id IN :ids
+"""
+
+SQLITE_HITS = """
+SELECT c.id, c.task_id, t.project_id, c.created_at, -bm25(comments_fts) AS rank, c.version
+FROM comments_fts JOIN comments c ON c.id = comments_fts.rowid JOIN tasks t ON t.id = c.task_id
+WHERE comments_fts MATCH :q AND {scope}
+  AND (-bm25(comments_fts), c.id) < (:rank, :last_id)
+ORDER BY rank DESC, c.id DESC
+LIMIT :limit
+"""
+
+SQLITE_SNIPPETS = f"""
+SELECT rowid, snippet(comments_fts, 0, '{MARK[0]}', '{MARK[1]}', '…', 16)
+FROM comments_fts WHERE comments_fts MATCH :q AND rowid IN :ids
+"""
+
+# pierwsza strona: granica powyżej każdego możliwego rankingu
+FIRST_PAGE = (float("inf"), 0)
+
+
+
+
+def fts5_query(q: str) -> str:
+    # każde słowo jako fraza w cudzysłowie - bez składni FTS5 (AND/OR/NEAR, *, :) od klienta
+    return " ".join('"' + word.replace('"', '""') + '"' for word in q.split())
+
+
+@dataclass(frozen=True)
+class CommentSearch:
+    q: str
+    scope: str  # klucz SCOPES
+    scope_id: int
+    limit: int
+    cursor: Optional[str] = None
+
+    def _sql(self) -> Tuple[str, str, str]:
+        if engine.dialect.name == "postgresql":
+            return POSTGRES_HITS, POSTGRES_SNIPPETS, self.q
+        return SQLITE_HITS, SQLITE_SNIPPETS, fts5_query(self.q)
+
+    async def run(self, db: DbSession) -> Tuple[List[dict], Sequence[Any], Optional[str]]:
+        if not self.q.split():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Empty search query"
+            )
+        hits_sql, snippets_sql, q = self._sql()
+        rank, last_id = FIRST_PAGE
+        if self.cursor is not None:
+            rank, last_id = decode_cursor(self.cursor, float, int)
+
+        rows = (
+            await db.execute(
+                text(hits_sql.format(scope=SCOPES[self.scope])).columns(**HIT_COLUMNS),
+                {
+                    "q": q,
+                    "scope_id": self.scope_id,
+                    "rank": rank,
+                    "last_id": last_id,
+                    "limit": self.limit + 1,
+                },
+            )
+        ).all()
+        next_cursor = None
+        if len(rows) > self.limit:
+            rows = rows[: self.limit]
+            next_cursor = encode_cursor(rows[-1].rank, rows[-1].id)
+        if not rows:
+            return [], rows, None
+
+        snippets = dict(
+            (
+                await db.execute(
+                    text(snippets_sql)
+                    .bindparams(bindparam("ids", expanding=True))
+                    .columns(id=Integer, snippet=String),
+                    {"q": q, "ids": [r.id for r in rows]},
+                )
+            ).all()
+        )
+        items = [
+            {
+                "id": r.id,
+                "task_id": r.task_id,
+                "project_id": r.project_id,
+                "created_at": r.created_at,
+                "rank": r.rank,
+                "snippet": highlight(snippets.get(r.id, "")),
+            }
+            for r in rows
+        ]
+        return items, rows, next_cursor
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import exists, func, insert, select, update
+
+from .db import DbSession, session_scope
+from .models import (
+    TASK_DUE_KEY,
+    Comment,
+    Project,
+    ProjectMember,
+    ProjectPriorityCount,
+    ProjectStats,
+    Task,
+)
+
+
+
+
+STATS_RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", "3600"))  # 0 = wyłączone
+STATS_RECONCILE_CHUNK = int(os.getenv("STATS_RECONCILE_CHUNK", "1000"))
+
+log = logging.getLogger("taskapi.stats")
+
+
+
+
+# Odczyt: 3 zapytania niezależnie od liczby projektów - wiersze liczników (PK), priorytety
+# (prefiks PK) i zaległe taski (count po zakresie indeksu (project_id, due, id)).
+async def read_stats(
+    db: DbSession, ids: Sequence[int], today: date
+) -> Dict[int, Dict[str, Any]]:
+    rows = (
+        await db.execute(
+            select(
+                ProjectStats.project_id,
+                ProjectStats.tasks,
+                ProjectStats.members,
+                ProjectStats.comments,
+            ).where(ProjectStats.project_id.in_(ids))
+        )
+    ).all()
+    out = {
+        r.project_id: {
+            "project_id": r.project_id,
+            "tasks": r.tasks,
+            "tasks_by_priority": {},
+            "overdue_tasks": 0,
+            "members": r.members,
+            "comments": r.comments,
+        }
+        for r in rows
+    }
+    if not out:
+        return out
+
+    found = list(out)
+    priorities = await db.execute(
+        select(
+            ProjectPriorityCount.project_id,
+            ProjectPriorityCount.priority,
+            ProjectPriorityCount.tasks,
+        )
+        .where(ProjectPriorityCount.project_id.in_(found), ProjectPriorityCount.tasks > 0)
+        .order_by(ProjectPriorityCount.project_id, ProjectPriorityCount.priority)
+    )
+    for project_id, priority, tasks in priorities.all():
+        out[project_id]["tasks_by_priority"][priority] = tasks
+
+    overdue = await db.execute(
+        select(Task.project_id, func.count())
+        .where(Task.project_id.in_(found), TASK_DUE_KEY < today)
+        .group_by(Task.project_id)
+    )
+    for project_id, count in overdue.all():
+        out[project_id]["overdue_tasks"] = count
+    return out
+
+
+async def load_stats(
+    db: DbSession, ids: Sequence[int], shared: Optional[DbSession] = None
+) -> Dict[int, Dict[str, Any]]:
+    today = date.today()
+    stats = await read_stats(db, ids, today)
+    missing = [i for i in ids if i not in stats]
+    if not missing:
+        return stats
+    # brak wiersza liczników (projekt sprzed tabeli, schemat z create_all, opóźniona
+    # replika) - liczymy i zapisujemy na primary; nieistniejące projekty zostają pominięte
+    if shared is not None:
+        # transakcja /batch - naprawa w jej sesji, rollback cofa ją razem z resztą
+        await reconcile_projects(shared, missing)
+        stats.update(await read_stats(shared, missing, today))
+        return stats
+    async with session_scope() as primary:
+        await reconcile_projects(primary, missing)
+        await primary.commit()
+        stats.update(await read_stats(primary, missing, today))
+    return stats
+
+
+
+
+async def _counts(db: DbSession, stmt: Any) -> Dict[Any, int]:
+    # ostatnia kolumna to liczba, wcześniejsze to klucz (jedna kolumna -> sama wartość)
+    out = {}
+    for *key, count in (await db.execute(stmt)).all():
+        out[key[0] if len(key) == 1 else tuple(key)] = count
+    return out
+
+
+async def reconcile_projects(db: DbSession, ids: Sequence[int]) -> int:
+    # Przelicza liczniki z tabel źródłowych i poprawia tylko te, które się rozjechały.
+    # Wiersze project_stats są blokowane (FOR UPDATE) przed liczeniem - triggery zapisów
+    # zaczynają od tego wiersza, więc liczymy po ich commicie, a nowe czekają na nasz.
+    created = await db.scalars(
+        insert(ProjectStats)
+        .from_select(
+            ["project_id"],
+            select(Project.id).where(
+                Project.id.in_(ids),
+                ~exists().where(ProjectStats.project_id == Project.id),
+            ),
+        )
+        .returning(ProjectStats.project_id)
+    )
+    repaired = set(created.all())
+    stored = {
+        r.project_id: (r.tasks, r.members, r.comments)
+        for r in (
+            await db.execute(
+                select(
+                    ProjectStats.project_id,
+                    ProjectStats.tasks,
+                    ProjectStats.members,
+                    ProjectStats.comments,
+                )
+                .where(ProjectStats.project_id.in_(ids))
+                .with_for_update()
+            )
+        ).all()
+    }
+    if not stored:
+        return len(repaired)
+    found = list(stored)
+
+    by_priority: Dict[Tuple[int, str], int] = await _counts(
+        db,
+        select(Task.project_id, Task.priority, func.count())
+        .where(Task.project_id.in_(found))
+        .group_by(Task.project_id, Task.priority),
+    )
+    members = await _counts(
+        db,
+        select(ProjectMember.project_id, func.count())
+        .where(ProjectMember.project_id.in_(found))
+        .group_by(ProjectMember.project_id),
+    )
+    comments = await _counts(
+        db,
+        select(Task.project_id, func.count())
+        .join(Comment, Comment.task_id == Task.id)
+        .where(Task.project_id.in_(found))
+        .group_by(Task.project_id),
+    )
+    stored_priority = await _counts(
+        db,
+        select(
+            ProjectPriorityCount.project_id,
+            ProjectPriorityCount.priority,
+            ProjectPriorityCount.tasks,
+        ).where(ProjectPriorityCount.project_id.in_(found)),
+    )
+
+    tasks: Dict[int, int] = defaultdict(int)
+    for (project_id, _), count in by_priority.items():
+        tasks[project_id] += count
+
+    for project_id, counters in stored.items():
+        actual = (tasks[project_id], members.get(project_id, 0), comments.get(project_id, 0))
+        if counters != actual:
+            await db.execute(
+                update(ProjectStats)
+                .where(ProjectStats.project_id == project_id)
+                .values(tasks=actual[0], members=actual[1], comments=actual[2])
+            )
+            repaired.add(project_id)
+
+    for key in by_priority.keys() | stored_priority.keys():
+        count = by_priority.get(key, 0)
+        if stored_priority.get(key) == count:
+            continue
+        project_id, priority = key
+        if key in stored_priority:
+            stmt = (
+                update(ProjectPriorityCount)
+                .where(
+                    ProjectPriorityCount.project_id == project_id,
+                    ProjectPriorityCount.priority == priority,
+                )
+                .values(tasks=count)
+            )
+        else:
+            stmt = insert(ProjectPriorityCount).values(
+                project_id=project_id, priority=priority, tasks=count
+            )
+        await db.execute(stmt)
+        repaired.add(project_id)
+    return len(repaired)
+
+
+async def reconcile(chunk: int = STATS_RECONCILE_CHUNK) -> int:
+    # partiami po id projektu, każda partia w osobnej krótkiej transakcji (jak purge)
+    repaired, last = 0, 0
+    while True:
+        async with session_scope() as db:
+            ids: List[int] = (
+                await db.scalars(
+                    select(Project.id).where(Project.id > last).order_by(Project.id).limit(chunk)
+                )
+            ).all()
+            if not ids:
+                break
+            repaired += await reconcile_projects(db, ids)
+            await db.commit()
+        last = ids[-1]
+    if repaired:
+        log.warning("project stats drift repaired for %d projects", repaired)
+    return repaired
+
+
+async def watch_stats(interval: float = STATS_RECONCILE_INTERVAL) -> None:
+    # najpierw czekamy - przy starcie wielu workerów nie skanują wszyscy naraz
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reconcile()
+        except Exception:
+            log.exception("project stats reconcile failed")
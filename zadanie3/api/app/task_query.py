@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Callable, List, Literal, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import Select, func, literal, or_, tuple_
+
+from .db import engine
+from .models import DUE_NEVER, TASK_DUE_KEY, Task
+from .pagination import Page, decode_cursor, encode_cursor
+
+
+
+
+TaskSort = Literal["id", "-id", "name", "-name", "due_date", "-due_date"]
+
+
+@dataclass(frozen=True)
+class SortKey:
+    expr: Any  # wyrażenie z indeksu (project_id, expr, id)
+    value: Callable[[Any], Any]  # ta sama wartość liczona z wiersza / obiektu ORM
+    column: Any  # kolumna potrzebna do value (load_only)
+
+
+# sortowanie po kolumnach nieunikalnych: keyset po (klucz, id) - id rozstrzyga remisy
+SORT_KEYS = {
+    "name": SortKey(Task.name, lambda t: t.name, Task.name),
+    "due_date": SortKey(TASK_DUE_KEY, lambda t: t.due_date or DUE_NEVER, Task.due_date),
+}
+
+
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _glob_escape(text: str) -> str:
+    return "".join(f"[{ch}]" if ch in "*?[" else ch for ch in text)
+
+
+
+
+@dataclass(frozen=True)
+class TaskQuery:
+    priority: Tuple[str, ...] = ()
+    due_from: Optional[date] = None
+    due_before: Optional[date] = None
+    name_prefix: Optional[str] = None
+    q: Optional[str] = None
+    sort: str = "id"
+    cursor: Optional[str] = None
+
+    @property
+    def descending(self) -> bool:
+        return self.sort.startswith("-")
+
+    @property
+    def key(self) -> Optional[SortKey]:
+        return SORT_KEYS.get(self.sort.lstrip("-"))
+
+    def params(self) -> List[Tuple[str, str]]:
+        # filtry i sort do przeniesienia w linku next (i do ETagu)
+        out = [("priority", p) for p in self.priority]
+        for name in ("due_from", "due_before", "name_prefix", "q"):
+            value = getattr(self, name)
+            if value is not None:
+                out.append((name, str(value)))
+        if self.sort != "id":
+            out.append(("sort", self.sort))
+        return out
+
+    def where(self, stmt: Select) -> Select:
+        sqlite = engine.dialect.name == "sqlite"
+        if self.priority:
+            stmt = stmt.where(Task.priority.in_(self.priority))
+        if self.due_from is not None:
+            stmt = stmt.where(TASK_DUE_KEY >= self.due_from, Task.due_date.is_not(None))
+        if self.due_before is not None:
+            stmt = stmt.where(TASK_DUE_KEY < self.due_before)
+        if self.name_prefix is not None:
+            if sqlite:
+                # GLOB jest case-sensitive jak LIKE w postgresie i idzie po (project_id, name, id)
+                stmt = stmt.where(Task.name.op("GLOB")(_glob_escape(self.name_prefix) + "*"))
+            else:
+                prefix = _like_escape(self.name_prefix) + "%"
+                stmt = stmt.where(Task.name.like(prefix, escape="\\"))
+        if self.q is not None:
+            if sqlite:
+                stmt = stmt.where(
+                    or_(
+                        func.icontains(Task.name, self.q),
+                        func.icontains(Task.description, self.q),
+                    )
+                )
+            else:
+                # ILIKE '%q%' obsługują indeksy GIN gin_trgm_ops
+                pattern = f"%{_like_escape(self.q)}%"
+                stmt = stmt.where(
+                    or_(
+                        Task.name.ilike(pattern, escape="\\"),
+                        Task.description.ilike(pattern, escape="\\"),
+                    )
+                )
+        return stmt
+
+    def paginate(self, stmt: Select, page: Page) -> Select:
+        key = self.key
+        # parametr od innego sortowania byłby po cichu pominięty - strona od początku
+        if key is None and self.cursor is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="cursor applies only to sort other than id; use after",
+            )
+        if key is not None and page.after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="after applies only to sort=id and -id; use cursor from the next link",
+            )
+        keys = [key.expr, Task.id] if key is not None else [Task.id]
+        if key is None and page.after is not None:
+            stmt = stmt.where(Task.id < page.after if self.descending else Task.id > page.after)
+        elif key is not None and self.cursor is not None:
+            value, last_id = decode_cursor(self.cursor, key.expr.type.python_type, int)
+            bound = tuple_(literal(value, key.expr.type), literal(last_id))
+            stmt = stmt.where(tuple_(*keys) < bound if self.descending else tuple_(*keys) > bound)
+        order = [k.desc() for k in keys] if self.descending else keys
+        return stmt.order_by(*order).limit(page.limit + 1)
+
+    def split(self, rows: Sequence[Any], page: Page) -> Tuple[Sequence[Any], Any]:
+        # następna strona: id (?after=) przy sortowaniu po id, inaczej kursor (?cursor=)
+        if len(rows) <= page.limit:
+            return rows, None
+        rows = rows[: page.limit]
+        last = rows[-1]
+        if self.key is None:
+            return rows, last.id
+        return rows, encode_cursor(self.key.value(last), last.id)
+
+
+
+
+def task_query(
+    priority: Optional[List[str]] = Query(None, description="np. priority=HIGH&priority=MEDIUM"),
+    due_from: Optional[date] = Query(None, description="due_date >= (bez tasków bez terminu)"),
+    due_before: Optional[date] = Query(None, description="due_date <"),
+    name_prefix: Optional[str] = Query(None, min_length=1, max_length=200),
+    q: Optional[str] = Query(
+        None, min_length=1, max_length=200, description="podciąg w name/description"
+    ),
+    sort: TaskSort = Query("id"),
+    cursor: Optional[str] = Query(None, description="z linku next przy sort innym niż id"),
+) -> TaskQuery:
+    return TaskQuery(
+        priority=tuple(priority or ()),
+        due_from=due_from,
+        due_before=due_before,
+        name_prefix=name_prefix,
+        q=q,
+        sort=sort,
+        cursor=cursor,
+    )
@@ -0,0 +1,121 @@
+import argparse
+import asyncio
+import os
+import platform
+import sys
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+import httpx
+
+from .database import BENCH_DATABASE_URL, seed_refusal, use_database
+from .dataset import Dataset
+from .report import compare, load, print_table, save, summarize
+from .workload import plan, run
+
+
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m bench",
+        description="Seed a dataset and drive the API with a mixed read/write workload",
+    )
+    parser.add_argument("--projects", type=int, default=Dataset.projects)
+    parser.add_argument("--tasks", type=int, default=Dataset.tasks, help="per project")
+    parser.add_argument("--comments", type=int, default=Dataset.comments, help="per task")
+    parser.add_argument("--users", type=int, default=Dataset.users)
+    parser.add_argument("--members", type=int, default=Dataset.members, help="per project")
+    parser.add_argument("--seed", type=int, default=Dataset.seed)
+    parser.add_argument(
+        "--database-url",
+        default=BENCH_DATABASE_URL,
+        help="separate bench database, seeded and used instead of DATABASE_URL "
+        "(default: BENCH_DATABASE_URL); required unless DATABASE_URL is SQLite. "
+        "With --mode http it must be the database the server uses",
+    )
+    parser.add_argument(
+        "--reset", action="store_true", help="allow seeding to drop every table in DATABASE_URL"
+    )
+    parser.add_argument("--no-seed", action="store_true", help="reuse the data already in the database")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--mode", choices=("asgi", "http"), default="asgi")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="for --mode http")
+    parser.add_argument("--out", help="save the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p95 slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+    if not args.no_seed:
+        refusal = seed_refusal(args.database_url, os.getenv("DATABASE_URL"), args.reset)
+        if refusal:
+            parser.error(refusal)
+    return args
+
+
+
+
+@asynccontextmanager
+async def client(args: argparse.Namespace) -> AsyncIterator[httpx.AsyncClient]:
+    if args.mode == "http":
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as c:
+            yield c
+        return
+
+    from main import app
+
+    # ASGITransport nie wysyła zdarzeń lifespan - startup (szyna zdarzeń, ingest komentarzy,
+    # zadania w tle) i shutdown uruchamiamy sami, jak uvicorn
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench"
+        ) as c:
+            yield c
+
+
+async def main(args: argparse.Namespace) -> int:
+    if args.database_url:
+        use_database(args.database_url)
+    from app.db import engine
+
+    from .seed import seed, seeded_ids
+
+    ds = Dataset(args.projects, args.tasks, args.comments, args.users, args.members, args.seed)
+    if not args.no_seed:
+        seed(ds)
+    ids = seeded_ids()
+
+    async with client(args) as c:
+        if args.warmup:
+            await run(c, plan(ids, args.warmup, args.seed + 1), args.concurrency)
+        result = await run(c, plan(ids, args.requests, args.seed), args.concurrency)
+
+    report = summarize(
+        result,
+        {
+            "dataset": ds.as_dict(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "mode": args.mode,
+            "dialect": engine.dialect.name,
+            "database": engine.url.render_as_string(hide_password=True),
+            "python": platform.python_version(),
+            "at": datetime.now(timezone.utc).isoformat(),
+        },
+    )
+    print_table(report)
+    if args.out:
+        save(report, args.out)
+
+    if args.compare:
+        regressions = compare(report, load(args.compare), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import os
+import sys
+from typing import Optional
+
+from sqlalchemy.engine import make_url
+
+
+
+
+# osobna baza benchmarku - seed() kasuje w niej wszystkie tabele
+BENCH_DATABASE_URL = os.getenv("BENCH_DATABASE_URL")
+
+
+def _without_driver(url: str):
+    u = make_url(url)
+    return u.set(drivername=u.get_backend_name())
+
+
+def same_database(a: str, b: str) -> bool:
+    # postgresql+asyncpg i postgresql+psycopg2 to ta sama baza
+    return _without_driver(a) == _without_driver(b)
+
+
+def seed_refusal(bench_url: Optional[str], app_url: Optional[str], reset: bool) -> Optional[str]:
+    """Powód odmowy seedowania (drop_all + create_all) albo None, gdy wolno."""
+    if bench_url:
+        if app_url and same_database(bench_url, app_url) and not reset:
+            return "the bench database is DATABASE_URL; pass --reset to drop and reseed it"
+        return None
+    if not app_url:
+        return "set --database-url or BENCH_DATABASE_URL"
+    if make_url(app_url).get_backend_name() != "sqlite":
+        return (
+            "refusing to drop DATABASE_URL; point --database-url or BENCH_DATABASE_URL "
+            "at a separate database"
+        )
+    if not reset:
+        return (
+            "seeding drops every table in DATABASE_URL; pass --reset "
+            "or use --database-url / BENCH_DATABASE_URL"
+        )
+    return None
+
+
+def use_database(url: str) -> None:
+    # app.db czyta DATABASE_URL przy imporcie - podmiana musi być przed pierwszym importem app
+    if "app.db" in sys.modules:
+        raise RuntimeError("app.db is already imported; call use_database() first")
+    os.environ["DATABASE_URL"] = url
+    # repliki należą do bazy aplikacji, nie do bazy benchmarku
+    os.environ.pop("DATABASE_REPLICA_URLS", None)
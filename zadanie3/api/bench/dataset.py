@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Dict
+
+
+
+
+@dataclass(frozen=True)
+class Dataset:
+    projects: int = 20
+    tasks: int = 50  # na projekt
+    comments: int = 10  # na task
+    users: int = 200
+    members: int = 10  # członków na projekt
+    seed: int = 1
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import json
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from .workload import RunResult
+
+
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def _summary(ms: List[float], queries: List[int], errors: int) -> Dict[str, Any]:
+    return {
+        "count": len(ms),
+        "errors": errors,
+        "p50_ms": round(percentile(ms, 0.50), 3),
+        "p95_ms": round(percentile(ms, 0.95), 3),
+        "p99_ms": round(percentile(ms, 0.99), 3),
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+
+
+def summarize(result: RunResult, meta: Dict[str, Any]) -> Dict[str, Any]:
+    by_op: Dict[str, List] = defaultdict(list)
+    for s in result.samples:
+        by_op[s.op].append(s)
+
+    ops = {}
+    for op, samples in sorted(by_op.items()):
+        ops[op] = _summary(
+            [s.ms for s in samples],
+            [s.queries for s in samples if s.queries is not None],
+            sum(1 for s in samples if s.status >= 400),
+        )
+
+    overall = _summary(
+        [s.ms for s in result.samples],
+        [s.queries for s in result.samples if s.queries is not None],
+        sum(1 for s in result.samples if s.status >= 400),
+    )
+    overall["throughput_rps"] = round(len(result.samples) / result.wall_s, 1) if result.wall_s else 0.0
+    return {"meta": meta, "overall": overall, "ops": ops}
+
+
+
+
+def print_table(report: Dict[str, Any]) -> None:
+    header = f"{'op':<16}{'count':>7}{'err':>5}{'p50':>10}{'p95':>10}{'p99':>10}{'q/req':>8}"
+    print(header)
+    print("-" * len(header))
+    rows = list(report["ops"].items()) + [("TOTAL", report["overall"])]
+    for op, s in rows:
+        qpr = "-" if s["queries_per_request"] is None else f"{s['queries_per_request']:.1f}"
+        print(
+            f"{op:<16}{s['count']:>7}{s['errors']:>5}"
+            f"{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{qpr:>8}"
+        )
+    print(f"\nthroughput: {report['overall']['throughput_rps']} req/s")
+
+
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    # regresja = p95 albo liczba zapytań na request gorsze o więcej niż threshold
+    regressions = []
+    for op, cur in current["ops"].items():
+        base = baseline["ops"].get(op)
+        if not base:
+            continue
+        if base["p95_ms"] and cur["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(
+                f"{op}: p95 {base['p95_ms']:.2f} -> {cur['p95_ms']:.2f} ms"
+            )
+        if (
+            base["queries_per_request"] is not None
+            and cur["queries_per_request"] is not None
+            # cache trafia różnie między przebiegami - ignorujemy szum poniżej pół zapytania
+            and cur["queries_per_request"] - base["queries_per_request"]
+            > max(0.5, base["queries_per_request"] * threshold)
+        ):
+            regressions.append(
+                f"{op}: queries/request {base['queries_per_request']} -> {cur['queries_per_request']}"
+            )
+    return regressions
+
+
+
+
+def save(report: Dict[str, Any], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
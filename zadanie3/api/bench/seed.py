@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import random
+from datetime import date, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import insert, select
+
+from app import models  
+from app.db import Base, SessionLocal, engine
+from app.models import Comment, Project, ProjectMember, Task, User
+
+from .dataset import Dataset
+
+
+
+
+BATCH = 5000
+DELETE_POOL = 5000  # komentarze do usuwania w benchmarku (każdy raz)
+
+PRIORITIES = ["LOW", "MEDIUM", "HIGH"]
+
+
+
+
+def _insert(db, model, rows: Iterable[Dict[str, Any]]) -> None:
+    rows = iter(rows)
+    while chunk := list(islice(rows, BATCH)):
+        db.execute(insert(model), chunk)
+
+
+
+
+def seed(ds: Dataset) -> None:
+    # kasuje wszystkie tabele w DATABASE_URL - wywołujący sprawdza seed_refusal()
+    rnd = random.Random(ds.seed)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    with SessionLocal() as db:
+        _insert(
+            db,
+            User,
+            ({"name": f"user {i}", "email": f"user{i}@bench.example"} for i in range(ds.users)),
+        )
+        _insert(
+            db,
+            Project,
+            (
+                {"name": f"project {i}", "description": "benchmark", "start_date": date(2026, 1, 1)}
+                for i in range(ds.projects)
+            ),
+        )
+        project_ids = db.scalars(select(Project.id).order_by(Project.id)).all()
+        user_ids = db.scalars(select(User.id).order_by(User.id)).all()
+
+        _insert(
+            db,
+            ProjectMember,
+            (
+                {"project_id": p, "user_id": u}
+                for p in project_ids
+                for u in rnd.sample(user_ids, min(ds.members, len(user_ids)))
+            ),
+        )
+        _insert(
+            db,
+            Task,
+            (
+                {
+                    "project_id": p,
+                    "name": f"task {p}-{i}",
+                    "description": "x" * rnd.randint(0, 200),
+                    "priority": rnd.choice(PRIORITIES),
+                    "due_date": date(2026, 1, 1) + timedelta(days=rnd.randint(0, 365)),
+                }
+                for p in project_ids
+                for i in range(ds.tasks)
+            ),
+        )
+        task_ids = db.scalars(select(Task.id).order_by(Task.id)).all()
+        _insert(
+            db,
+            Comment,
+            (
+                {"task_id": t, "content": f"comment {j} " + "y" * rnd.randint(0, 300)}
+                for t in task_ids
+                for j in range(ds.comments)
+            ),
+        )
+        db.commit()
+
+
+
+
+def seeded_ids() -> Dict[str, List[Any]]:
+    with SessionLocal() as db:
+        return {
+            "projects": db.scalars(select(Project.id)).all(),
+            "users": db.scalars(select(User.id)).all(),
+            "tasks": [tuple(r) for r in db.execute(select(Task.project_id, Task.id)).all()],
+            "comments": [
+                tuple(r)
+                for r in db.execute(
+                    select(Task.project_id, Task.id, Comment.id)
+                    .join(Comment, Comment.task_id == Task.id)
+                    .order_by(Comment.id)
+                    .limit(DELETE_POOL)
+                ).all()
+            ],
+        }
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from statistics import median
+from typing import Callable, List
+
+from .database import use_database
+from .dataset import Dataset
+
+
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.serialize",
+        description="CPU cost of one large list_tasks body: pydantic response_model vs rows -> fastjson",
+    )
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--links", choices=("all", "none"), default="all")
+    return parser.parse_args()
+
+
+def timed(fn: Callable[[], bytes], repeat: int) -> List[float]:
+    runs = []
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        runs.append((time.process_time() - start) * 1000)
+    return runs
+
+
+def main() -> None:
+    args = parse_args()
+    # seed() kasuje tabele - zawsze na tymczasowym pliku sqlite, nigdy na DATABASE_URL
+    with tempfile.TemporaryDirectory(prefix="bench-serialize-") as tmp:
+        use_database(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        measure(args)
+
+
+def measure(args: argparse.Namespace) -> None:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+    from sqlalchemy import select
+
+    from app.db import SessionLocal, engine
+    from app.fastjson import dumps, orjson, row_items
+    from app.fieldsets import TASK_COLUMNS
+    from app.hateoas import task_links, tasks_list_links
+    from app.models import Task
+    from app.routers.tasks import to_task_out
+    from app.schemas import TaskListOut
+
+    from main import app  # noqa: F401 - kompiluje szablony _links
+
+    from .seed import seed
+
+    seed(Dataset(projects=1, tasks=args.items, comments=0, users=1, members=1))
+    adapter = TypeAdapter(TaskListOut)
+    links = args.links == "all"
+
+    def model_path() -> bytes:
+        # to co robił handler + FastAPI: ORM -> TaskOut -> walidacja response_model -> json
+        with SessionLocal() as db:
+            tasks = db.scalars(select(Task).order_by(Task.id)).all()
+        out = adapter.validate_python(
+            TaskListOut(items=[to_task_out(t, links) for t in tasks], _links=tasks_list_links(1))
+        )
+        exclude = None if links else {"items": {"__all__": {"links"}}}
+        return JSONResponse(jsonable_encoder(out, exclude=exclude)).body
+
+    def row_path() -> bytes:
+        with SessionLocal() as db:
+            rows = db.execute(select(*TASK_COLUMNS, Task.version).order_by(Task.id)).all()
+        item_links = (lambda t: task_links(t.project_id, t.id)) if links else None
+        body = {
+            "items": row_items(rows, TASK_COLUMNS, item_links),
+            "_links": tasks_list_links(1),
+        }
+        return dumps(body)
+
+    assert model_path() == row_path(), "fast path output differs from the schema output"
+
+    print(f"{args.items} tasks, links={args.links}, encoder: {'orjson' if orjson is not None else 'json'}")
+    base = median(timed(model_path, args.repeat))
+    fast = median(timed(row_path, args.repeat))
+    print(f"  pydantic response_model  {base:9.1f} ms cpu")
+    print(f"  rows -> fastjson         {fast:9.1f} ms cpu   ({base / fast:.1f}x)")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+
+
+
+# (nazwa, waga, metoda, budowa ścieżki, budowa body) - ~85% odczytów, ~15% zapisów.
+# body: dict/list -> JSON, str -> surowa treść (import NDJSON)
+Op = Tuple[str, int, str, Callable[..., str], Optional[Callable[..., Any]]]
+
+def _project(r: random.Random, ids: Dict[str, Any]) -> str:
+    return f"/projects/{r.choice(ids['projects'])}"
+
+
+def _task(r: random.Random, ids: Dict[str, Any]) -> str:
+    project_id, task_id = r.choice(ids["tasks"])
+    return f"/projects/{project_id}/tasks/{task_id}"
+
+
+def _comment_to_delete(r: random.Random, ids: Dict[str, Any]) -> str:
+    # każdy komentarz z puli usuwany raz; po wyczerpaniu puli 404 (widoczne w err)
+    if not ids["comments"]:
+        return _task(r, ids) + "/comments/0"
+    project_id, task_id, comment_id = ids["comments"].pop(r.randrange(len(ids["comments"])))
+    return f"/projects/{project_id}/tasks/{task_id}/comments/{comment_id}"
+
+
+def _batch(r: random.Random, ids: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"method": "GET", "path": _project(r, ids)},
+        {"method": "GET", "path": _task(r, ids)},
+        {"method": "GET", "path": _project(r, ids) + "/stats"},
+    ]
+
+
+def _import_users(r: random.Random, ids: Dict[str, Any]) -> str:
+    return "".join(
+        json.dumps({"name": "bench user", "email": f"bench-{r.getrandbits(64):x}@example.com"})
+        + "\n"
+        for _ in range(20)
+    )
+
+
+OPS: List[Op] = [
+    ("list_projects", 8, "GET", lambda r, ids: "/projects?limit=50", None),
+    ("get_project", 15, "GET", _project, None),
+    ("list_tasks", 15, "GET", lambda r, ids: _project(r, ids) + "/tasks?limit=50", None),
+    ("get_task", 15, "GET", _task, None),
+    ("list_comments", 10, "GET", lambda r, ids: _task(r, ids) + "/comments?limit=50", None),
+    ("list_users", 4, "GET", lambda r, ids: "/users?limit=50", None),
+    ("get_user", 10, "GET", lambda r, ids: f"/users/{r.choice(ids['users'])}", None),
+    ("list_members", 8, "GET", lambda r, ids: _project(r, ids) + "/members", None),
+    (
+        "search_comments", 3, "GET",
+        lambda r, ids: f"/search/comments?q=comment&project_id={r.choice(ids['projects'])}",
+        None,
+    ),
+    ("project_stats", 3, "GET", lambda r, ids: _project(r, ids) + "/stats", None),
+    (
+        "poll_events", 3, "GET",
+        lambda r, ids: _project(r, ids) + "/events?since=0&wait=0&limit=50",
+        None,
+    ),
+    ("batch_reads", 2, "POST", lambda r, ids: "/batch", _batch),
+    (
+        "patch_task", 5, "PATCH", _task,
+        lambda r, ids: {"priority": r.choice(["LOW", "MEDIUM", "HIGH"])},
+    ),
+    (
+        "create_comment", 6, "POST", lambda r, ids: _task(r, ids) + "/comments",
+        lambda r, ids: {"content": "bench comment"},
+    ),
+    ("delete_comment", 2, "DELETE", _comment_to_delete, None),
+    (
+        "create_task", 2, "POST", lambda r, ids: _project(r, ids) + "/tasks",
+        lambda r, ids: {"name": "bench task", "priority": "LOW"},
+    ),
+    (
+        "update_project", 2, "PATCH", _project,
+        lambda r, ids: {"description": f"bench {r.random()}"},
+    ),
+    ("import_users", 1, "POST", lambda r, ids: "/import/users?format=ndjson", _import_users),
+]
+
+QUERIES_RE = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries')
+
+
+
+
+@dataclass
+class Sample:
+    op: str
+    ms: float
+    status: int
+    queries: Optional[int]
+
+
+@dataclass
+class RunResult:
+    samples: List[Sample] = field(default_factory=list)
+    wall_s: float = 0.0
+
+
+
+
+def plan(ids: Dict[str, Any], requests: int, seed: int) -> List[Tuple[str, str, str, Any]]:
+    rnd = random.Random(seed)
+    weights = [w for _, w, _, _, _ in OPS]
+    calls = []
+    for name, _, method, path, body in rnd.choices(OPS, weights=weights, k=requests):
+        calls.append((name, method, path(rnd, ids), body(rnd, ids) if body else None))
+    return calls
+
+
+
+
+async def run(
+    client: httpx.AsyncClient, calls: List[Tuple[str, str, str, Any]], concurrency: int
+) -> RunResult:
+    result = RunResult()
+    queue = iter(calls)
+
+    async def worker() -> None:
+        for name, method, path, body in queue:
+            start = time.perf_counter()
+            if isinstance(body, str):
+                r = await client.request(method, path, content=body)
+            else:
+                r = await client.request(method, path, json=body)
+            ms = (time.perf_counter() - start) * 1000
+            m = QUERIES_RE.search(r.headers.get("server-timing", ""))
+            result.samples.append(Sample(name, ms, r.status_code, int(m.group(1)) if m else None))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.wall_s = time.perf_counter() - start
+    return result
@@ -0,0 +1,33 @@
+import argparse
+import sys
+
+from app.bulk_import import IMPORTS, ImportFileError, run_import
+
+
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk import users/projects/members")
+    parser.add_argument("entity", choices=sorted(IMPORTS))
+    parser.add_argument("path", help="plik CSV/NDJSON albo '-' dla stdin")
+    parser.add_argument("--format", choices=("csv", "ndjson"))
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+
+    from app import models  
+
+    try:
+        if args.path == "-":
+            summary = run_import(args.entity, sys.stdin, fmt)
+        else:
+            with open(args.path, encoding="utf-8", newline="") as f:
+                summary = run_import(args.entity, f, fmt)
+    except ImportFileError as exc:
+        sys.exit(f"{parser.prog}: {exc}")
+
+    print(summary.model_dump_json())
+
+
+if __name__ == "__main__":
+    main()
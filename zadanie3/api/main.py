@@ -1,23 +1,83 @@
+import asyncio
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
-from app.db import Base, engine
-from app.hateoas import root_links
+from app.cache import response_cache
+from app.db import DB_CREATE_ALL, async_engine, create_all, engine, replicas
+from app.events import EVENTS_RETENTION, PostgresListener, change_bus, watch_events
+from app.fastjson import FastJSONResponse
+from app.hateoas import compile_links, root_links
+from app.ingest import COMMENT_INGEST, comment_ingest
+from app.instrumentation import SQLStatsMiddleware, instrument_engine
+from app.metrics import MetricsMiddleware, render as render_metrics
+from app.replicas import LastWriteMiddleware
+from app.routers.batch import router as batch_router
 from app.routers.comments import router as comments_router
+from app.routers.events import router as events_router
+from app.routers.imports import router as imports_router
 from app.routers.members import router as members_router
 from app.routers.projects import router as projects_router
+from app.routers.search import router as search_router
 from app.routers.tasks import router as tasks_router
 from app.routers.users import router as users_router
+from app.stats import STATS_RECONCILE_INTERVAL, watch_stats
+
+
+app = FastAPI(title="Task API", version="0.1.0", default_response_class=FastJSONResponse)
+
+app.add_middleware(SQLStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine)
 
+if replicas:
+    app.add_middleware(LastWriteMiddleware)
+    for replica in replicas.replicas:
+        instrument_engine(replica.engine)
+        if replica.async_engine is not None:
+            instrument_engine(replica.async_engine.sync_engine)
 
-app = FastAPI(title="Task API", version="0.1.0")
+background_tasks = set()
+events_listener = PostgresListener(engine, change_bus)
 
 
 @app.on_event("startup")
-def on_startup() -> None:
+async def on_startup() -> None:
     
     from app import models  
 
-    Base.metadata.create_all(bind=engine)
+    if DB_CREATE_ALL:
+        await create_all()
+
+    change_bus.bind(asyncio.get_running_loop())
+    if engine.dialect.name == "postgresql":
+        # zdarzenia z innych instancji (i własne) przychodzą przez LISTEN/NOTIFY
+        events_listener.start()
+
+    if COMMENT_INGEST:
+        comment_ingest.start()
+
+    if replicas:
+        # health-check replik w tle; niedostępna wypada z round-robin do następnego sprawdzenia
+        background_tasks.add(asyncio.create_task(replicas.watch()))
+
+    if STATS_RECONCILE_INTERVAL > 0:
+        # okresowa naprawa rozjazdów liczników /projects/{id}/stats (na co dzień: triggery)
+        background_tasks.add(asyncio.create_task(watch_stats()))
+
+    if EVENTS_RETENTION > 0:
+        # outbox project_events rośnie z każdym zapisem - starsze zdarzenia usuwane w tle
+        background_tasks.add(asyncio.create_task(watch_events()))
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    for task in background_tasks:
+        task.cancel()
+    await comment_ingest.stop()
+    events_listener.stop()
 
 
 @app.get("/")
@@ -34,9 +94,36 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/cache/stats")
+def cache_stats():
+    return response_cache.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    pools = {"sync": engine.pool}
+    if async_engine is not None:
+        pools["async"] = async_engine.pool
+    for replica in replicas.replicas:
+        pools[replica.name] = replica.engine.pool
+        if replica.async_engine is not None:
+            pools[f"{replica.name}_async"] = replica.async_engine.pool
+    return PlainTextResponse(
+        render_metrics(pools, response_cache.stats),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
 
 app.include_router(projects_router)
 app.include_router(tasks_router)
 app.include_router(users_router)
 app.include_router(members_router)
 app.include_router(comments_router)
+app.include_router(imports_router)
+app.include_router(search_router)
+app.include_router(events_router)
+app.include_router(batch_router)
+
+# szablony _links ze ścieżek zarejestrowanych tras - raz, przy starcie
+compile_links(app.routes)
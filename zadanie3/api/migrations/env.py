@@ -0,0 +1,77 @@
+from logging.config import fileConfig
+
+from alembic import context
+from alembic.autogenerate import compare_metadata
+from sqlalchemy import inspect
+
+from app import models  
+from app.db import DATABASE_URL, Base, engine
+
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # wyszukiwanie (tsvector / FTS5) jest utrzymywane przez bazę, poza metadanymi
+    if reflected and name.startswith(models.SEARCH_OBJECTS):
+        return False
+    # indeksy oznaczone postgres_only nie istnieją na innych bazach
+    dialect = obj.info.get("dialect") if type_ == "index" and not reflected else None
+    return dialect is None or dialect == context.get_context().dialect.name
+
+
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def created_without_alembic(connection) -> bool:
+    # Base.metadata.create_all (DB_CREATE_ALL=1) zakłada schemat bez alembic_version -
+    # upgrade od 0001 padłby na "table already exists"
+    tables = set(inspect(connection).get_table_names())
+    if "alembic_version" in tables or not tables & set(target_metadata.tables):
+        return False
+    diff = compare_metadata(context.get_context(), target_metadata)
+    if diff:
+        # create_all ze starszej wersji modeli - nie wiadomo, od której migracji zacząć
+        raise RuntimeError(
+            "schema exists without alembic_version and differs from the models;"
+            f" upgrade it by hand and run `alembic stamp <revision>`: {diff[:5]}"
+        )
+    return True
+
+
+def run_migrations_online() -> None:
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+        )
+        if created_without_alembic(connection):
+            # schemat = modele = head; tylko zapis wersji
+            context.get_context().stamp(context.script, "head")
+        # inspekcja otworzyła transakcję - bez commitu begin_transaction uznałby ją za
+        # zewnętrzną i nie zatwierdził migracji
+        connection.commit()
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
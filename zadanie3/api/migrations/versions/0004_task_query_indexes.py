@@ -0,0 +1,81 @@
+"""indexes for task filtering, sorting and search
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("ix_tasks_project_id_priority_id", ["project_id", "priority", "id"], {}),
+    (
+        "ix_tasks_project_id_due_id",
+        ["project_id", sa.text("coalesce(due_date, '9999-12-31')"), "id"],
+        {},
+    ),
+    ("ix_tasks_project_id_name_id", ["project_id", "name", "id"], {}),
+]
+
+POSTGRES_INDEXES = [
+    (
+        "ix_tasks_project_id_name_pattern",
+        ["project_id", "name"],
+        {"postgresql_ops": {"name": "varchar_pattern_ops"}},
+    ),
+    (
+        "ix_tasks_name_trgm",
+        ["name"],
+        {"postgresql_using": "gin", "postgresql_ops": {"name": "gin_trgm_ops"}},
+    ),
+    (
+        "ix_tasks_description_trgm",
+        ["description"],
+        {"postgresql_using": "gin", "postgresql_ops": {"description": "gin_trgm_ops"}},
+    ),
+]
+
+
+def _indexes():
+    if op.get_context().dialect.name == "postgresql":
+        return INDEXES + POSTGRES_INDEXES
+    return INDEXES
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CREATE INDEX CONCURRENTLY nie może iść w transakcji
+    with op.get_context().autocommit_block():
+        for name, columns, kw in _indexes():
+            op.create_index(
+                name,
+                "tasks",
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+                **kw,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in _indexes():
+            op.drop_index(
+                name,
+                table_name="tasks",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
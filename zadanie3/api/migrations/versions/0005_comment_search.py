@@ -0,0 +1,69 @@
+"""full-text search on comments (tsvector + GIN / FTS5)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 14:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+FTS_CONFIG = "simple"
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name == "postgresql":
+        # kolumna generowana przepisuje tabelę - na dużych bazach w oknie serwisowym
+        op.execute(
+            "ALTER TABLE comments ADD COLUMN IF NOT EXISTS content_tsv tsvector"
+            f" GENERATED ALWAYS AS (to_tsvector('{FTS_CONFIG}', content)) STORED"
+        )
+        with op.get_context().autocommit_block():
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_comments_content_tsv"
+                " ON comments USING gin (content_tsv)"
+            )
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts"
+        " USING fts5(content, content='comments', content_rowid='id')"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS comments_fts_ai AFTER INSERT ON comments BEGIN"
+        " INSERT INTO comments_fts(rowid, content) VALUES (new.id, new.content); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS comments_fts_ad AFTER DELETE ON comments BEGIN"
+        " INSERT INTO comments_fts(comments_fts, rowid, content)"
+        " VALUES ('delete', old.id, old.content); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS comments_fts_au AFTER UPDATE OF content ON comments BEGIN"
+        " INSERT INTO comments_fts(comments_fts, rowid, content)"
+        " VALUES ('delete', old.id, old.content);"
+        " INSERT INTO comments_fts(rowid, content) VALUES (new.id, new.content); END"
+    )
+    # istniejące komentarze
+    op.execute("INSERT INTO comments_fts(comments_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_comments_content_tsv")
+        op.execute("ALTER TABLE comments DROP COLUMN IF EXISTS content_tsv")
+        return
+
+    for trigger in ("comments_fts_ai", "comments_fts_ad", "comments_fts_au"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS comments_fts")
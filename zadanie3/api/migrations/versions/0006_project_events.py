@@ -0,0 +1,58 @@
+"""project change events (outbox) + NOTIFY trigger
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 16:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+EVENTS_CHANNEL = "project_events"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "project_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("entity", sa.String(20), nullable=False),
+        sa.Column("entity_id", sa.Integer(), nullable=False),
+        sa.Column("op", sa.String(10), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+    )
+    op.create_index("ix_project_events_project_id_id", "project_events", ["project_id", "id"])
+
+    if op.get_context().dialect.name == "postgresql":
+        op.execute(
+            "CREATE OR REPLACE FUNCTION notify_project_event() RETURNS trigger AS $$"
+            f" BEGIN PERFORM pg_notify('{EVENTS_CHANNEL}', CAST(row_to_json(NEW) AS text));"
+            " RETURN NEW; END $$ LANGUAGE plpgsql"
+        )
+        op.execute(
+            "CREATE TRIGGER project_events_notify AFTER INSERT ON project_events"
+            " FOR EACH ROW EXECUTE FUNCTION notify_project_event()"
+        )
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name == "postgresql":
+        op.execute("DROP TRIGGER IF EXISTS project_events_notify ON project_events")
+        op.execute("DROP FUNCTION IF EXISTS notify_project_event()")
+    op.drop_index("ix_project_events_project_id_id", table_name="project_events")
+    op.drop_table("project_events")
@@ -0,0 +1,189 @@
+"""project counters (project_stats, project_priority_counts) maintained by triggers
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PRIORITY_INC = (
+    "INSERT INTO project_priority_counts (project_id, priority, tasks)"
+    " VALUES ({row}.project_id, {row}.priority, 1) ON CONFLICT (project_id, priority)"
+    " DO UPDATE SET tasks = project_priority_counts.tasks + 1"
+)
+PRIORITY_DEC = (
+    "UPDATE project_priority_counts SET tasks = tasks - 1"
+    " WHERE project_id = {row}.project_id AND priority = {row}.priority"
+)
+TASK_INC = "UPDATE project_stats SET tasks = tasks + 1 WHERE project_id = new.project_id"
+TASK_DEC = (
+    "UPDATE project_stats SET tasks = tasks - 1,"
+    " comments = comments - (SELECT count(*) FROM comments WHERE task_id = old.id)"
+    " WHERE project_id = old.project_id"
+)
+COMMENT_ADD = (
+    "UPDATE project_stats SET comments = comments {sign} 1"
+    " WHERE project_id = (SELECT project_id FROM tasks WHERE id = {row}.task_id)"
+)
+MEMBER_ADD = (
+    "UPDATE project_stats SET members = members {sign} 1 WHERE project_id = {row}.project_id"
+)
+
+
+def plpgsql(name: str, body: str) -> str:
+    return (
+        f"CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$"
+        f" BEGIN {body} END $$ LANGUAGE plpgsql"
+    )
+
+
+POSTGRES = [
+    plpgsql(
+        "project_stats_on_project",
+        "INSERT INTO project_stats (project_id) VALUES (new.id); RETURN NULL;",
+    ),
+    plpgsql(
+        "project_stats_on_task",
+        "IF TG_OP = 'INSERT' THEN"
+        f" {TASK_INC}; {PRIORITY_INC.format(row='new')}; RETURN NULL;"
+        " ELSIF TG_OP = 'UPDATE' THEN"
+        " PERFORM 1 FROM project_stats WHERE project_id = new.project_id FOR UPDATE;"
+        f" {PRIORITY_DEC.format(row='old')}; {PRIORITY_INC.format(row='new')};"
+        " RETURN NULL; END IF;"
+        f" {TASK_DEC}; {PRIORITY_DEC.format(row='old')}; RETURN old;",
+    ),
+    plpgsql(
+        "project_stats_on_comment",
+        f"IF TG_OP = 'INSERT' THEN {COMMENT_ADD.format(sign='+', row='new')};"
+        f" ELSE {COMMENT_ADD.format(sign='-', row='old')}; END IF; RETURN NULL;",
+    ),
+    plpgsql(
+        "project_stats_on_member",
+        f"IF TG_OP = 'INSERT' THEN {MEMBER_ADD.format(sign='+', row='new')};"
+        f" ELSE {MEMBER_ADD.format(sign='-', row='old')}; END IF; RETURN NULL;",
+    ),
+    "CREATE OR REPLACE TRIGGER project_stats_projects AFTER INSERT ON projects"
+    " FOR EACH ROW EXECUTE FUNCTION project_stats_on_project()",
+    "CREATE OR REPLACE TRIGGER project_stats_tasks AFTER INSERT OR UPDATE OF priority"
+    " ON tasks FOR EACH ROW EXECUTE FUNCTION project_stats_on_task()",
+    "CREATE OR REPLACE TRIGGER project_stats_tasks_bd BEFORE DELETE ON tasks"
+    " FOR EACH ROW EXECUTE FUNCTION project_stats_on_task()",
+    "CREATE OR REPLACE TRIGGER project_stats_comments AFTER INSERT OR DELETE ON comments"
+    " FOR EACH ROW EXECUTE FUNCTION project_stats_on_comment()",
+    "CREATE OR REPLACE TRIGGER project_stats_members AFTER INSERT OR DELETE"
+    " ON project_members FOR EACH ROW EXECUTE FUNCTION project_stats_on_member()",
+]
+
+SQLITE = [
+    "CREATE TRIGGER IF NOT EXISTS project_stats_projects_ai AFTER INSERT ON projects BEGIN"
+    " INSERT INTO project_stats (project_id) VALUES (new.id); END",
+    "CREATE TRIGGER IF NOT EXISTS project_stats_tasks_ai AFTER INSERT ON tasks BEGIN"
+    f" {TASK_INC}; {PRIORITY_INC.format(row='new')}; END",
+    "CREATE TRIGGER IF NOT EXISTS project_stats_tasks_au AFTER UPDATE OF priority ON tasks"
+    " WHEN old.priority IS NOT new.priority BEGIN"
+    f" {PRIORITY_DEC.format(row='old')}; {PRIORITY_INC.format(row='new')}; END",
+    "CREATE TRIGGER IF NOT EXISTS project_stats_tasks_bd BEFORE DELETE ON tasks BEGIN"
+    f" {TASK_DEC}; {PRIORITY_DEC.format(row='old')}; END",
+    "CREATE TRIGGER IF NOT EXISTS project_stats_comments_ai AFTER INSERT ON comments BEGIN"
+    f" {COMMENT_ADD.format(sign='+', row='new')}; END",
+    "CREATE TRIGGER IF NOT EXISTS project_stats_comments_ad AFTER DELETE ON comments BEGIN"
+    f" {COMMENT_ADD.format(sign='-', row='old')}; END",
+    "CREATE TRIGGER IF NOT EXISTS project_stats_members_ai AFTER INSERT ON project_members"
+    f" BEGIN {MEMBER_ADD.format(sign='+', row='new')}; END",
+    "CREATE TRIGGER IF NOT EXISTS project_stats_members_ad AFTER DELETE ON project_members"
+    f" BEGIN {MEMBER_ADD.format(sign='-', row='old')}; END",
+]
+
+POSTGRES_TRIGGERS = {
+    "project_stats_projects": "projects",
+    "project_stats_tasks": "tasks",
+    "project_stats_tasks_bd": "tasks",
+    "project_stats_comments": "comments",
+    "project_stats_members": "project_members",
+}
+POSTGRES_FUNCTIONS = (
+    "project_stats_on_project",
+    "project_stats_on_task",
+    "project_stats_on_comment",
+    "project_stats_on_member",
+)
+SQLITE_TRIGGERS = (
+    "project_stats_projects_ai",
+    "project_stats_tasks_ai",
+    "project_stats_tasks_au",
+    "project_stats_tasks_bd",
+    "project_stats_comments_ai",
+    "project_stats_comments_ad",
+    "project_stats_members_ai",
+    "project_stats_members_ad",
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "project_stats",
+        sa.Column(
+            "project_id",
+            sa.Integer(),
+            sa.ForeignKey("projects.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("tasks", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("members", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("comments", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.create_table(
+        "project_priority_counts",
+        sa.Column(
+            "project_id",
+            sa.Integer(),
+            sa.ForeignKey("projects.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("priority", sa.String(20), primary_key=True),
+        sa.Column("tasks", sa.Integer(), server_default="0", nullable=False),
+    )
+
+    # stan początkowy; zapisy w trakcie migracji (przed triggerami) naprawi reconcile
+    op.execute(
+        "INSERT INTO project_stats (project_id, tasks, members, comments)"
+        " SELECT p.id,"
+        " (SELECT count(*) FROM tasks t WHERE t.project_id = p.id),"
+        " (SELECT count(*) FROM project_members m WHERE m.project_id = p.id),"
+        " (SELECT count(*) FROM comments c JOIN tasks t ON t.id = c.task_id"
+        " WHERE t.project_id = p.id)"
+        " FROM projects p"
+    )
+    op.execute(
+        "INSERT INTO project_priority_counts (project_id, priority, tasks)"
+        " SELECT project_id, priority, count(*) FROM tasks GROUP BY project_id, priority"
+    )
+
+    postgres = op.get_context().dialect.name == "postgresql"
+    for sql in POSTGRES if postgres else SQLITE:
+        op.execute(sql)
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name == "postgresql":
+        for trigger, table in POSTGRES_TRIGGERS.items():
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {table}")
+        for function in POSTGRES_FUNCTIONS:
+            op.execute(f"DROP FUNCTION IF EXISTS {function}()")
+    else:
+        for trigger in SQLITE_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.drop_table("project_priority_counts")
+    op.drop_table("project_stats")
@@ -0,0 +1,52 @@
+import itertools
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# osobna baza sqlite na przebieg (TEST_DATABASE_URL - np. postgres); ustawiona zanim
+# app/db.py przeczyta konfigurację
+DB_DIR = tempfile.mkdtemp(prefix="taskapi-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{DB_DIR}/test.db")
+os.environ["DB_CREATE_ALL"] = "1"
+os.environ["STATS_RECONCILE_INTERVAL"] = "0"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from main import app  # noqa: E402
+
+
+
+
+_ids = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    # context manager = lifespan (startup/shutdown) jak pod uvicornem
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def project(client) -> int:
+    r = client.post("/projects", json={"name": f"Project {next(_ids)}"})
+    assert r.status_code == 201
+    return r.json()["id"]
+
+
+@pytest.fixture
+def user(client) -> int:
+    n = next(_ids)
+    r = client.post("/users", json={"name": f"User {n}", "email": f"user{n}@example.com"})
+    assert r.status_code == 201
+    return r.json()["id"]
+
+
+def create_task(client, project_id: int, **fields) -> dict:
+    r = client.post(f"/projects/{project_id}/tasks", json={"name": "Task", **fields})
+    assert r.status_code == 201
+    return r.json()
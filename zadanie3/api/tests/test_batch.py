@@ -0,0 +1,130 @@
+import pytest
+
+
+def encoded(text: str) -> str:
+    return "".join(f"%{ord(ch):02X}" for ch in text)
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "projects",
+        "//batch",
+        "/batch",
+        "/batch/",
+        "/%62atch",
+        "/%62%61%74%63%68?transaction=true",
+        "/projects/1/events:stream",
+        "/projects/1/events%3Astream",
+        "/projects/1/events%3astream/",
+        "/projects%2F1",
+        "/projects%2f1/tasks",
+        "/projects/1%3Fx=1",
+        "/projects/1%5Cx",
+        "/projects/%252F",
+    ],
+)
+def test_rejects_paths(client, path):
+    r = client.post("/batch", json=[{"method": "POST", "path": path, "body": []}])
+    assert r.status_code == 400, r.text
+
+
+def test_dispatches_the_decoded_path(client, project):
+    r = client.post("/batch", json=[{"method": "GET", "path": f"/projects/{encoded(str(project))}"}])
+    assert r.status_code == 200
+    [sub] = r.json()["responses"]
+    assert sub["status"] == 200
+    assert sub["body"]["id"] == project
+
+
+def test_rejects_empty_and_oversized_batches(client):
+    assert client.post("/batch", json=[]).status_code == 400
+    item = {"method": "GET", "path": "/health"}
+    assert client.post("/batch", json=[item] * 51).status_code == 400
+
+
+@pytest.mark.parametrize(
+    "item",
+    [
+        {"method": "POST", "path": "/import/users", "body": "name,email\n"},
+        {"method": "POST", "path": "/projects/1:purge"},
+        {"method": "POST", "path": "/projects/1%3Apurge"},
+    ],
+)
+def test_transaction_rejects_routes_with_own_connection(client, item):
+    r = client.post("/batch?transaction=true", json=[item])
+    assert r.status_code == 400, r.text
+    assert "transaction=true" in r.json()["detail"]
+
+
+def test_transaction_rolls_back_stats_repair(client, project):
+    from sqlalchemy import delete, select
+
+    from app.db import engine
+    from app.models import ProjectStats
+
+    with engine.begin() as conn:
+        conn.execute(delete(ProjectStats).where(ProjectStats.project_id == project))
+
+    r = client.post(
+        "/batch?transaction=true",
+        json=[
+            {"method": "GET", "path": f"/projects/{project}/stats"},
+            {"method": "GET", "path": "/projects/0"},
+        ],
+    )
+    assert r.json()["committed"] is False
+    assert r.json()["responses"][0]["body"]["tasks"] == 0
+    with engine.connect() as conn:
+        stored = conn.scalar(select(ProjectStats.project_id).where(ProjectStats.project_id == project))
+    assert stored is None
+
+
+def test_transaction_rolls_back_earlier_writes(client, project):
+    tasks = f"/projects/{project}/tasks"
+    r = client.post(
+        "/batch?transaction=true",
+        json=[
+            {"method": "POST", "path": tasks, "body": {"name": "kept?"}},
+            {"method": "PATCH", "path": f"/projects/{project}", "body": {"description": "x"}},
+            {"method": "PATCH", "path": f"{tasks}/0", "body": {"name": "missing"}},
+            {"method": "GET", "path": tasks},
+        ],
+    )
+    body = r.json()
+    assert body["committed"] is False
+    assert [sub["status"] for sub in body["responses"]] == [201, 200, 404, 424]
+    assert client.get(tasks).json()["items"] == []
+    assert client.get(f"/projects/{project}").json()["description"] is None
+
+
+def test_transaction_commits_all_writes(client, project):
+    tasks = f"/projects/{project}/tasks"
+    r = client.post(
+        "/batch?transaction=true",
+        json=[
+            {"method": "POST", "path": tasks, "body": {"name": "one"}},
+            {"method": "POST", "path": tasks, "body": {"name": "two"}},
+            {"method": "GET", "path": tasks},
+        ],
+    )
+    body = r.json()
+    assert body["committed"] is True
+    # odczyt w transakcji widzi jej wcześniejsze zapisy
+    assert [t["name"] for t in body["responses"][2]["body"]["items"]] == ["one", "two"]
+    assert [t["name"] for t in client.get(tasks).json()["items"]] == ["one", "two"]
+
+
+def test_independent_batch_keeps_successful_writes(client, project):
+    tasks = f"/projects/{project}/tasks"
+    r = client.post(
+        "/batch",
+        json=[
+            {"method": "POST", "path": tasks, "body": {"name": "one"}},
+            {"method": "PATCH", "path": f"{tasks}/0", "body": {"name": "missing"}},
+        ],
+    )
+    body = r.json()
+    assert body["committed"] is None
+    assert [sub["status"] for sub in body["responses"]] == [201, 404]
+    assert [t["name"] for t in client.get(tasks).json()["items"]] == ["one"]
@@ -0,0 +1,34 @@
+import pytest
+
+from bench.database import seed_refusal
+
+
+APP = "postgresql://app:secret@db:5432/app"
+
+
+@pytest.mark.parametrize(
+    "bench_url, app_url, reset",
+    [
+        (None, APP, False),
+        (None, APP, True),
+        (None, "sqlite:///./app.db", False),
+        (None, None, True),
+        (APP, APP, False),
+        ("postgresql+asyncpg://app:secret@db:5432/app", APP, False),
+    ],
+)
+def test_seed_refuses_app_database(bench_url, app_url, reset):
+    assert seed_refusal(bench_url, app_url, reset)
+
+
+@pytest.mark.parametrize(
+    "bench_url, app_url, reset",
+    [
+        ("postgresql://app:secret@db:5432/bench", APP, False),
+        ("sqlite:///./bench.db", None, False),
+        (None, "sqlite:///./app.db", True),
+        (APP, APP, True),
+    ],
+)
+def test_seed_allowed(bench_url, app_url, reset):
+    assert seed_refusal(bench_url, app_url, reset) is None
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.cache import CACHE_TTL, LocalRedis, MemoryBackend, RedisBackend, ResponseCache
+
+
+
+
+def get(path: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("test", 80),
+            "path": path,
+            "query_string": b"",
+            "headers": [],
+            "state": {},
+        }
+    )
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request) -> ResponseCache:
+    if request.param == "memory":
+        return ResponseCache(MemoryBackend(CACHE_TTL, 100, 1 << 20))
+    return ResponseCache(RedisBackend(LocalRedis(), CACHE_TTL))
+
+
+def test_store_after_lookup_is_cached(cache):
+    async def run():
+        request = get("/projects/1")
+        assert await cache.lookup(request) is None
+        await cache.store_body(request, b"{}", '"v1"')
+        return await cache.lookup(get("/projects/1"))
+
+    assert asyncio.run(run()) is not None
+
+
+@pytest.mark.parametrize(
+    "invalidate",
+    [
+        lambda cache: cache.invalidate("/projects/1/tasks"),
+        lambda cache: cache.invalidate_tree("/projects/1"),
+    ],
+)
+def test_read_started_before_invalidation_is_not_cached(cache, invalidate):
+    async def run():
+        # odczyt: miss, potem (zanim odłoży) zapis commituje i invaliduje
+        request = get("/projects/1/tasks")
+        assert await cache.lookup(request) is None
+        await invalidate(cache)
+        await cache.store_body(request, b"[]", '"old"')
+        return await cache.lookup(get("/projects/1/tasks"))
+
+    assert asyncio.run(run()) is None
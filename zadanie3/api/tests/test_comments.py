@@ -0,0 +1,27 @@
+from app.routers import comments
+
+from .conftest import create_task
+
+
+
+
+def test_comment_retried_when_task_appears_after_insert(client, project, monkeypatch):
+    task = create_task(client, project)
+    insert = comments.insert_comment
+    calls = []
+
+    async def racing_insert(db, project_id, task_id, content):
+        # pierwszy INSERT nie widzi taska (zacommitowany równolegle)
+        calls.append(task_id)
+        return None if len(calls) == 1 else await insert(db, project_id, task_id, content)
+
+    monkeypatch.setattr(comments, "insert_comment", racing_insert)
+    r = client.post(f"/projects/{project}/tasks/{task['id']}/comments", json={"content": "x"})
+    assert r.status_code == 201
+    assert r.json()["content"] == "x"
+    assert len(calls) == 2
+
+
+def test_comment_on_missing_task_is_404(client, project):
+    r = client.post(f"/projects/{project}/tasks/0/comments", json={"content": "x"})
+    assert r.status_code == 404
@@ -0,0 +1,76 @@
+from .conftest import create_task
+
+
+
+
+def test_if_none_match_returns_304(client, project):
+    task = create_task(client, project)
+    for path in (f"/projects/{project}", f"/projects/{project}/tasks/{task['id']}",
+                 f"/projects/{project}/tasks"):
+        etag = client.get(path).headers["ETag"]
+        r = client.get(path, headers={"If-None-Match": etag})
+        assert r.status_code == 304, path
+        assert r.headers["ETag"] == etag
+        assert client.get(path, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_write_changes_etag(client, project):
+    task = create_task(client, project)
+    path = f"/projects/{project}/tasks/{task['id']}"
+    etag = client.get(path).headers["ETag"]
+    assert client.patch(path, json={"priority": "HIGH"}).status_code == 200
+    r = client.get(path, headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()["priority"] == "HIGH"
+
+
+def test_if_match_guards_updates(client, project):
+    task = create_task(client, project)
+    path = f"/projects/{project}/tasks/{task['id']}"
+    etag = client.get(path).headers["ETag"]
+    assert client.patch(path, json={"name": "A"}, headers={"If-Match": etag}).status_code == 200
+    # ten sam ETag jest już nieaktualny
+    r = client.patch(path, json={"name": "B"}, headers={"If-Match": etag})
+    assert r.status_code == 412
+    assert client.get(path).json()["name"] == "A"
+
+    etag = client.get(f"/projects/{project}").headers["ETag"]
+    assert client.patch(f"/projects/{project}", json={"description": "x"}).status_code == 200
+    r = client.patch(f"/projects/{project}", json={"description": "y"}, headers={"If-Match": etag})
+    assert r.status_code == 412
+
+
+def test_if_match_guards_deletes(client, project, user):
+    task = create_task(client, project)
+    path = f"/projects/{project}/tasks/{task['id']}"
+    assert client.delete(path, headers={"If-Match": '"stale"'}).status_code == 412
+    assert client.delete(path, headers={"If-Match": "*"}).status_code == 204
+    assert client.delete(f"/users/{user}", headers={"If-Match": '"stale"'}).status_code == 412
+    etag = client.get(f"/users/{user}").headers["ETag"]
+    assert client.delete(f"/users/{user}", headers={"If-Match": etag}).status_code == 204
+
+
+def test_missing_task_with_if_match_is_404(client, project):
+    r = client.patch(f"/projects/{project}/tasks/0", json={"name": "x"}, headers={"If-Match": "*"})
+    assert r.status_code == 404
+
+
+def test_if_match_uses_strong_comparison(client, project, user):
+    task = create_task(client, project)
+    path = f"/projects/{project}/tasks/{task['id']}"
+    etag = client.get(path).headers["ETag"]
+    r = client.patch(path, json={"name": "weak"}, headers={"If-Match": f"W/{etag}"})
+    assert r.status_code == 412
+    assert client.delete(path, headers={"If-Match": f"W/{etag}"}).status_code == 412
+    user_etag = client.get(f"/users/{user}").headers["ETag"]
+    assert client.delete(f"/users/{user}", headers={"If-Match": f"W/{user_etag}"}).status_code == 412
+
+    r = client.patch(path, json={"name": "strong"}, headers={"If-Match": f'W/{etag}, {etag}'})
+    assert r.status_code == 200
+
+
+def test_if_none_match_uses_weak_comparison(client, project):
+    task = create_task(client, project)
+    path = f"/projects/{project}/tasks/{task['id']}"
+    etag = client.get(path).headers["ETag"]
+    assert client.get(path, headers={"If-None-Match": f"W/{etag}"}).status_code == 304
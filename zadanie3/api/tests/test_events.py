@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select
+
+from app.db import engine
+from app.events import ChangeBus, prune_events
+from app.models import Project, ProjectEvent
+
+
+
+
+def event(event_id: int, project_id: int, entity: str = "task", op: str = "created") -> dict:
+    return {"id": event_id, "project_id": project_id, "entity": entity, "entity_id": 1, "op": op}
+
+
+def deliver(bus: ChangeBus, *events: dict) -> None:
+    bus.remote = True  # bufor odpowiada tylko przy zdarzeniach z LISTEN
+
+    async def run():
+        bus.bind(asyncio.get_running_loop())
+        for e in events:
+            bus.publish(e)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+
+
+
+def test_buffers_capped_by_project_count():
+    bus = ChangeBus(buffer=8, projects=2)
+    deliver(bus, event(1, 1), event(2, 2), event(3, 1), event(4, 3))
+    # projekt 2 najdawniej aktywny - wypada
+    assert bus.buffered_projects() == 2
+    assert bus.recent(2, 0) is None
+    assert [e["id"] for e in bus.recent(1, 0)] == [1, 3]
+    # kursor sprzed wyrzuconych zdarzeń -> baza; nowszy -> bufor (pusty)
+    assert bus.recent(5, 1) is None
+    assert bus.recent(5, 2) == []
+
+
+def test_deleted_project_evicted_first():
+    bus = ChangeBus(buffer=8, projects=2)
+    deliver(bus, event(1, 1), event(2, 2), event(3, 1, "project", "deleted"), event(4, 3))
+    assert bus.recent(1, 0) is None
+    assert [e["id"] for e in bus.recent(2, 1)] == [2]
+
+
+def test_overflowed_buffer_falls_back_to_database():
+    bus = ChangeBus(buffer=2, projects=8)
+    deliver(bus, event(1, 1), event(2, 1), event(3, 1))
+    assert bus.recent(1, 0) is None
+    assert [e["id"] for e in bus.recent(1, 1)] == [2, 3]
+
+
+def test_local_bus_reads_database():
+    bus = ChangeBus()
+    assert bus.recent(1, 0) is None
+
+
+def test_long_poll_returns_new_events(client, project):
+    links = client.get(f"/projects/{project}/events", params={"wait": 0}).json()["_links"]
+    client.post(f"/projects/{project}/tasks", json={"name": "Task"})
+    r = client.get(links["next"]["href"] + "&wait=0")
+    assert [(e["entity"], e["op"]) for e in r.json()["items"]] == [("task", "created")]
+
+
+def test_prune_removes_old_events(client, project):
+    client.post(f"/projects/{project}/tasks", json={"name": "Task"})
+    with engine.begin() as conn:
+        conn.execute(
+            insert(ProjectEvent),
+            [
+                {"project_id": project, "entity": "task", "entity_id": 1, "op": "updated",
+                 "created_at": datetime(2000, 1, 1, tzinfo=timezone.utc)}
+                for _ in range(5)
+            ],
+        )
+    deleted = client.portal.call(prune_events, datetime(2001, 1, 1, tzinfo=timezone.utc), 2)
+    assert deleted == 5
+    events = client.get(f"/projects/{project}/events", params={"since": 0, "wait": 0}).json()
+    assert [(e["entity"], e["op"]) for e in events["items"]] == [
+        ("project", "created"), ("task", "created")
+    ]
+
+
+def project_events(client, project_id: int, since: int = 0) -> list:
+    r = client.get(f"/projects/{project_id}/events", params={"since": since, "wait": 0})
+    return [(e["entity"], e["entity_id"], e["op"]) for e in r.json()["items"]]
+
+
+def test_deleting_user_records_membership_events(client, project, user):
+    assert client.post(f"/projects/{project}/members", json={"user_id": user}).status_code == 201
+    assert client.delete(f"/users/{user}").status_code == 204
+    assert project_events(client, project)[-2:] == [
+        ("member", user, "created"), ("member", user, "deleted")
+    ]
+
+
+def test_import_records_events(client, project, user):
+    r = client.post(
+        "/import/members",
+        params={"format": "ndjson"},
+        content=f'{{"project_id": {project}, "user_id": {user}}}\n',
+    )
+    assert r.json()["inserted"] == 1
+    assert project_events(client, project)[-1] == ("member", user, "created")
+
+    r = client.post("/import/projects", params={"format": "ndjson"}, content='{"name": "Imported"}\n')
+    assert r.json()["inserted"] == 1
+    with engine.connect() as conn:
+        created = conn.scalar(select(Project.id).where(Project.name == "Imported"))
+    assert project_events(client, created) == [("project", created, "created")]
@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+
+from app import export
+
+from .conftest import create_task
+
+
+
+
+def csv_rows(text: str) -> list:
+    return list(csv.reader(io.StringIO(text)))
+
+
+def test_tasks_csv(client, project):
+    full = create_task(
+        client, project, name="full", description='comma, "quote"\nnewline', priority="HIGH",
+        due_date="2026-05-01",
+    )
+    bare = create_task(client, project, name="bare")
+    r = client.get(f"/projects/{project}/tasks:export?format=csv")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/csv")
+    assert r.headers["content-disposition"] == f'attachment; filename="project-{project}-tasks.csv"'
+    assert csv_rows(r.text) == [
+        ["id", "project_id", "name", "description", "priority", "due_date"],
+        [str(full["id"]), str(project), "full", 'comma, "quote"\nnewline', "HIGH", "2026-05-01"],
+        # None jako puste pole
+        [str(bare["id"]), str(project), "bare", "", "MEDIUM", ""],
+    ]
+
+
+def test_tasks_ndjson(client, project):
+    task = create_task(client, project, name="only")
+    r = client.get(f"/projects/{project}/tasks:export")
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = r.text.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"id": task["id"], "project_id": project, "name": "only", "description": None,
+         "priority": "MEDIUM", "due_date": None},
+    ]
+
+
+def test_comments_export(client, project):
+    task = create_task(client, project)["id"]
+    ids = [
+        client.post(f"/projects/{project}/tasks/{task}/comments", json={"content": c}).json()["id"]
+        for c in ("first", "second")
+    ]
+    path = f"/projects/{project}/tasks/{task}/comments:export"
+    rows = csv_rows(client.get(f"{path}?format=csv").text)
+    assert rows[0] == ["id", "task_id", "content", "created_at"]
+    assert [(r[0], r[2]) for r in rows[1:]] == [(str(ids[0]), "first"), (str(ids[1]), "second")]
+    items = [json.loads(line) for line in client.get(path).text.splitlines()]
+    assert [(c["id"], c["task_id"], c["content"]) for c in items] == [
+        (ids[0], task, "first"), (ids[1], task, "second"),
+    ]
+    assert all(c["created_at"] for c in items) and "_links" not in items[0]
+
+
+def test_missing_project_or_task_is_404(client, project):
+    assert client.get("/projects/0/tasks:export").status_code == 404
+    assert client.get(f"/projects/{project}/tasks/0/comments:export").status_code == 404
+    other = client.post("/projects", json={"name": "other"}).json()["id"]
+    task = create_task(client, other)["id"]
+    # task z innego projektu
+    assert client.get(f"/projects/{project}/tasks/{task}/comments:export").status_code == 404
+
+
+def test_export_streams_in_batches(client, project, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_BATCH", 3)
+    chunks = []
+    csv_chunk = export.csv_chunk
+
+    def spy(rows):
+        chunks.append(len(rows))
+        return csv_chunk(rows)
+
+    monkeypatch.setattr(export, "csv_chunk", spy)
+    r = client.post(
+        f"/projects/{project}/tasks:batch", json={"create": [{"name": f"t{i}"} for i in range(10)]}
+    )
+    ids = [x["id"] for x in r.json()["results"]]
+
+    rows = csv_rows(client.get(f"/projects/{project}/tasks:export?format=csv").text)
+    assert [int(row[0]) for row in rows[1:]] == ids
+    # nagłówek + partie yield_per po 3 wiersze
+    assert chunks == [1, 3, 3, 3, 1]
+
+    lines = client.get(f"/projects/{project}/tasks:export").text.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ids
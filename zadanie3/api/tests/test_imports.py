@@ -0,0 +1,124 @@
+import itertools
+import json
+import sys
+
+import pytest
+from sqlalchemy import func, select
+
+import import_data
+from app.db import engine
+from app.models import User
+
+
+
+
+_batches = itertools.count(1)
+
+
+@pytest.fixture
+def tag() -> str:
+    # unikalna domena na test - e-maile nie zderzają się między testami
+    return f"imp{next(_batches)}.io"
+
+
+def users_in(domain: str) -> list:
+    with engine.connect() as conn:
+        return conn.execute(
+            select(User.name, User.email).where(User.email.like(f"%@{domain}")).order_by(User.id)
+        ).all()
+
+
+def post(client, body: bytes, fmt: str = "csv"):
+    return client.post(f"/import/users?format={fmt}", content=body)
+
+
+def test_csv_counts_conflicts_and_skips(client, tag):
+    client.post("/users", json={"name": "Existing", "email": f"old@{tag}"})
+    body = (
+        "name,email\n"
+        f"Ann,ann@{tag}\n"
+        f"Old again,old@{tag}\n"  # już w bazie
+        f"Ann twin,ann@{tag}\n"  # powtórzony w pliku
+        "Broken,not-an-email\n"
+        f",empty@{tag}\n"  # brak name
+        f"Bob,bob@{tag}\n"
+    ).encode()
+    r = post(client, body)
+    assert r.status_code == 200
+    assert r.json() == {
+        "entity": "users", "received": 6, "inserted": 2, "skipped": 2, "conflicting": 2,
+    }
+    assert users_in(tag) == [("Existing", f"old@{tag}"), ("Ann", f"ann@{tag}"), ("Bob", f"bob@{tag}")]
+
+
+def test_ndjson_skips_bad_lines(client, tag):
+    body = "\n".join(
+        [
+            json.dumps({"name": "Cy", "email": f"cy@{tag}"}),
+            "{not json",
+            "",
+            json.dumps({"name": "Di"}),
+        ]
+    ).encode()
+    r = post(client, body, "ndjson")
+    assert r.json() == {
+        "entity": "users", "received": 3, "inserted": 1, "skipped": 2, "conflicting": 0,
+    }
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"name,email\n\xb3,\xff@x.io\n",
+        b"name,email\n" + b"a" * 200_000 + b",big@x.io\n",  # pole ponad csv.field_size_limit
+    ],
+    ids=["not-utf8", "field-too-large"],
+)
+def test_unreadable_csv_is_400_and_nothing_is_imported(client, tag, body):
+    with engine.connect() as conn:
+        before = conn.scalar(select(func.count()).select_from(User))
+    r = post(client, f"name,email\nFirst,first@{tag}\n".encode() + body.split(b"\n", 1)[1])
+    assert r.status_code == 400
+    assert r.json()["detail"].startswith("Unreadable csv input")
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(User)) == before
+
+
+def test_cli_imports_file(tmp_path, monkeypatch, capsys, tag):
+    path = tmp_path / "users.ndjson"
+    path.write_text(
+        json.dumps({"name": "Eve", "email": f"eve@{tag}"}) + "\n" + json.dumps({"name": "x"}) + "\n",
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(sys, "argv", ["import_data.py", "users", str(path)])
+    import_data.main()
+    assert json.loads(capsys.readouterr().out) == {
+        "entity": "users", "received": 2, "inserted": 1, "skipped": 1, "conflicting": 0,
+    }
+    assert users_in(tag) == [("Eve", f"eve@{tag}")]
+
+
+def test_cli_reports_unreadable_file(tmp_path, monkeypatch, tag):
+    path = tmp_path / "users.csv"
+    path.write_bytes(f"name,email\nFine,fine@{tag}\n\xb3,\xff@{tag}\n".encode("latin-1"))
+    monkeypatch.setattr(sys, "argv", ["import_data.py", "users", str(path)])
+    with pytest.raises(SystemExit) as exc:
+        import_data.main()
+    assert "Unreadable csv input" in str(exc.value)
+    assert users_in(tag) == []
+
+
+def test_staging_never_drops_a_real_table(client, tag):
+    # kwalifikowana nazwa - połączenie z puli może mieć własną tymczasową import_users
+    table = ("public" if engine.dialect.name == "postgresql" else "main") + ".import_users"
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"CREATE TABLE {table} (note varchar(20))")
+        conn.exec_driver_sql(f"INSERT INTO {table} VALUES ('keep me')")
+    try:
+        for name in ("Fay", "Gus"):
+            assert post(client, f"name,email\n{name},{name.lower()}@{tag}\n".encode()).json()["inserted"] == 1
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql(f"SELECT note FROM {table}").all() == [("keep me",)]
+    finally:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP TABLE {table}")
@@ -0,0 +1,57 @@
+from app.fieldsets import EMBED_LIMIT
+
+from .conftest import create_task
+
+
+def follow(client, link: dict) -> list:
+    r = client.get(link["href"])
+    assert r.status_code == 200
+    return r.json()["items"]
+
+
+def test_task_include_comments_is_capped(client, project):
+    task = create_task(client, project)["id"]
+    ids = [
+        client.post(f"/projects/{project}/tasks/{task}/comments", json={"content": f"c{i}"}).json()["id"]
+        for i in range(EMBED_LIMIT + 5)
+    ]
+
+    body = client.get(f"/projects/{project}/tasks/{task}", params={"include": "comments"}).json()
+    assert [c["id"] for c in body["comments"]] == ids[:EMBED_LIMIT]
+    rest = follow(client, body["_links"]["comments_next"])
+    assert [c["id"] for c in rest] == ids[EMBED_LIMIT:]
+
+    # ?links=none nie ukrywa obcięcia
+    r = client.get(
+        f"/projects/{project}/tasks", params={"include": "comments", "links": "none"}
+    )
+    [item] = r.json()["items"]
+    assert len(item["comments"]) == EMBED_LIMIT
+    assert list(item["_links"]) == ["comments_next"]
+
+
+def test_project_includes_are_capped_per_parent(client, project, user):
+    tasks = [create_task(client, project, name=f"t{i}")["id"] for i in range(EMBED_LIMIT + 1)]
+    for i in range(EMBED_LIMIT + 2):
+        client.post(f"/projects/{project}/tasks/{tasks[0]}/comments", json={"content": f"c{i}"})
+    client.post(f"/projects/{project}/members", json={"user_id": user})
+
+    body = client.get(
+        f"/projects/{project}", params={"include": "tasks,comments,members"}
+    ).json()
+    assert [t["id"] for t in body["tasks"]] == tasks[:EMBED_LIMIT]
+    assert [t["id"] for t in follow(client, body["_links"]["tasks_next"])] == tasks[EMBED_LIMIT:]
+    assert len(body["tasks"][0]["comments"]) == EMBED_LIMIT
+    assert "comments_next" in body["tasks"][0]["_links"]
+    assert "comments_next" not in body["tasks"][1]["_links"]
+    assert [m["user_id"] for m in body["members"]] == [user]
+    assert "members_next" not in body["_links"]
+
+
+def test_small_includes_have_no_next_link(client, project):
+    task = create_task(client, project)["id"]
+    client.post(f"/projects/{project}/tasks/{task}/comments", json={"content": "x"})
+    r = client.get("/projects", params={"include": "tasks,comments", "links": "none", "limit": 500})
+    [item] = [p for p in r.json()["items"] if p["id"] == project]
+    assert "_links" not in item
+    assert len(item["tasks"][0]["comments"]) == 1
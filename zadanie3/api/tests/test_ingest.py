@@ -0,0 +1,166 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, event, select
+
+from app.db import DB_ASYNC, async_engine, engine
+from app.ingest import CommentIngest
+from app.models import Comment, Task
+from app.routers import comments
+
+from .conftest import create_task
+
+
+
+
+def make_ingest(batch: int = 100, flush_ms: float = 10_000, queue_size: int = 1000) -> CommentIngest:
+    return CommentIngest(batch, flush_ms, queue_size, "on")
+
+
+def spy_batches(ingest: CommentIngest) -> list:
+    sizes = []
+    original = ingest._write_batch
+
+    async def write_batch(batch):
+        sizes.append(len(batch))
+        return await original(batch)
+
+    ingest._write_batch = write_batch
+    return sizes
+
+
+def run(client, ingest: CommentIngest, body):
+    # worker i wołający w pętli aplikacji (portal TestClienta)
+    async def main():
+        ingest.start()
+        try:
+            return await body()
+        finally:
+            await ingest.stop()
+
+    return client.portal.call(main)
+
+
+@pytest.fixture
+def task(client, project) -> int:
+    return create_task(client, project)["id"]
+
+
+def test_full_batch_flushes_without_waiting(client, project, task):
+    ingest = make_ingest(batch=4)
+    sizes = spy_batches(ingest)
+
+    async def body():
+        start = time.monotonic()
+        done = await asyncio.wait_for(
+            asyncio.gather(*(ingest.submit(project, task, f"c{i}") for i in range(8))), 5
+        )
+        return done, time.monotonic() - start
+
+    done, elapsed = run(client, ingest, body)
+    assert [c.content for c in done] == [f"c{i}" for i in range(8)]
+    assert sizes == [4, 4]
+    assert elapsed < 5  # flush_ms = 10 s - partie poszły po rozmiarze
+
+
+def test_partial_batch_flushes_after_timeout(client, project, task):
+    ingest = make_ingest(batch=100, flush_ms=100)
+    sizes = spy_batches(ingest)
+
+    async def body():
+        start = time.monotonic()
+        done = await asyncio.gather(ingest.submit(project, task, "a"), ingest.submit(project, task, "b"))
+        return done, time.monotonic() - start
+
+    done, elapsed = run(client, ingest, body)
+    assert [c.content for c in done] == ["a", "b"]
+    assert sizes == [2]
+    assert 0.09 <= elapsed < 5
+
+
+def test_concurrent_callers_get_their_own_rows_in_order(client, project, task):
+    ingest = make_ingest(batch=50, flush_ms=20)
+
+    async def body():
+        return await asyncio.gather(*(ingest.submit(project, task, f"n{i}") for i in range(120)))
+
+    done = run(client, ingest, body)
+    assert [c.content for c in done] == [f"n{i}" for i in range(120)]
+    ids = [c.id for c in done]
+    assert ids == sorted(ids) and len(set(ids)) == 120
+    created = [c.created_at for c in done]
+    assert created == sorted(created)
+    with engine.connect() as conn:
+        stored = dict(conn.execute(select(Comment.id, Comment.content).where(Comment.id.in_(ids))).all())
+    assert stored == {c.id: c.content for c in done}
+
+
+def test_full_queue_is_503(client, project, task):
+    ingest = make_ingest(batch=1, flush_ms=0, queue_size=1)
+    gate = asyncio.Event()
+    original = ingest._write_batch
+
+    async def write_batch(batch):
+        await gate.wait()
+        return await original(batch)
+
+    ingest._write_batch = write_batch
+
+    async def body():
+        first = asyncio.ensure_future(ingest.submit(project, task, "first"))
+        await asyncio.sleep(0.05)  # worker wziął pierwszy i czeka na bramce
+        second = asyncio.ensure_future(ingest.submit(project, task, "second"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as exc:
+            await ingest.submit(project, task, "third")
+        gate.set()
+        return exc.value, await asyncio.gather(first, second)
+
+    error, done = run(client, ingest, body)
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+    assert [c.content for c in done] == ["first", "second"]
+
+
+def test_task_deleted_mid_batch_falls_back_to_single_rows(client, project, task):
+    doomed = create_task(client, project)["id"]
+    ingest = make_ingest(batch=3)
+    sync_engine = async_engine.sync_engine if DB_ASYNC else engine
+    armed = [True]
+
+    # task znika między sprawdzeniem tasków a wielowierszowym INSERT -> IntegrityError (FK)
+    def before_insert(conn, cursor, statement, parameters, context, executemany):
+        if armed[0] and statement.startswith("INSERT INTO comments") and "SELECT" not in statement:
+            armed[0] = False
+            with engine.begin() as other:
+                other.execute(delete(Task).where(Task.id == doomed))
+
+    event.listen(sync_engine, "before_cursor_execute", before_insert)
+    try:
+        async def body():
+            return await asyncio.gather(
+                ingest.submit(project, task, "kept 1"),
+                ingest.submit(project, doomed, "lost"),
+                ingest.submit(project, task, "kept 2"),
+                return_exceptions=True,
+            )
+
+        kept1, lost, kept2 = run(client, ingest, body)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", before_insert)
+
+    assert armed == [False]
+    assert isinstance(lost, HTTPException) and lost.status_code == 404
+    assert (kept1.content, kept2.content) == ("kept 1", "kept 2")
+    assert kept1.id < kept2.id
+    with engine.connect() as conn:
+        assert conn.scalars(select(Comment.content).where(Comment.task_id == doomed)).all() == []
+
+
+def test_post_is_503_when_ingest_is_not_running(client, project, task, monkeypatch):
+    monkeypatch.setattr(comments, "COMMENT_INGEST", True)
+    monkeypatch.setattr(comments, "comment_ingest", make_ingest())
+    r = client.post(f"/projects/{project}/tasks/{task}/comments", json={"content": "x"})
+    assert r.status_code == 503
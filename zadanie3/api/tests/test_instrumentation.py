@@ -0,0 +1,32 @@
+import re
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.db import engine
+
+from .conftest import create_task
+
+
+
+
+def timing_rows(response) -> int:
+    return int(re.search(r"(\d+) rows", response.headers["server-timing"]).group(1))
+
+
+def test_server_timing_counts_fetched_rows(client, project):
+    for _ in range(3):
+        create_task(client, project)
+    r = client.get(f"/projects/{project}/tasks")
+    assert len(r.json()["items"]) == 3
+    assert timing_rows(r) >= 3
+
+
+def test_failed_statement_leaves_connection_clean():
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM no_such_table"))
+        conn.rollback()
+        assert conn.execute(text("SELECT 1")).scalar_one() == 1
+        assert "query_start" not in conn.info
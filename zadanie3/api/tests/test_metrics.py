@@ -0,0 +1,102 @@
+import re
+
+import pytest
+
+from app.metrics import Counter, Histogram, _Sharded
+
+from .conftest import create_task
+
+
+
+
+# wartości etykiet route zawierają {} (szablon trasy)
+SAMPLE = re.compile(r'^(?P<name>[a-z_]+)(?:\{(?P<labels>.*)\})? (?P<value>\S+)$')
+LATENCY = "taskapi_http_request_duration_seconds"
+
+
+def scrape(client) -> list:
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    samples = []
+    for line in r.text.splitlines():
+        if line.startswith("#"):
+            continue
+        m = SAMPLE.match(line)
+        assert m, line
+        labels = dict(re.findall(r'(\w+)="([^"]*)"', m["labels"] or ""))
+        samples.append((m["name"], labels, float(m["value"])))
+    return samples
+
+
+def latency(samples: list, route: str) -> dict:
+    # {le: licznik} kubełków + _count/_sum dla GET na danym szablonie trasy
+    out = {"buckets": {}}
+    for name, labels, value in samples:
+        if labels.get("route") != route or labels.get("method") != "GET":
+            continue
+        if name == f"{LATENCY}_bucket":
+            out["buckets"][labels["le"]] = value
+        elif name in (f"{LATENCY}_count", f"{LATENCY}_sum"):
+            out[name.rsplit("_", 1)[1]] = value
+    return out
+
+
+def test_latency_histogram_by_route_template(client, project):
+    route = "/projects/{project_id}/tasks/{task_id}"
+    before = latency(scrape(client), route).get("count", 0)
+    task = create_task(client, project)
+    for _ in range(3):
+        assert client.get(f"/projects/{project}/tasks/{task['id']}").status_code == 200
+    assert client.get(f"/projects/{project}/tasks/0").status_code == 404
+
+    samples = scrape(client)
+    hist = latency(samples, route)
+    assert hist["count"] - before == 4
+    values = list(hist["buckets"].values())
+    assert list(hist["buckets"])[-1] == "+Inf"
+    assert values == sorted(values)  # kubełki kumulatywne
+    assert values[-1] == hist["count"]
+    assert hist["sum"] > 0
+    # etykieta to szablon, nigdy surowa ścieżka z id
+    routes = {labels.get("route") for _, labels, _ in samples}
+    assert f"/projects/{project}/tasks/{task['id']}" not in routes
+    assert not [r for r in routes if r and re.search(r"/\d", r)]
+
+
+def not_found(samples: list) -> float:
+    return sum(
+        value
+        for name, labels, value in samples
+        if name == "taskapi_http_responses_total" and labels["status"] == "404"
+    )
+
+
+def test_responses_by_status(client, project):
+    before = not_found(scrape(client))
+    client.get(f"/projects/{project}/tasks/0")
+    assert not_found(scrape(client)) == before + 1
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = Histogram("h", "help", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        hist.observe(value, "/x")
+    assert list(hist.render()) == [
+        'h_bucket{route="/x",le="0.1"} 1.0',
+        'h_bucket{route="/x",le="1.0"} 3.0',
+        'h_bucket{route="/x",le="+Inf"} 4.0',
+        'h_sum{route="/x"} 4.05',
+        'h_count{route="/x"} 4.0',
+    ]
+
+
+def test_sharded_requires_zero():
+    with pytest.raises(TypeError):
+        _Sharded("x", "help")
+
+    class NoZero(_Sharded):
+        pass
+
+    with pytest.raises(TypeError):
+        NoZero("x", "help")
+    Counter("c", "help").inc()
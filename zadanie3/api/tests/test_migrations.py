@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.db import Base
+
+API_DIR = Path(__file__).resolve().parent.parent
+
+
+
+
+def alembic(db_url: str, *args: str) -> subprocess.CompletedProcess:
+    # osobny proces - app/db.py czyta DATABASE_URL przy imporcie
+    env = {**os.environ, "DATABASE_URL": db_url, "DB_CREATE_ALL": "0"}
+    return subprocess.run(
+        [sys.executable, "-m", "alembic", *args],
+        cwd=API_DIR, env=env, capture_output=True, text=True,
+    )
+
+
+@pytest.fixture
+def created_all(tmp_path) -> str:
+    if not os.environ["DATABASE_URL"].startswith("sqlite"):
+        pytest.skip("schemat z create_all zakładany na osobnym pliku sqlite")
+    url = f"sqlite:///{tmp_path}/create_all.db"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return url
+
+
+def test_upgrade_stamps_schema_from_create_all(created_all):
+    r = alembic(created_all, "upgrade", "head")
+    assert r.returncode == 0, r.stderr
+    assert alembic(created_all, "check").returncode == 0
+    assert "(head)" in alembic(created_all, "current").stdout
+
+
+def test_upgrade_refuses_outdated_schema_from_create_all(created_all):
+    engine = create_engine(created_all)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_project_events_project_id_id"))
+    engine.dispose()
+    r = alembic(created_all, "upgrade", "head")
+    assert r.returncode != 0
+    assert "differs from the models" in r.stderr
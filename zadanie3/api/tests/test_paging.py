@@ -0,0 +1,67 @@
+from datetime import date
+
+import pytest
+
+from app.models import DUE_NEVER
+
+from .conftest import create_task
+
+
+TASKS = [
+    ("b", date(2026, 3, 1)),
+    ("a", None),
+    ("b", date(2026, 1, 1)),
+    ("c", date(2026, 3, 1)),
+    ("a", date(2026, 2, 1)),
+    ("b", None),
+    ("d", date(2026, 1, 1)),
+]
+
+
+@pytest.fixture
+def tasks(client, project) -> list:
+    return [
+        create_task(client, project, name=name, due_date=due and due.isoformat())
+        for name, due in TASKS
+    ]
+
+
+def key(sort: str):
+    field = sort.lstrip("-")
+    if field == "id":
+        return lambda t: t["id"]
+    if field == "due_date":
+        return lambda t: (t["due_date"] or DUE_NEVER.isoformat(), t["id"])
+    return lambda t: (t[field], t["id"])
+
+
+def walk(client, url: str) -> list:
+    ids = []
+    while url:
+        r = client.get(url)
+        assert r.status_code == 200, r.text
+        body = r.json()
+        ids += [t["id"] for t in body["items"]]
+        url = (body["_links"].get("next") or {}).get("href")
+    return ids
+
+
+@pytest.mark.parametrize("sort", ["id", "-id", "name", "-name", "due_date", "-due_date"])
+def test_cursor_paging_follows_sort_key(client, project, tasks, sort):
+    expected = [t["id"] for t in sorted(tasks, key=key(sort), reverse=sort.startswith("-"))]
+    # strony po 2 - remisy (name, due_date) wypadają na granicach stron
+    assert walk(client, f"/projects/{project}/tasks?limit=2&sort={sort}") == expected
+    assert walk(client, f"/projects/{project}/tasks?limit=50&sort={sort}") == expected
+
+
+def test_paging_keeps_filters(client, project, tasks):
+    ids = walk(client, f"/projects/{project}/tasks?limit=1&sort=name&name_prefix=b")
+    assert ids == [t["id"] for t in tasks if t["name"] == "b"]
+
+
+def test_paging_param_of_other_sort_is_400(client, project, tasks):
+    r = client.get(f"/projects/{project}/tasks?limit=2&sort=name")
+    cursor = r.json()["_links"]["next"]["href"].split("cursor=")[1]
+    assert client.get(f"/projects/{project}/tasks?sort=name&after={tasks[0]['id']}").status_code == 400
+    assert client.get(f"/projects/{project}/tasks?sort=id&cursor={cursor}").status_code == 400
+    assert client.get(f"/projects/{project}/tasks?cursor={cursor}").status_code == 400
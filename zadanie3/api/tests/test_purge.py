@@ -0,0 +1,163 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, event, func, insert, select
+
+from app import purge
+from app.db import DB_ASYNC, async_engine, engine
+from app.models import Comment, ProjectMember, ProjectPurge, Task
+
+from .conftest import create_task
+
+
+
+
+@contextmanager
+def statements():
+    # SQL wysłany przez aplikację (w trybie async - przez silnik async)
+    seen = []
+    sync_engine = async_engine.sync_engine if DB_ASYNC else engine
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        seen.append(" ".join(statement.split()))
+
+    event.listen(sync_engine, "before_cursor_execute", before)
+    try:
+        yield seen
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", before)
+
+
+def count(model, *where) -> int:
+    with engine.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(model).where(*where))
+
+
+def fill(client, project: int, tasks: int, comments: int) -> list:
+    ids = []
+    for i in range(tasks):
+        task = create_task(client, project, name=f"t{i}")
+        for j in range(comments):
+            client.post(f"/projects/{project}/tasks/{task['id']}/comments", json={"content": f"c{j}"})
+        ids.append(task["id"])
+    return ids
+
+
+def wait_for(client, project: int, timeout: float = 10) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/projects/{project}:purge").json()
+        if job["state"] != "running" or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_task_delete_is_one_statement(client, project):
+    [task] = fill(client, project, 1, 3)
+    with statements() as seen:
+        assert client.delete(f"/projects/{project}/tasks/{task}").status_code == 204
+    deletes = [s for s in seen if s.startswith("DELETE")]
+    assert deletes == [s for s in deletes if s.startswith("DELETE FROM tasks")] and len(deletes) == 1
+    # passive_deletes: komentarzy nie ładuje ORM, usuwa je kaskada w bazie
+    assert not [s for s in seen if "FROM comments" in s]
+    assert count(Comment, Comment.task_id == task) == 0
+
+
+def test_project_delete_cascades_in_database(client, project, user):
+    tasks = fill(client, project, 2, 2)
+    client.post(f"/projects/{project}/members", json={"user_id": user})
+    with statements() as seen:
+        assert client.delete(f"/projects/{project}").status_code == 204
+    assert len([s for s in seen if s.startswith("DELETE")]) == 1
+    assert count(Task, Task.project_id == project) == 0
+    assert count(Comment, Comment.task_id.in_(tasks)) == 0
+    assert count(ProjectMember, ProjectMember.project_id == project) == 0
+
+
+def test_purge_reports_progress_and_final_state(client, project, user, monkeypatch):
+    monkeypatch.setattr(purge, "PURGE_CHUNK", 10)
+    fill(client, project, 12, 2)
+    client.post(f"/projects/{project}/members", json={"user_id": user})
+    assert client.get(f"/projects/{project}:purge").status_code == 404
+
+    # stan z bazy w chwili każdej invalidacji cache (po commicie partii)
+    snapshots = []
+    invalidate_tree = purge.response_cache.invalidate_tree
+
+    async def spy(path):
+        with engine.connect() as conn:
+            row = conn.execute(
+                select(ProjectPurge.comments, ProjectPurge.tasks).where(ProjectPurge.project_id == project)
+            ).one()
+        snapshots.append((tuple(row), count(Task, Task.project_id == project)))
+        await invalidate_tree(path)
+
+    monkeypatch.setattr(purge.response_cache, "invalidate_tree", spy)
+    r = client.post(f"/projects/{project}:purge")
+    assert r.status_code == 202
+    assert r.headers["Location"] == f"/projects/{project}:purge"
+    assert r.json()["state"] == "running"
+
+    job = wait_for(client, project)
+    assert job["state"] == "done"
+    assert job["deleted"] == {"comments": 24, "tasks": 12, "members": 1, "projects": 1}
+    assert job["error"] is None
+    assert client.get(f"/projects/{project}").status_code == 404
+    # postęp i invalidacja po każdej partii, nie dopiero na końcu
+    progress = [s[0] for s in snapshots]
+    assert progress[:4] == [(10, 0), (20, 0), (24, 0), (24, 10)]
+    assert [s[1] for s in snapshots[:5]] == [12, 12, 12, 2, 0]
+
+
+def test_purge_state_is_shared_through_the_database(client, project, monkeypatch):
+    # zadanie "z innego workera": running z niedawnym postępem - POST go nie dubluje
+    with engine.begin() as conn:
+        # sqlite używa ponownie id usuniętych projektów - wiersz z wcześniejszego testu
+        conn.execute(delete(ProjectPurge).where(ProjectPurge.project_id == project))
+        conn.execute(
+            insert(ProjectPurge).values(
+                project_id=project, state="running", tasks=7, updated_at=datetime.now(timezone.utc)
+            )
+        )
+    r = client.post(f"/projects/{project}:purge")
+    assert r.status_code == 202
+    assert r.json()["deleted"]["tasks"] == 7
+    assert project not in purge._running
+    assert client.get(f"/projects/{project}").status_code == 200
+
+    # bez postępu dłużej niż PURGE_STALE_SECONDS - worker padł, POST wznawia
+    monkeypatch.setattr(purge, "PURGE_STALE_SECONDS", 0)
+    r = client.post(f"/projects/{project}:purge")
+    assert r.json()["deleted"]["tasks"] == 0
+    assert wait_for(client, project)["state"] == "done"
+
+
+def test_finished_jobs_expire(client, project):
+    old = datetime.now(timezone.utc) - timedelta(seconds=purge.PURGE_JOB_TTL + 60)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(ProjectPurge),
+            [
+                {"project_id": 10_000_001, "state": "done", "updated_at": old},
+                {"project_id": 10_000_002, "state": "failed", "updated_at": old},
+                {"project_id": 10_000_003, "state": "done", "updated_at": datetime.now(timezone.utc)},
+            ],
+        )
+    client.post(f"/projects/{project}:purge")
+    wait_for(client, project)
+    assert client.get("/projects/10000001:purge").status_code == 404
+    assert client.get("/projects/10000002:purge").status_code == 404
+    assert client.get("/projects/10000003:purge").json()["state"] == "done"
+
+
+def test_failed_purge_keeps_error(client, project, monkeypatch):
+    def broken(project_id, chunk):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(purge, "_chunks", broken)
+    client.post(f"/projects/{project}:purge")
+    job = wait_for(client, project)
+    assert (job["state"], job["error"]) == ("failed", "boom")
+    assert client.get(f"/projects/{project}").status_code == 200
@@ -0,0 +1,133 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import db, replicas as replicas_module
+from app.cache import response_cache
+from app.db import Base, make_async_engine, make_engine
+from app.replicas import LAST_WRITE_COOKIE, LAST_WRITE_HEADER, LastWriteMiddleware, Replica
+
+from main import app
+
+
+
+
+STICKY = 0.5
+
+
+def make_replica(name: str, url: str) -> Replica:
+    return Replica(
+        name=name,
+        engine=make_engine(url),
+        async_engine=make_async_engine(url) if db.DB_ASYNC else None,
+    )
+
+
+@pytest.fixture
+def stale_replicas(client, tmp_path, monkeypatch, project):
+    # dwie "repliki" sqlite z nieaktualną kopią projektu (ta sama id, inna nazwa)
+    replicas = []
+    for i in range(2):
+        replica = make_replica(f"replica{i}", f"sqlite:///{tmp_path}/r{i}.db")
+        Base.metadata.create_all(replica.engine)
+        with replica.engine.begin() as conn:
+            conn.exec_driver_sql(f"INSERT INTO projects (id, name) VALUES ({project}, 'replica{i}')")
+        replicas.append(replica)
+    monkeypatch.setattr(db.replicas, "replicas", replicas)
+    monkeypatch.setattr(replicas_module, "REPLICA_STICKY_SECONDS", STICKY)
+    # cache odpowiedzi zasłoniłby, skąd czytamy
+    monkeypatch.setattr(response_cache, "backend", None)
+    yield replicas
+    for replica in replicas:
+        replica.engine.dispose()
+        if replica.async_engine is not None:
+            client.portal.call(replica.async_engine.dispose)
+
+
+def run(client, body):
+    # middleware znacznika zapisu jest w main.py tylko przy skonfigurowanych replikach
+    async def main():
+        transport = httpx.ASGITransport(app=LastWriteMiddleware(app))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return await body(c)
+
+    return client.portal.call(main)
+
+
+async def name(c, project: int, **kwargs) -> str:
+    r = await c.get(f"/projects/{project}", **kwargs)
+    assert r.status_code == 200, r.text
+    return r.json()["name"]
+
+
+def test_reads_go_round_robin_to_replicas(client, project, stale_replicas):
+    async def body(c):
+        return [await name(c, project) for _ in range(4)]
+
+    assert sorted(run(client, body)) == ["replica0", "replica0", "replica1", "replica1"]
+
+
+def test_cookie_keeps_reads_on_primary_within_window(client, project, stale_replicas):
+    async def body(c):
+        r = await c.patch(f"/projects/{project}", json={"name": "fresh"})
+        assert r.status_code == 200
+        assert LAST_WRITE_COOKIE in c.cookies
+        sticky = [await name(c, project) for _ in range(3)]
+        await asyncio.sleep(STICKY + 0.1)
+        return sticky, await name(c, project)
+
+    sticky, after = run(client, body)
+    assert sticky == ["fresh"] * 3
+    assert after.startswith("replica")
+
+
+def test_header_keeps_reads_on_primary_within_window(client, project, stale_replicas):
+    async def body(c):
+        r = await c.patch(f"/projects/{project}", json={"name": "fresh"})
+        stamp = r.headers[LAST_WRITE_HEADER]
+        c.cookies.clear()
+        headers = {LAST_WRITE_HEADER: stamp}
+        sticky = await name(c, project, headers=headers)
+        without = await name(c, project)
+        await asyncio.sleep(STICKY + 0.1)
+        return sticky, without, await name(c, project, headers=headers)
+
+    sticky, without, after = run(client, body)
+    assert sticky == "fresh"
+    assert without.startswith("replica")
+    assert after.startswith("replica")
+
+
+def test_failed_write_does_not_mark_client(client, project, stale_replicas):
+    async def body(c):
+        r = await c.patch(f"/projects/{project}", json={"name": ""})
+        assert r.status_code == 422
+        return LAST_WRITE_COOKIE in c.cookies, r.headers.get(LAST_WRITE_HEADER)
+
+    assert run(client, body) == (False, None)
+
+
+def test_unavailable_replica_is_skipped(client, project, stale_replicas, tmp_path):
+    broken = make_replica("broken", f"sqlite:///{tmp_path}/missing/dir/r.db")
+    stale_replicas.append(broken)
+
+    async def body(c):
+        await db.replicas.check()
+        return [r.healthy for r in stale_replicas], [await name(c, project) for _ in range(6)]
+
+    health, names = run(client, body)
+    assert health == [True, True, False]
+    assert set(names) == {"replica0", "replica1"}
+
+
+def test_all_replicas_down_falls_back_to_primary(client, project, stale_replicas):
+    for replica in stale_replicas:
+        replica.healthy = False
+
+    async def body(c):
+        return [await name(c, project) for _ in range(2)]
+
+    primary = client.get(f"/projects/{project}").json()["name"]
+    assert primary.startswith("Project")
+    assert run(client, body) == [primary] * 2
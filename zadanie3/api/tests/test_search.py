@@ -0,0 +1,91 @@
+import pytest
+
+from .conftest import create_task
+
+
+
+
+def comment(client, project_id: int, task_id: int, content: str) -> int:
+    r = client.post(f"/projects/{project_id}/tasks/{task_id}/comments", json={"content": content})
+    assert r.status_code == 201
+    return r.json()["id"]
+
+
+def search(client, **params):
+    return client.get("/search/comments", params=params)
+
+
+def walk(client, url: str) -> list:
+    ids = []
+    while url:
+        body = client.get(url).json()
+        ids += [hit["id"] for hit in body["items"]]
+        url = (body["_links"].get("next") or {}).get("href")
+    return ids
+
+
+@pytest.fixture
+def task(client, project) -> int:
+    return create_task(client, project)["id"]
+
+
+def test_results_are_ranked(client, project, task):
+    weak = comment(client, project, task, "apple among many other unrelated words in a long comment")
+    strong = comment(client, project, task, "apple apple apple")
+    comment(client, project, task, "banana only")
+    body = search(client, q="apple", project_id=project).json()
+    assert [hit["id"] for hit in body["items"]] == [strong, weak]
+    assert body["items"][0]["rank"] > body["items"][1]["rank"]
+
+
+def test_keyset_paging_over_rank_and_id(client, project, task):
+    # remisy rankingu (identyczna treść) rozstrzyga id malejąco
+    same = [comment(client, project, task, "kiwi") for _ in range(5)]
+    top = comment(client, project, task, "kiwi kiwi kiwi")
+    expected = [top] + same[::-1]
+    assert [h["id"] for h in search(client, q="kiwi", project_id=project).json()["items"]] == expected
+    for limit in (1, 2, 4):
+        assert walk(client, f"/search/comments?q=kiwi&project_id={project}&limit={limit}") == expected
+
+
+def test_snippet_escapes_html_and_marks_hits(client, project, task):
+    comment(client, project, task, "<b>bold</b> melon <script>alert(1)</script>")
+    snippet = search(client, q="melon", project_id=project).json()["items"][0]["snippet"]
+    assert "<mark>melon</mark>" in snippet
+    assert "<b>" not in snippet and "<script>" not in snippet
+    assert "&lt;b&gt;" in snippet
+
+
+def test_scope_by_project_and_by_member(client, project, task, user):
+    other = client.post("/projects", json={"name": "other"}).json()["id"]
+    other_task = create_task(client, other)["id"]
+    mine = comment(client, project, task, "grape juice")
+    theirs = comment(client, other, other_task, "grape jam")
+    assert client.post(f"/projects/{project}/members", json={"user_id": user}).status_code == 201
+
+    assert [h["id"] for h in search(client, q="grape", project_id=project).json()["items"]] == [mine]
+    assert [h["id"] for h in search(client, q="grape", project_id=other).json()["items"]] == [theirs]
+    assert [h["id"] for h in search(client, q="grape", user_id=user).json()["items"]] == [mine]
+
+
+def test_scope_is_required_and_must_exist(client, project, user):
+    assert search(client, q="grape").status_code == 400
+    assert search(client, q="grape", project_id=project, user_id=user).status_code == 400
+    assert search(client, q="grape", project_id=0).status_code == 404
+    assert search(client, q="grape", user_id=0).status_code == 404
+    assert search(client, q="   ", project_id=project).status_code == 400
+
+
+@pytest.mark.parametrize(
+    "q", ['"lime', 'lime"', "lime AND", "OR lime", "NEAR(lime", "content:lime", "-lime", "(lime"]
+)
+def test_search_syntax_is_not_an_error(client, project, task, q):
+    comment(client, project, task, "lime tree")
+    r = search(client, q=q, project_id=project)
+    assert r.status_code == 200, r.text
+
+
+def test_star_is_not_a_prefix_operator(client, project, task):
+    comment(client, project, task, "lime tree")
+    assert search(client, q="li*", project_id=project).json()["items"] == []
+    assert len(search(client, q="lime", project_id=project).json()["items"]) == 1
@@ -0,0 +1,122 @@
+from sqlalchemy import func, select
+
+from app.db import engine
+from app.models import (
+    Comment,
+    ProjectMember,
+    ProjectPriorityCount,
+    ProjectStats,
+    Task,
+)
+
+from .conftest import create_task
+
+
+
+
+def counters(project_id: int) -> dict:
+    # stan utrzymywany przez triggery
+    with engine.connect() as conn:
+        stats = conn.execute(
+            select(ProjectStats.tasks, ProjectStats.members, ProjectStats.comments)
+            .where(ProjectStats.project_id == project_id)
+        ).one()
+        priorities = conn.execute(
+            select(ProjectPriorityCount.priority, ProjectPriorityCount.tasks)
+            .where(ProjectPriorityCount.project_id == project_id, ProjectPriorityCount.tasks > 0)
+        ).all()
+    return {"tasks": stats[0], "members": stats[1], "comments": stats[2],
+            "priorities": dict(priorities)}
+
+
+def recount(project_id: int) -> dict:
+    # to samo policzone od zera z tabel źródłowych
+    with engine.connect() as conn:
+        tasks = select(func.count()).where(Task.project_id == project_id)
+        members = select(func.count()).where(ProjectMember.project_id == project_id)
+        comments = (
+            select(func.count())
+            .select_from(Comment)
+            .join(Task, Task.id == Comment.task_id)
+            .where(Task.project_id == project_id)
+        )
+        priorities = conn.execute(
+            select(Task.priority, func.count())
+            .where(Task.project_id == project_id)
+            .group_by(Task.priority)
+        ).all()
+        return {
+            "tasks": conn.scalar(tasks.select_from(Task)),
+            "members": conn.scalar(members.select_from(ProjectMember)),
+            "comments": conn.scalar(comments),
+            "priorities": dict(priorities),
+        }
+
+
+def assert_consistent(client, project_id: int) -> dict:
+    expected = recount(project_id)
+    assert counters(project_id) == expected
+    stats = client.get(f"/projects/{project_id}/stats").json()
+    assert stats["tasks"] == expected["tasks"]
+    assert stats["members"] == expected["members"]
+    assert stats["comments"] == expected["comments"]
+    assert {k: v for k, v in stats["tasks_by_priority"].items() if v} == expected["priorities"]
+    return expected
+
+
+
+
+def test_counters_follow_writes(client, project, user):
+    low = create_task(client, project, priority="LOW")
+    high = create_task(client, project, priority="HIGH")
+    tasks = f"/projects/{project}/tasks"
+    comments = [
+        client.post(f"{tasks}/{t['id']}/comments", json={"content": "c"}).json()
+        for t in (low, high, high)
+    ]
+    client.post(f"/projects/{project}/members", json={"user_id": user})
+    assert assert_consistent(client, project) == {
+        "tasks": 2, "members": 1, "comments": 3, "priorities": {"LOW": 1, "HIGH": 1}
+    }
+
+    # zmiana priorytetu przenosi licznik
+    client.patch(f"{tasks}/{low['id']}", json={"priority": "HIGH"})
+    assert assert_consistent(client, project)["priorities"] == {"HIGH": 2}
+
+    client.delete(f"{tasks}/{high['id']}/comments/{comments[1]['id']}")
+    assert assert_consistent(client, project)["comments"] == 2
+
+
+def test_counters_follow_cascades(client, project, user):
+    task = create_task(client, project)
+    tasks = f"/projects/{project}/tasks"
+    for _ in range(3):
+        client.post(f"{tasks}/{task['id']}/comments", json={"content": "c"})
+    client.post(f"/projects/{project}/members", json={"user_id": user})
+
+    # usunięcie taska zabiera jego komentarze, usunięcie użytkownika - członkostwo
+    assert client.delete(f"{tasks}/{task['id']}").status_code == 204
+    assert client.delete(f"/users/{user}").status_code == 204
+    assert assert_consistent(client, project) == {
+        "tasks": 0, "members": 0, "comments": 0, "priorities": {}
+    }
+
+
+def test_counters_follow_task_batches_and_imports(client, project, user):
+    r = client.post(
+        f"/projects/{project}/tasks:batch",
+        json={"create": [{"name": "a", "priority": "LOW"}, {"name": "b", "priority": "LOW"}]},
+    )
+    created = [item["id"] for item in r.json()["results"]]
+    client.post(
+        f"/projects/{project}/tasks:batch",
+        json={"update": [{"id": created[0], "priority": "HIGH"}], "delete": [created[1]]},
+    )
+    client.post(
+        "/import/members",
+        params={"format": "ndjson"},
+        content=f'{{"project_id": {project}, "user_id": {user}}}\n',
+    )
+    assert assert_consistent(client, project) == {
+        "tasks": 1, "members": 1, "comments": 0, "priorities": {"HIGH": 1}
+    }
@@ -0,0 +1,86 @@
+import pytest
+
+from .conftest import create_task
+
+
+
+
+TASKS = [
+    {"name": "50%_off", "priority": "HIGH", "due_date": "2026-01-10"},
+    {"name": "50 percent", "priority": "LOW", "due_date": "2026-02-10"},
+    {"name": "a*b", "priority": "MEDIUM", "description": "Star in NAME"},
+    {"name": "a?c", "priority": "HIGH", "due_date": "2026-03-10"},
+    {"name": "a[b]", "priority": "LOW", "description": "100% sure"},
+    {"name": "A_b\\c", "priority": "MEDIUM", "due_date": "2026-01-20"},
+    {"name": "plain", "priority": "HIGH", "description": "under_score"},
+]
+
+
+@pytest.fixture
+def tasks(client, project) -> dict:
+    return {t["name"]: create_task(client, project, **t)["id"] for t in TASKS}
+
+
+def names(client, project: int, query: str) -> list:
+    r = client.get(f"/projects/{project}/tasks?limit=500&{query}")
+    assert r.status_code == 200, r.text
+    return sorted(t["name"] for t in r.json()["items"])
+
+
+def test_priority_takes_several_values(client, project, tasks):
+    assert names(client, project, "priority=LOW") == ["50 percent", "a[b]"]
+    assert names(client, project, "priority=LOW&priority=MEDIUM") == [
+        "50 percent", "A_b\\c", "a*b", "a[b]",
+    ]
+
+
+def test_due_range(client, project, tasks):
+    # due_from pomija taski bez terminu, due_before jest wyłączne
+    assert names(client, project, "due_from=2026-01-20") == ["50 percent", "A_b\\c", "a?c"]
+    assert names(client, project, "due_before=2026-01-20") == ["50%_off"]
+    assert names(client, project, "due_from=2026-01-10&due_before=2026-02-10") == [
+        "50%_off", "A_b\\c",
+    ]
+
+
+@pytest.mark.parametrize(
+    "prefix, expected",
+    [
+        ("50%", ["50%_off"]),
+        ("50", ["50 percent", "50%_off"]),
+        ("a*", ["a*b"]),
+        ("a?", ["a?c"]),
+        ("a[", ["a[b]"]),
+        ("a", ["a*b", "a?c", "a[b]"]),  # wielkość liter ma znaczenie
+        ("A_", ["A_b\\c"]),
+        ("A_b\\", ["A_b\\c"]),
+        ("_", []),
+        ("%", []),
+    ],
+)
+def test_name_prefix_is_literal(client, project, tasks, prefix, expected):
+    r = client.get(f"/projects/{project}/tasks", params={"name_prefix": prefix, "limit": 500})
+    assert sorted(t["name"] for t in r.json()["items"]) == expected
+
+
+@pytest.mark.parametrize(
+    "q, expected",
+    [
+        ("star", ["a*b"]),  # description, bez względu na wielkość liter
+        ("PERCENT", ["50 percent"]),
+        ("%", ["50%_off", "a[b]"]),
+        ("_", ["50%_off", "A_b\\c", "plain"]),
+        ("*", ["a*b"]),
+        ("\\", ["A_b\\c"]),
+        ("nothing", []),
+    ],
+)
+def test_q_is_literal_substring(client, project, tasks, q, expected):
+    r = client.get(f"/projects/{project}/tasks", params={"q": q, "limit": 500})
+    assert sorted(t["name"] for t in r.json()["items"]) == expected
+
+
+def test_filters_combine(client, project, tasks):
+    assert names(client, project, "priority=HIGH&name_prefix=a") == ["a?c"]
+    assert names(client, project, "priority=HIGH&q=score&due_before=2027-01-01") == []
+    assert names(client, project, "priority=HIGH&q=score") == ["plain"]
@@ -0,0 +1,88 @@
+from sqlalchemy import select
+
+from app.db import engine
+from app.models import Task
+
+from .conftest import create_task
+
+
+
+
+def batch(client, project_id: int, **ops):
+    return client.post(f"/projects/{project_id}/tasks:batch", json=ops)
+
+
+def names(client, project_id: int) -> list:
+    return [t["name"] for t in client.get(f"/projects/{project_id}/tasks").json()["items"]]
+
+
+def test_create_keeps_request_order(client, project):
+    r = batch(client, project, create=[{"name": f"t{i}"} for i in range(25)])
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert [x["item"]["name"] for x in results] == [f"t{i}" for i in range(25)]
+    assert all(x["op"] == "create" and x["status"] == 201 for x in results)
+    # id z RETURNING należy do wiersza z tej samej pozycji
+    with engine.connect() as conn:
+        stored = dict(conn.execute(select(Task.id, Task.name).where(Task.project_id == project)).all())
+    assert {x["id"]: x["item"]["name"] for x in results} == stored
+
+
+def test_missing_items_report_404(client, project):
+    other = client.post("/projects", json={"name": "other"}).json()["id"]
+    mine = create_task(client, project, name="mine")
+    foreign = create_task(client, other, name="foreign")
+    gone = create_task(client, project, name="gone")
+
+    r = batch(
+        client,
+        project,
+        update=[{"id": mine["id"], "priority": "HIGH"}, {"id": foreign["id"], "name": "stolen"}],
+        delete=[gone["id"], foreign["id"], 0],
+    )
+    assert r.status_code == 200
+    assert [(x["op"], x["id"], x["status"]) for x in r.json()["results"]] == [
+        ("update", mine["id"], 200),
+        ("update", foreign["id"], 404),
+        ("delete", gone["id"], 204),
+        ("delete", foreign["id"], 404),
+        ("delete", 0, 404),
+    ]
+    assert r.json()["results"][0]["item"]["priority"] == "HIGH"
+    # task z innego projektu nietknięty
+    assert client.get(f"/projects/{other}/tasks/{foreign['id']}").json()["name"] == "foreign"
+    assert names(client, project) == ["mine"]
+
+
+def test_constraint_violation_rolls_back_whole_batch(client, project):
+    kept = create_task(client, project, name="kept")
+    etag = client.get(f"/projects/{project}/tasks/{kept['id']}").headers["ETag"]
+    r = batch(
+        client,
+        project,
+        create=[{"name": "new"}],
+        update=[{"id": kept["id"], "name": None}],
+        delete=[kept["id"]],
+    )
+    assert r.status_code == 409
+    assert names(client, project) == ["kept"]
+    assert client.get(f"/projects/{project}/tasks/{kept['id']}").headers["ETag"] == etag
+
+
+def test_unknown_project_is_404(client):
+    assert batch(client, 0, create=[{"name": "x"}]).status_code == 404
+
+
+def test_duplicate_ids_are_rejected(client, project):
+    task = create_task(client, project, name="once")
+    r = batch(
+        client,
+        project,
+        update=[{"id": task["id"], "name": "first"}, {"id": task["id"], "name": "second"}],
+    )
+    assert r.status_code == 422
+    assert batch(client, project, delete=[task["id"], task["id"]]).status_code == 422
+    # ten sam id w update i delete jest dozwolony (najpierw update, potem delete)
+    r = batch(client, project, update=[{"id": task["id"], "name": "last"}], delete=[task["id"]])
+    assert [x["status"] for x in r.json()["results"]] == [200, 204]
+    assert names(client, project) == []
@@ -0,0 +1,69 @@
+import pytest
+
+from .conftest import create_task
+
+
+
+
+def walk(client, url: str) -> list:
+    items = []
+    while url:
+        r = client.get(url)
+        assert r.status_code == 200, r.text
+        body = r.json()
+        items += body["items"]
+        url = (body["_links"].get("next") or {}).get("href")
+    return items
+
+
+@pytest.fixture
+def projects(client, user) -> list:
+    # trzy projekty użytkownika i jeden, do którego nie należy
+    ids = [client.post("/projects", json={"name": f"mine {i}"}).json()["id"] for i in range(3)]
+    for project_id in ids:
+        assert client.post(f"/projects/{project_id}/members", json={"user_id": user}).status_code == 201
+    other = client.post("/projects", json={"name": "not mine"}).json()["id"]
+    return ids + [other]
+
+
+def test_projects_only_where_member(client, user, projects):
+    *mine, other = projects
+    assert [p["id"] for p in walk(client, f"/users/{user}/projects?limit=2")] == mine
+    assert [p["id"] for p in walk(client, f"/users/{user}/projects?limit=1")] == mine
+    # usunięte członkostwo znika z listy
+    assert client.delete(f"/projects/{mine[1]}/members/{user}").status_code == 204
+    assert [p["id"] for p in walk(client, f"/users/{user}/projects")] == [mine[0], mine[2]]
+
+
+def test_tasks_page_across_projects(client, user, projects):
+    *mine, other = projects
+    expected = [create_task(client, p, name=f"t{p}-{i}")["id"] for p in mine for i in range(3)]
+    create_task(client, other, name="hidden")
+    for limit in (2, 4, 50):
+        ids = [t["id"] for t in walk(client, f"/users/{user}/tasks?limit={limit}")]
+        assert ids == sorted(expected)
+    assert {t["project_id"] for t in walk(client, f"/users/{user}/tasks?limit=4")} == set(mine)
+
+
+def test_tasks_due_before_and_sort(client, user, projects):
+    *mine, other = projects
+    early = create_task(client, mine[2], name="early", due_date="2026-01-05")["id"]
+    late = create_task(client, mine[0], name="late", due_date="2026-03-01")["id"]
+    mid = create_task(client, mine[1], name="mid", due_date="2026-02-01")["id"]
+    create_task(client, mine[0], name="undated")
+    create_task(client, other, name="other", due_date="2026-01-01")
+
+    r = walk(client, f"/users/{user}/tasks?due_before=2026-02-15&sort=due_date&limit=1")
+    assert [t["id"] for t in r] == [early, mid]
+    r = walk(client, f"/users/{user}/tasks?due_before=2027-01-01&sort=-due_date&limit=2")
+    assert [t["id"] for t in r] == [late, mid, early]
+
+
+def test_unknown_user_is_404(client):
+    assert client.get("/users/0/projects").status_code == 404
+    assert client.get("/users/0/tasks").status_code == 404
+
+
+def test_user_without_projects_gets_empty_lists(client, user):
+    assert client.get(f"/users/{user}/projects").json()["items"] == []
+    assert client.get(f"/users/{user}/tasks").json()["items"] == []